@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.fake_odata import load_records
+from odata_export import BatchWriter, MAX_FILE_SIZE_BYTES, PAGE_SIZE, clean_record
+
+# Peak memory and time of the old in-memory batching (as the entity scripts
+# did it) versus the streaming BatchWriter, on synthetic pages of records.
+# Usage (from the Data_Ivanti folder): python -m benchmarks.bench_batch_writer --records 100000
+
+
+def synthetic_pages(entity, count):
+    # Generated lazily, one page at a time, like pages coming off the API
+    source = load_records(entity)
+    for start in range(0, count, PAGE_SIZE):
+        page = []
+        for i in range(start, min(start + PAGE_SIZE, count)):
+            record = dict(source[i % len(source)])
+            record["RecId"] = uuid.uuid4().hex.upper()
+            page.append(record)
+        yield page
+
+
+def legacy_export(pages, output_dir, prefix):
+    # Steps 1-3 of the original scripts: two full copies in memory, sized by re-encoding
+    all_records = []
+    for page in pages:
+        all_records.extend(page)
+
+    cleaned_records = []
+    for record in all_records:
+        cleaned = {key: value for key, value in record.items() if value not in [None, "", [], {}]}
+        if cleaned:
+            cleaned_records.append(cleaned)
+
+    def get_json_size(obj):
+        return len(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    current_batch, current_size, batch_num = [], 0, 1
+    for record in cleaned_records:
+        record_size = get_json_size(record)
+        if current_size + record_size > MAX_FILE_SIZE_BYTES:
+            with open(os.path.join(output_dir, f"{prefix}_batch_{batch_num}.json"), "w", encoding="utf-8") as f:
+                json.dump(current_batch, f, indent=2, ensure_ascii=False)
+            batch_num += 1
+            current_batch, current_size = [], 0
+        current_batch.append(record)
+        current_size += record_size
+    if current_batch:
+        with open(os.path.join(output_dir, f"{prefix}_batch_{batch_num}.json"), "w", encoding="utf-8") as f:
+            json.dump(current_batch, f, indent=2, ensure_ascii=False)
+
+
+def streaming_export(pages, output_dir, prefix):
+    with BatchWriter(output_dir, prefix) as writer:
+        for page in pages:
+            for record in page:
+                cleaned = clean_record(record)
+                if cleaned:
+                    writer.write(cleaned)
+
+
+def measure(fn, entity, records):
+    with tempfile.TemporaryDirectory() as output_dir:
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(synthetic_pages(entity, records), output_dir, entity)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        sizes = [os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir)]
+    return {
+        "seconds": round(seconds, 2),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+        "batches": len(sizes),
+        "largest_batch_bytes": max(sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entity", default="workarounds")
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    report = {
+        "entity": args.entity,
+        "records": args.records,
+        "legacy": measure(legacy_export, args.entity, args.records),
+        "streaming": measure(streaming_export, args.entity, args.records),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_odata import load_records
+from columnar_store import ColumnarStore, record_month
+from content_offload import BlobStore, offload_record
+from odata_export import BatchWriter
+
+# Filtered queries over the JSON batch files (load and scan every file) versus
+# the partitioned Parquet dataset (column pruning + predicate pushdown).
+# Usage (from the Data_Ivanti folder): python -m benchmarks.bench_columnar --records 20000
+
+
+def synthetic_incidents(count, months, seed=0):
+    # Exported incidents (heavy fields offloaded, as the export now writes them)
+    # spread over `months` months of CreatedDateTime with fresh RecIds
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as blob_dir:
+        blobs = BlobStore(blob_dir)
+        source = [offload_record(record, blobs) for record in load_records("incidents")]
+    for i in range(count):
+        record = dict(source[i % len(source)])
+        month = rng.randrange(months)
+        record["RecId"] = f"{i:032X}"
+        record["CreatedDateTime"] = f"{2022 + month // 12}-{month % 12 + 1:02d}-{rng.randint(1, 28):02d}T10:00:00Z"
+        record["IncidentNumber"] = 100000 + i
+        yield record
+
+
+def json_scan(batch_dir, predicate, columns):
+    rows = []
+    for path in glob.glob(os.path.join(batch_dir, "*.json")):
+        with open(path, encoding="utf-8") as f:
+            for record in json.load(f):
+                if predicate(record):
+                    rows.append({column: record.get(column) for column in columns})
+    return rows
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, round(min(timings), 1)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    columns = ["IncidentNumber", "Subject", "Resolution"]
+    queries = {
+        "category_and_cause": {
+            "where": [("Category", "==", "UI Configuration"), ("CauseCode", "==", "Request")],
+            "predicate": lambda r: r.get("Category") == "UI Configuration" and r.get("CauseCode") == "Request",
+            "months": None,
+        },
+        "one_quarter": {
+            "where": [("Status", "==", "Resolved")],
+            "predicate": lambda r: r.get("Status") == "Resolved" and "2023-01" <= record_month(r) <= "2023-03",
+            "months": ("2023-01", "2023-03"),
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as root:
+        batch_dir = os.path.join(root, "incidents_batches")
+        store = ColumnarStore(os.path.join(root, "columnar"))
+
+        start = time.perf_counter()
+        with BatchWriter(batch_dir, "incidents") as batches, store.writer("incidents") as columnar:
+            for record in synthetic_incidents(args.records, args.months):
+                batches.write(record)
+                columnar.write(record)
+        write_seconds = round(time.perf_counter() - start, 2)
+
+        report = {
+            "records": args.records,
+            "write_seconds": write_seconds,
+            "json_bytes": directory_size(batch_dir),
+            "parquet_bytes": directory_size(os.path.join(root, "columnar")),
+            "queries": {},
+        }
+        for name, query in queries.items():
+            json_rows, json_ms = timed(lambda: json_scan(batch_dir, query["predicate"], columns), args.repeat)
+            table, parquet_ms = timed(
+                lambda: store.query("incidents", columns=columns, where=query["where"], months=query["months"]),
+                args.repeat,
+            )
+            files = store.files_scanned("incidents", query["where"], query["months"])
+            report["queries"][name] = {
+                "rows": {"json": len(json_rows), "parquet": table.num_rows},
+                "json_ms": json_ms,
+                "parquet_ms": parquet_ms,
+                "speedup": round(json_ms / parquet_ms, 1) if parquet_ms else None,
+                "parquet_files_scanned": len(files),
+                "parquet_bytes_in_scanned_files": sum(os.path.getsize(path) for path in files),
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
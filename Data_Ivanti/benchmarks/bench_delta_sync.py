@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_odata import FakeODataServer, synthetic_records
+from delta_sync import sync_entity
+from local_store import LocalStore
+from odata_export import ENTITIES, create_session
+
+# First sync (full export) versus a nightly delta after a small share of records changed.
+# Usage (from the Data_Ivanti folder): python -m benchmarks.bench_delta_sync --records 5000 --changed 0.01
+
+
+def timed_sync(entity, server, store, tmp, **kwargs):
+    server.requests = 0
+    server.bytes_sent = 0
+    start = time.perf_counter()
+    summary = sync_entity(entity, store, changeset_dir=os.path.join(tmp, "changesets"), session=create_session(4),
+                          base_url=server.base_url, workers=4, checkpoint_dir=os.path.join(tmp, ".checkpoints"), **kwargs)
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    summary["bytes_downloaded"] = server.bytes_sent
+    summary.pop("changeset")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entity", default="incidents", choices=sorted(ENTITIES))
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--changed", type=float, default=0.01, help="share of records modified between syncs")
+    args = parser.parse_args()
+
+    records = synthetic_records(args.entity, args.records)
+    server = FakeODataServer({ENTITIES[args.entity]["object"]: records})
+    server.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalStore(os.path.join(tmp, "store.db"))
+        first = timed_sync(args.entity, server, store, tmp)
+
+        # Touch a few records, as if they were edited during the day
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        for record in random.Random(1).sample(records, max(1, int(len(records) * args.changed))):
+            record["LastModDateTime"] = now
+        server.results.clear()
+
+        delta = timed_sync(args.entity, server, store, tmp)
+        store.close()
+
+    server.stop()
+    print(json.dumps({"first_sync": first, "delta_sync": delta}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from content_offload import offload_batches
+from odata_export import ENTITIES
+
+# Per-entity batch sizes before and after heavy-field offloading, run on a
+# temporary copy of the committed <entity>_batches folders (they are not touched).
+# Usage (from the Data_Ivanti folder): python -m benchmarks.bench_offload incidents knowledges
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("entities", nargs="*", help="entities to measure (default: every exported entity)")
+    args = parser.parse_args()
+
+    entities = args.entities or sorted(entity for entity in ENTITIES if os.path.isdir(f"{entity}_batches"))
+    reports = []
+    with tempfile.TemporaryDirectory() as output_root:
+        for entity in entities:
+            shutil.copytree(f"{entity}_batches", os.path.join(output_root, f"{entity}_batches"))
+            start = time.perf_counter()
+            report = offload_batches(entity, output_root, os.path.join(output_root, "blobs"))
+            report["seconds"] = round(time.perf_counter() - start, 2)
+            reports.append(report)
+
+    totals = {key: sum(report[key] for report in reports) for key in ("bytes_before", "bytes_after")}
+    print(json.dumps({"entities": reports, "totals": totals}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import json
+import tempfile
+import time
+
+from benchmarks.fake_odata import FakeODataServer, synthetic_records
+from field_profiles import PROFILES
+from odata_export import ENTITIES, ODataExtractor, clean_record, create_session
+
+# Bytes downloaded and JSON parse time for each field profile, exporting the
+# same synthetic records from a local fake OData server.
+# Usage (from the Data_Ivanti folder): python -m benchmarks.bench_profiles --entity incidents --records 2000
+
+
+def measure(entity, profile, base_url, workers, checkpoint_dir):
+    extractor = ODataExtractor(entity, session=create_session(workers), base_url=base_url, workers=workers,
+                               checkpoint_dir=checkpoint_dir, profile=profile)
+    start = time.perf_counter()
+    records = [clean_record(record) for record in extractor.iter_records()]
+    seconds = time.perf_counter() - start
+    extractor.clear_checkpoint()
+    return {
+        "profile": profile,
+        "records": len(records),
+        "fields_per_record": round(sum(len(record) for record in records) / len(records), 1) if records else 0,
+        "requests": extractor.requests_made,
+        "bytes_downloaded": extractor.bytes_downloaded,
+        "parse_ms": round(extractor.parse_seconds * 1000, 1),
+        "seconds": round(seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entity", default="incidents", choices=sorted(ENTITIES))
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = FakeODataServer({ENTITIES[args.entity]["object"]: synthetic_records(args.entity, args.records)},
+                             latency=args.latency)
+    base_url = server.start()
+    try:
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            results = [measure(args.entity, profile, base_url, args.workers, checkpoint_dir) for profile in PROFILES]
+    finally:
+        server.stop()
+
+    full = results[0]["bytes_downloaded"]
+    for result in results:
+        result["bytes_vs_full"] = round(result["bytes_downloaded"] / full, 3) if full else 0.0
+    print(json.dumps({"entity": args.entity, "records": args.records, "profiles": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
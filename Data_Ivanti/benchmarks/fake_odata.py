@@ -0,0 +1,195 @@
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Local stand-in for the Ivanti OData API (/HEAT/api/odata/businessobject/<Object>).
+# Supports $top, $skip, $orderby, $count, $select, $filter (eq/ne/gt/ge/lt/le joined with "and")
+# and @odata.nextLink, plus injected latency, throttling and failures.
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+DATETIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T")
+FILTER_PATTERN = re.compile(r"^\s*(\w+)\s+(eq|ne|gt|ge|lt|le)\s+(.+?)\s*$")
+OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and a > b,
+    "ge": lambda a, b: a is not None and a >= b,
+    "lt": lambda a, b: a is not None and a < b,
+    "le": lambda a, b: a is not None and a <= b,
+}
+
+
+def load_records(entity):
+    records = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, f"{entity}_batches", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.load(f))
+    return records
+
+
+def synthetic_records(entity, count, seed=0):
+    """`count` records cycled from the exported batches, each with a fresh RecId."""
+    rng = random.Random(seed)
+    source = load_records(entity)
+    records = []
+    for i in range(count):
+        record = dict(source[i % len(source)])
+        record["RecId"] = uuid.UUID(int=rng.getrandbits(128)).hex.upper()
+        records.append(record)
+    return records
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_value(text):
+    text = text.strip()
+    # Unquoted DateTimeOffset literal, e.g. LastModDateTime gt 2024-01-01T00:00:00Z
+    if DATETIME_PATTERN.match(text):
+        return _parse_datetime(text)
+    if text.startswith("'") and text.endswith("'"):
+        value = text[1:-1]
+        return None if value == "$NULL" else value
+    if text in ("true", "false"):
+        return text == "true"
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_filter(expression):
+    # Only what the export scripts send: simple comparisons joined with "and"
+    clauses = []
+    for part in re.split(r"\s+and\s+", expression):
+        match = FILTER_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Unsupported $filter clause: {part}")
+        field, op, value = match.groups()
+        clauses.append((field, OPERATORS[op], _parse_value(value)))
+    return clauses
+
+
+def matches(record, clauses):
+    for field, op, value in clauses:
+        actual = record.get(field)
+        if isinstance(value, datetime):
+            actual = _parse_datetime(actual)
+        if not op(actual, value):
+            return False
+    return True
+
+
+class FakeODataServer:
+    def __init__(self, objects, latency=0.0, fail_rate=0.0, throttle_rate=0.0, support_count=True, max_top=100, seed=0):
+        self.objects = objects  # business object name -> list of records
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.throttle_rate = throttle_rate
+        self.support_count = support_count
+        self.max_top = max_top
+        self.down = False  # set to True to make every request fail with 503
+        self.requests = 0
+        self.bytes_sent = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.results = {}  # filtered + sorted record lists, reused across pages of one query
+        self.httpd = None
+
+    def _matching(self, name, params):
+        key = (name, params.get("$filter"), params.get("$orderby"))
+        if key not in self.results:
+            records = self.objects[name]
+            if "$filter" in params:
+                clauses = parse_filter(params["$filter"])
+                records = [r for r in records if matches(r, clauses)]
+            if "$orderby" in params:
+                field = params["$orderby"].split()[0]
+                records = sorted(records, key=lambda r: str(r.get(field, "")))
+            self.results[key] = records
+        return self.results[key]
+
+    def query(self, name, params):
+        records = self._matching(name, params)
+
+        skip = int(params.get("$skip", 0))
+        top = min(int(params.get("$top", self.max_top)), self.max_top)
+        page = records[skip:skip + top]
+        if "$select" in params:
+            fields = params["$select"].split(",")
+            page = [{field: record.get(field) for field in fields} for record in page]
+        body = {"value": page}
+
+        if self.support_count and params.get("$count") == "true":
+            body["@odata.count"] = len(records)
+        if skip + top < len(records):
+            next_params = dict(params, **{"$skip": skip + top})
+            next_params.pop("$count", None)
+            body["@odata.nextLink"] = f"{self.base_url}/{name}?{urlencode(next_params)}"
+        return body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+                with server.lock:
+                    server.bytes_sent += len(payload)
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    roll = server.random.random()
+                time.sleep(server.latency)
+
+                if server.down or roll < server.fail_rate:
+                    return self._send(503, {"error": "Service Unavailable"})
+                if roll < server.fail_rate + server.throttle_rate:
+                    return self._send(429, {"error": "Too Many Requests"}, {"Retry-After": "0"})
+
+                url = urlparse(self.path)
+                name = url.path.rstrip("/").split("/")[-1]
+                if name not in server.objects:
+                    return self._send(404, {"error": f"Unknown business object {name}"})
+
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    return self._send(200, server.query(name, params))
+                except ValueError as e:
+                    return self._send(400, {"error": str(e)})
+
+        return Handler
+
+    def start(self, port=0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/HEAT/api/odata/businessobject"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,272 @@
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+
+from local_store import to_utc
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # only needed when the columnar dataset is written or queried
+    pa = None
+
+# Columnar copy of the exported records: Parquet files under
+# <COLUMNAR_DIR>/<entity>/month=<YYYY-MM>/ (month of CreatedDateTime, UTC).
+# Queries only read the columns they ask for, and filters are pushed down so
+# whole months and row groups are skipped when their statistics can't match.
+
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "columnar")
+# Records buffered before a Parquet file is written
+COLUMNAR_ROWS_PER_FILE = int(os.getenv("COLUMNAR_ROWS_PER_FILE", "50000"))
+
+PARTITION_FIELD = "month"
+UNKNOWN_MONTH = "unknown"
+WHERE_PATTERN = re.compile(r"^(\w+)\s*(==|!=|>=|<=|>|<|=)\s*(.*)$")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("The columnar store needs pyarrow (pip install pyarrow)")
+
+
+def record_month(record):
+    created = record.get("CreatedDateTime")
+    if not created:
+        return UNKNOWN_MONTH
+    try:
+        return to_utc(created).strftime("%Y-%m")
+    except ValueError:
+        return UNKNOWN_MONTH
+
+
+def _column_type(values):
+    # Ivanti values are strings, booleans and numbers; anything else is stored as JSON text
+    kinds = {type(value) for value in values if value is not None}
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64()
+    if kinds and kinds <= {int, float}:
+        return pa.float64()
+    return pa.string()
+
+
+def _to_column(values, column_type):
+    if column_type == pa.string():
+        values = [
+            value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+            for value in values
+        ]
+    return pa.array(values, type=column_type)
+
+
+def records_to_table(records):
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        columns[field] = _to_column(values, _column_type(values))
+    columns[PARTITION_FIELD] = pa.array([record_month(record) for record in records], type=pa.string())
+    return pa.table(columns)
+
+
+class ColumnarWriter:
+    """Replaces one entity's dataset with the records written to it.
+
+    Records are buffered and written COLUMNAR_ROWS_PER_FILE at a time, split
+    into one Parquet file per month. Like BatchWriter, the old dataset is only
+    swapped out once the new one is complete; if the writer exits with an
+    exception, the staging directory is removed and the old dataset kept.
+    """
+
+    def __init__(self, root, entity, rows_per_file=COLUMNAR_ROWS_PER_FILE):
+        _require_pyarrow()
+        self.path = os.path.join(root, entity)
+        self.staging_path = self.path + ".tmp"
+        self.rows_per_file = rows_per_file
+        self.buffer = []
+        self.files_written = 0
+        self.records_written = 0
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+        os.makedirs(self.staging_path)
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        ds.write_dataset(
+            records_to_table(self.buffer),
+            self.staging_path,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([(PARTITION_FIELD, pa.string())]), flavor="hive"),
+            basename_template=f"part-{self.files_written}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        self.files_written += 1
+        self.records_written += len(self.buffer)
+        self.buffer = []
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.rows_per_file:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.staging_path, self.path)
+        return self.records_written
+
+    def abort(self):
+        self.buffer = []
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def parse_where(expression):
+    """'Category=UI Configuration' or 'CountView>=10' -> ("Category", "==", "UI Configuration").
+
+    The value stays a string; queries cast it to the column's type.
+    """
+    match = WHERE_PATTERN.match(expression.strip())
+    if not match:
+        raise ValueError(f"Unsupported condition: {expression}")
+    field, op, value = match.groups()
+    return field, "==" if op == "=" else op, value
+
+
+def typed_condition(condition, schema):
+    # Comparing a string column with a number (or the reverse) fails in Arrow, so
+    # the literal is cast to the column's type: Priority=3 on a string column is "3"
+    field, op, value = condition
+    if field not in schema.names:
+        raise ValueError(f"Unknown column in condition: {field}")
+    column_type = schema.field(field).type
+    try:
+        return field, op, pa.scalar(value).cast(column_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        raise ValueError(f"{field} is {column_type}; {value!r} can't be compared with it") from None
+
+
+class ColumnarStore:
+    def __init__(self, root=COLUMNAR_DIR):
+        _require_pyarrow()
+        self.root = root
+        self._datasets = {}  # entity -> (directory mtime, dataset); reading every footer is not free
+
+    def entities(self):
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))
+                      and not name.endswith(".tmp")) if os.path.isdir(self.root) else []
+
+    def writer(self, entity, rows_per_file=COLUMNAR_ROWS_PER_FILE):
+        return ColumnarWriter(self.root, entity, rows_per_file)
+
+    def dataset(self, entity):
+        path = os.path.join(self.root, entity)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No columnar data for {entity} under {self.root}")
+        # A rewrite swaps the whole directory in, which changes its mtime
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._datasets.get(entity)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        files = glob.glob(os.path.join(path, "*", "*.parquet"))
+        partitioning = ds.partitioning(pa.schema([(PARTITION_FIELD, pa.string())]), flavor="hive")
+        # Files written from different chunks can have different columns; merge their schemas
+        schema = pa.unify_schemas(
+            [pq.read_schema(file) for file in files] + [pa.schema([(PARTITION_FIELD, pa.string())])],
+            promote_options="permissive",
+        )
+        dataset = ds.dataset(files, schema=schema, format="parquet", partitioning=partitioning, partition_base_dir=path)
+        self._datasets[entity] = (mtime, dataset)
+        return dataset
+
+    def expression(self, where=None, months=None, schema=None):
+        """AND of (field, op, value) conditions, plus an optional (first, last) month range.
+
+        With `schema`, each value is cast to its column's type first.
+        """
+        conditions = [typed_condition(condition, schema) for condition in where or []] if schema else list(where or [])
+        if months:
+            first, last = months
+            if first:
+                conditions.append((PARTITION_FIELD, ">=", first))
+            if last:
+                conditions.append((PARTITION_FIELD, "<=", last))
+        return pq.filters_to_expression(conditions) if conditions else None
+
+    def query(self, entity, columns=None, where=None, months=None):
+        """Return a pyarrow Table with only `columns` of the rows matching `where`."""
+        dataset = self.dataset(entity)
+        if columns:
+            columns = [column for column in columns if column in dataset.schema.names]
+        return dataset.to_table(columns=columns, filter=self.expression(where, months, dataset.schema))
+
+    def files_scanned(self, entity, where=None, months=None):
+        # Partitions that survive pruning (row groups inside them may still be skipped)
+        dataset = self.dataset(entity)
+        fragments = dataset.get_fragments(filter=self.expression(where, months, dataset.schema))
+        return [fragment.path for fragment in fragments]
+
+
+def build_from_batches(entity, store, output_root="."):
+    """Build an entity's columnar dataset from its existing <entity>_batches folder."""
+    with store.writer(entity) as writer:
+        for path in sorted(glob.glob(os.path.join(output_root, f"{entity}_batches", "*.json"))):
+            with open(path, encoding="utf-8") as f:
+                for record in json.load(f):
+                    writer.write(record)
+    return writer.records_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the columnar copy of the exported records")
+    parser.add_argument("--root", default=COLUMNAR_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="(re)build datasets from the <entity>_batches folders")
+    build.add_argument("entities", nargs="+")
+
+    query = commands.add_parser("query", help="print matching rows as JSON lines")
+    query.add_argument("entity")
+    query.add_argument("--columns", help="comma-separated columns (default: all)")
+    query.add_argument("--where", action="append", default=[], help="condition such as Category=UI Configuration")
+    query.add_argument("--from-month", help="first month (YYYY-MM) of CreatedDateTime")
+    query.add_argument("--to-month", help="last month (YYYY-MM) of CreatedDateTime")
+    query.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    store = ColumnarStore(args.root)
+    if args.command == "build":
+        for entity in args.entities:
+            print(f"{entity}: {build_from_batches(entity, store)} records")
+        return
+
+    try:
+        table = store.query(
+            args.entity,
+            columns=args.columns.split(",") if args.columns else None,
+            where=[parse_where(condition) for condition in args.where],
+            months=(args.from_month, args.to_month),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    for row in table.slice(0, args.limit).to_pylist():
+        print(json.dumps(row, ensure_ascii=False, default=str))
+    print(f"{table.num_rows} matching rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import base64
+import binascii
+import glob
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from html.parser import HTMLParser
+
+# Heavy-field offloading: HTML bodies are reduced to plain text for indexing and
+# the bulky parts (inline base64 images, attachments, the original HTML) are moved
+# into a content-addressed blob directory. Records keep a reference to each blob.
+
+# Where offloaded blobs are written: <BLOB_DIR>/<first 2 hex chars>/<sha256><ext>
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+
+# HTML fields converted to text; the text goes to <field>_Text, the HTML to a blob
+HTML_FIELDS = ("HTML_Description", "Details")
+# Binary fields moved to a blob as-is
+BINARY_FIELDS = ("AttachmentData",)
+
+DATA_URI_PATTERN = re.compile(r"^data:(?P<mime>[\w.+/-]+)?(?P<params>(;[\w-]+=[^;,]*)*);base64,(?P<data>.*)$", re.S)
+
+# Tags whose content is never visible text
+SKIPPED_TAGS = {"head", "script", "style", "title", "xml"}
+# Tags that start a new line in the text version
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "div", "dl", "dt", "dd", "h1", "h2", "h3", "h4", "h5", "h6",
+    "hr", "li", "ol", "p", "pre", "section", "table", "tr", "ul",
+}
+
+
+class BlobStore:
+    """Content-addressed files: identical content is stored once."""
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        self.blobs_written = 0
+        self.bytes_written = 0
+
+    def path(self, ref):
+        return os.path.join(self.root, ref)
+
+    def put(self, data, extension=""):
+        digest = hashlib.sha256(data).hexdigest()
+        ref = f"{digest[:2]}/{digest}{extension}"
+        path = self.path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self.blobs_written += 1
+            self.bytes_written += len(data)
+        return ref
+
+    def get(self, ref):
+        with open(self.path(ref), "rb") as f:
+            return f.read()
+
+
+def extension_for(mime_type):
+    if not mime_type:
+        return ""
+    return mimetypes.guess_extension(mime_type.lower()) or ""
+
+
+def offload_data_uri(uri, blobs):
+    # data:image/png;base64,... -> blob ref, or None if it isn't a base64 data URI
+    match = DATA_URI_PATTERN.match(uri.strip())
+    if not match:
+        return None
+    try:
+        data = base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return blobs.put(data, extension_for(match.group("mime")))
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self, blobs):
+        super().__init__(convert_charrefs=True)
+        self.blobs = blobs
+        self.parts = []
+        self.skip_depth = 0
+        self.images = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n- " if tag == "li" else "\n")
+        elif tag == "td" or tag == "th":
+            self.parts.append(" ")
+        elif tag == "img" and not self.skip_depth:
+            self._image(dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <img ... /> : no content, never affects skip depth
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag == "img" and not self.skip_depth:
+            self._image(dict(attrs))
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def _image(self, attrs):
+        src = attrs.get("src") or ""
+        ref = offload_data_uri(src, self.blobs) if src.startswith("data:") else None
+        if ref:
+            self.images.append(ref)
+            self.parts.append(f" [image: {ref}] ")
+        elif attrs.get("alt"):
+            self.parts.append(f" [image: {attrs['alt']}] ")
+
+    def text(self):
+        return normalize_text("".join(self.parts))
+
+
+def normalize_text(text):
+    # Collapse the whitespace HTML leaves behind; keep at most one blank line
+    text = text.replace("\xa0", " ").replace("\u200b", "")
+    lines = [" ".join(line.split()) for line in text.split("\n")]
+    text = "\n".join(lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def html_to_text(html, blobs):
+    """Returns (text, image refs); inline base64 images are written to `blobs`."""
+    parser = _TextExtractor(blobs)
+    parser.feed(html)
+    parser.close()
+    return parser.text(), parser.images
+
+
+def record_size(record):
+    return len(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+
+class OffloadStats:
+    """Per-entity report for the offloading stage.
+
+    Record sizes before and after are only measured with `measure_sizes`, since
+    that encodes every record twice more on top of the batch writer's encoding.
+    """
+
+    def __init__(self, entity, measure_sizes=False):
+        self.entity = entity
+        self.measure_sizes = measure_sizes
+        self.records = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.images = 0
+        self.attachments = 0
+
+    def report(self, blobs=None):
+        report = {"entity": self.entity, "records": self.records}
+        if self.measure_sizes:
+            report["bytes_before"] = self.bytes_before
+            report["bytes_after"] = self.bytes_after
+            report["reduction"] = round(1 - self.bytes_after / self.bytes_before, 3) if self.bytes_before else 0.0
+        report["images"] = self.images
+        report["attachments"] = self.attachments
+        if blobs is not None:
+            report["blobs_written"] = blobs.blobs_written
+            report["blob_bytes_written"] = blobs.bytes_written
+        return report
+
+
+def offload_record(record, blobs, stats=None):
+    """Return a copy of `record` with heavy fields converted or moved to `blobs`."""
+    result = dict(record)
+    images = 0
+    attachments = 0
+
+    for field in HTML_FIELDS:
+        html = result.pop(field, None)
+        if not isinstance(html, str):
+            if html is not None:
+                result[field] = html
+            continue
+        text, refs = html_to_text(html, blobs)
+        images += len(refs)
+        if text:
+            result[f"{field}_Text"] = text
+        result[f"{field}_Blob"] = blobs.put(html.encode("utf-8"), ".html")
+
+    for field in BINARY_FIELDS:
+        value = result.pop(field, None)
+        if not isinstance(value, str):
+            if value is not None:
+                result[field] = value
+            continue
+        try:
+            data = base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            data = value.encode("utf-8")
+        extension = result.get(f"{field}_FileType") or os.path.splitext(result.get(f"{field}_FileName", ""))[1]
+        result[f"{field}_Blob"] = blobs.put(data, extension.lower())
+        attachments += 1
+
+    if stats is not None:
+        stats.records += 1
+        if stats.measure_sizes:
+            stats.bytes_before += record_size(record)
+            stats.bytes_after += record_size(result)
+        stats.images += images
+        stats.attachments += attachments
+    return result
+
+
+def offload_batches(entity, output_root=".", blob_dir=BLOB_DIR):
+    """Rewrite an existing <entity>_batches folder with heavy fields offloaded."""
+    # Imported here because odata_export imports this module for export_entity()
+    from odata_export import write_batches
+
+    batch_dir = os.path.join(output_root, f"{entity}_batches")
+    paths = sorted(glob.glob(os.path.join(batch_dir, f"{entity}_batch_*.json")),
+                   key=lambda path: int(re.search(r"_(\d+)\.json$", path).group(1)))
+    blobs = BlobStore(blob_dir)
+    stats = OffloadStats(entity, measure_sizes=True)
+
+    def records():
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for record in json.load(f):
+                    yield offload_record(record, blobs, stats)
+
+    # Written next to the originals and swapped in at the end, since they are read lazily
+    staging_dir = batch_dir + ".offload"
+    write_batches(records(), staging_dir, entity)
+    shutil.rmtree(batch_dir)
+    os.replace(staging_dir, batch_dir)
+    return stats.report(blobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offload heavy fields from existing batch files into a blob directory")
+    parser.add_argument("entities", nargs="+", help="entities whose <entity>_batches folder should be rewritten")
+    parser.add_argument("--blob-dir", default=BLOB_DIR)
+    args = parser.parse_args()
+
+    for entity in args.entities:
+        print(json.dumps(offload_batches(entity, blob_dir=args.blob_dir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+
+from content_offload import BLOB_DIR, BlobStore, OffloadStats, offload_record
+from field_profiles import EXPORT_PROFILE, PROFILES, filter_clause
+from local_store import LocalStore, LOCAL_STORE_PATH, to_utc
+from odata_export import CHECKPOINT_DIR, ENTITIES, ODataExtractor, clean_record, create_session, write_batches
+from relationship_graph import build_graph_from_batches
+
+# Incremental sync: only fetch records whose LastModDateTime is at or after the
+# last sync, upsert them by RecId into the local store and write a changeset
+# file the indexer can apply. The first run for an entity is a full export.
+# Heavy fields are offloaded as in odata_export, so the store, the changesets
+# and the rebuilt batch files have the same layout as a full export.
+
+# Where changeset files are written for the indexer
+CHANGESET_DIR = os.getenv("CHANGESET_DIR", "changesets")
+
+
+def odata_datetime(value):
+    # DateTimeOffset literal for $filter, always in UTC
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def delta_filter(entity, high_water_mark, profile=EXPORT_PROFILE):
+    # ge, not gt: the mark has whole seconds, so records modified later in the same second
+    # would be missed; the boundary records fetched again are upserted idempotently
+    clause = f"LastModDateTime ge {high_water_mark}"
+    base = filter_clause(ENTITIES[entity].get("filter"), entity, profile)
+    return f"{base} and {clause}" if base else clause
+
+
+def write_changeset(entity, since, until, created, updated, records, changeset_dir=CHANGESET_DIR):
+    os.makedirs(changeset_dir, exist_ok=True)
+    path = os.path.join(changeset_dir, f"{entity}_{until.replace(':', '').replace('-', '')}.json")
+    changeset = {
+        "entity": entity,
+        "since": since,
+        "until": until,
+        "created": created,
+        "updated": updated,
+        "records": records,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(changeset, f, ensure_ascii=False)
+    return path
+
+
+def sync_entity(entity, store, full=False, changeset_dir=CHANGESET_DIR, profile=EXPORT_PROFILE, offload=True,
+                blob_dir=BLOB_DIR, **extractor_args):
+    """Fetch what changed since the last sync; returns a summary of the run."""
+    since = None if full else store.high_water_mark(entity)
+    odata_filter = delta_filter(entity, since, profile) if since else None
+
+    extractor = ODataExtractor(
+        entity,
+        odata_filter=odata_filter,
+        profile=profile,
+        checkpoint_dir=extractor_args.pop("checkpoint_dir", os.path.join(CHECKPOINT_DIR, "delta")),
+        **extractor_args
+    )
+    print(f"Syncing {entity} " + (f"changed after {since}" if since else "(full export)"))
+
+    records = [cleaned for cleaned in map(clean_record, extractor.fetch_all()) if cleaned.get("RecId")]
+    if offload:
+        blobs = BlobStore(blob_dir)
+        stats = OffloadStats(entity)
+        records = [offload_record(record, blobs, stats) for record in records]
+    created, updated = store.upsert(entity, records)
+
+    summary = {
+        "entity": entity,
+        "since": since,
+        "fetched": len(records),
+        "created": len(created),
+        "updated": len(updated),
+        "requests": extractor.requests_made,
+        "bytes_downloaded": extractor.bytes_downloaded,
+        "changeset": None,
+    }
+    if offload:
+        summary["offload"] = stats.report(blobs)
+
+    timestamps = [to_utc(r["LastModDateTime"]) for r in records if r.get("LastModDateTime")]
+    if timestamps:
+        until = odata_datetime(max(timestamps))
+        summary["changeset"] = write_changeset(entity, since, until, created, updated, records, changeset_dir)
+        # Move the mark only once the changeset is safely on disk
+        store.set_high_water_mark(entity, until)
+
+    extractor.clear_checkpoint()
+    print(f"{entity}: {len(created)} created, {len(updated)} updated, {store.count(entity)} in store")
+    return summary
+
+
+def write_batches_from_store(entity, store, output_root=".", offload=True, blob_dir=BLOB_DIR):
+    # Rebuild the <entity>_batches files from the local store. Records synced before
+    # offloading was added still hold their heavy fields; offloading the others again is a no-op.
+    records = store.records(entity)
+    if offload:
+        blobs = BlobStore(blob_dir)
+        records = (offload_record(record, blobs) for record in records)
+    return write_batches(records, os.path.join(output_root, f"{entity}_batches"), entity)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync Ivanti business objects into the local store")
+    parser.add_argument("entities", nargs="*", help=f"entities to sync (default: all): {', '.join(sorted(ENTITIES))}")
+    parser.add_argument("--full", action="store_true", help="ignore the high-water mark and fetch everything")
+    parser.add_argument("--write-batches", action="store_true", help="rewrite the batch files from the store afterwards")
+    parser.add_argument("--store", default=LOCAL_STORE_PATH)
+    parser.add_argument("--profile", default=EXPORT_PROFILE, choices=sorted(PROFILES), help="field profile ($select/$filter)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--keep-html", action="store_true", help="keep HTML fields and attachments inline in the store")
+    parser.add_argument("--blob-dir", default=BLOB_DIR)
+    args = parser.parse_args()
+
+    unknown = [entity for entity in args.entities if entity not in ENTITIES]
+    if unknown:
+        parser.error(f"unknown entities: {', '.join(unknown)}")
+
+    store = LocalStore(args.store)
+    extractor_args = {}
+    if args.workers:
+        extractor_args = {"workers": args.workers, "session": create_session(args.workers)}
+
+    for entity in args.entities or sorted(ENTITIES):
+        summary = sync_entity(entity, store, full=args.full, profile=args.profile, offload=not args.keep_html,
+                              blob_dir=args.blob_dir, **extractor_args)
+        print(json.dumps(summary))
+        if args.write_batches:
+            write_batches_from_store(entity, store, offload=not args.keep_html, blob_dir=args.blob_dir)
+
+    if args.write_batches:
+        print(f"Relationship graph: {json.dumps(build_graph_from_batches())}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
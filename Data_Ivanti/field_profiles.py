@@ -0,0 +1,85 @@
+import os
+
+# Field profiles: which columns (and which records) each kind of export asks the
+# Ivanti API for. A profile turns into the $select and $filter of every request,
+# so unused columns (*_Valid GUIDs, *_RecID links, audit fields) never leave the server.
+#
+#   full   every column, the entity's default filter (what the batch files hold)
+#   rag    only the text the chatbot answers from, plus keys and timestamps
+#   index  rag plus the facets and links used for filtering and relationships
+
+# Profile used when none is given (override with an environment variable)
+EXPORT_PROFILE = os.getenv("EXPORT_PROFILE", "full")
+
+# Always selected: needed for $orderby, de-duplication and the delta sync
+KEY_FIELDS = ["RecId", "CreatedDateTime", "LastModDateTime"]
+
+# Shared by the four FRS_Knowledge business objects
+KNOWLEDGE_TEXT = ["KnowledgeNumber", "Title", "Keywords", "Details"]
+KNOWLEDGE_FACETS = ["Status", "Category", "Subcategory", "OwnerTeam", "KnowledgeFullType"]
+# Only published articles should be used to answer questions
+PUBLISHED_ONLY = "Status eq 'Published'"
+
+RAG_FIELDS = {
+    "documents": KNOWLEDGE_TEXT + ["AttachmentData_FileName"],
+    "error_messages": KNOWLEDGE_TEXT + ["Resolution"],
+    "incidents": ["IncidentNumber", "Subject", "Symptom", "Resolution"],
+    "knowledges": KNOWLEDGE_TEXT,
+    "problems": ["ProblemNumber", "Subject", "Description"],
+    "references": KNOWLEDGE_TEXT,
+    "resolution_actions": ["ResolutionAction"],
+    "service_requests": ["ServiceReqNumber", "Subject", "Symptom", "Resolution"],
+    "sources": ["Source"],
+    "workarounds": ["Description", "Environment"],
+}
+
+INDEX_FIELDS = {
+    "documents": KNOWLEDGE_FACETS,
+    "error_messages": ["Status", "Category", "OwnerTeam"],
+    "incidents": ["Status", "Service", "Category", "Subcategory", "Priority", "Impact", "Urgency",
+                  "OwnerTeam", "ResolvedDateTime", "EntityLink_RecID"],
+    "knowledges": KNOWLEDGE_FACETS,
+    "problems": ["Status", "Service", "Category", "Priority", "Impact", "Urgency", "OwnerTeam", "Source"],
+    "references": KNOWLEDGE_FACETS,
+    "resolution_actions": [],
+    "service_requests": ["Status", "Service", "Category", "Urgency", "OwnerTeam", "ResolvedDateTime",
+                         "ServiceReqTemplateName", "EntityLink_RecID", "SvcReqTmplLink_RecID"],
+    "sources": [],
+    "workarounds": ["ParentLink_RecID"],
+}
+
+PROFILES = {
+    "full": {},
+    "rag": {
+        entity: {
+            "select": KEY_FIELDS + fields,
+            "filter": PUBLISHED_ONLY if "KnowledgeNumber" in fields else None,
+        }
+        for entity, fields in RAG_FIELDS.items()
+    },
+    "index": {
+        entity: {
+            "select": KEY_FIELDS + fields + INDEX_FIELDS[entity],
+            "filter": PUBLISHED_ONLY if "KnowledgeNumber" in fields else None,
+        }
+        for entity, fields in RAG_FIELDS.items()
+    },
+}
+
+
+def entity_profile(entity, profile=EXPORT_PROFILE):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown field profile '{profile}', expected one of {', '.join(PROFILES)}")
+    return PROFILES[profile].get(entity, {})
+
+
+def select_clause(entity, profile=EXPORT_PROFILE):
+    # None means every column
+    fields = entity_profile(entity, profile).get("select")
+    return ",".join(dict.fromkeys(fields)) if fields else None
+
+
+def filter_clause(base_filter, entity, profile=EXPORT_PROFILE):
+    # The profile's filter narrows the entity's own filter, it never replaces it
+    clauses = [clause for clause in (base_filter, entity_profile(entity, profile).get("filter")) if clause]
+    return " and ".join(clauses) or None
@@ -0,0 +1,75 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+# SQLite copy of the exported Ivanti records, one row per (entity, RecId).
+# The delta sync upserts into it; batch files and other outputs can be rebuilt from it.
+
+LOCAL_STORE_PATH = os.getenv("IVANTI_STORE_PATH", "ivanti_store.db")
+
+
+def to_utc(value):
+    # Ivanti timestamps carry an offset (2023-04-24T10:02:39+02:00); compare them in UTC
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+
+class LocalStore:
+    def __init__(self, path=LOCAL_STORE_PATH):
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "entity TEXT, rec_id TEXT, last_mod TEXT, data TEXT, PRIMARY KEY (entity, rec_id))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state ("
+                "entity TEXT PRIMARY KEY, high_water_mark TEXT, synced_at TEXT)"
+            )
+
+    def high_water_mark(self, entity):
+        row = self.connection.execute(
+            "SELECT high_water_mark FROM sync_state WHERE entity = ?", (entity,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, entity, mark):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (entity, mark, datetime.now(timezone.utc).isoformat())
+            )
+
+    def reset(self, entity):
+        with self.connection:
+            self.connection.execute("DELETE FROM sync_state WHERE entity = ?", (entity,))
+
+    def upsert(self, entity, records):
+        """Insert or replace records by RecId; returns (created, updated) RecId lists."""
+        created, updated = [], []
+        with self.connection:
+            for record in records:
+                rec_id = record["RecId"]
+                exists = self.connection.execute(
+                    "SELECT 1 FROM records WHERE entity = ? AND rec_id = ?", (entity, rec_id)
+                ).fetchone()
+                (updated if exists else created).append(rec_id)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                    (entity, rec_id, record.get("LastModDateTime"), json.dumps(record, ensure_ascii=False))
+                )
+        return created, updated
+
+    def records(self, entity):
+        # Stream the stored records back in RecId order
+        cursor = self.connection.execute(
+            "SELECT data FROM records WHERE entity = ? ORDER BY rec_id", (entity,)
+        )
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def count(self, entity):
+        return self.connection.execute("SELECT COUNT(*) FROM records WHERE entity = ?", (entity,)).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
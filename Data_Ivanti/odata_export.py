@@ -0,0 +1,423 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from columnar_store import COLUMNAR_DIR, ColumnarStore
+from content_offload import BLOB_DIR, BlobStore, OffloadStats, offload_record
+from field_profiles import EXPORT_PROFILE, PROFILES, filter_clause, select_clause
+from relationship_graph import RELATIONSHIP_GRAPH_PATH, build_graph_from_batches
+
+# Shared extraction engine for the Ivanti OData business objects.
+# Every entity script (Incidents.py, Knowledges.py, ...) calls export_entity() from here.
+
+# API location and key (override with environment variables)
+IVANTI_BASE_URL = os.getenv("IVANTI_BASE_URL", "https://trainer.thinktanks.co.za/HEAT/api/odata/businessobject")
+IVANTI_API_KEY = os.getenv("IVANTI_API_KEY", "918E6C7ABA274AEFA0B3B1009168C459")
+
+# Records per request (the Ivanti API caps $top at 100)
+PAGE_SIZE = 100
+# Pages fetched at the same time when the server reports a total count
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "4"))
+# Retries per page for connection errors, throttling (429) and server errors
+EXPORT_RETRIES = int(os.getenv("EXPORT_RETRIES", "5"))
+# Where partially exported pages are kept so an interrupted export can resume
+CHECKPOINT_DIR = os.getenv("EXPORT_CHECKPOINT_DIR", ".checkpoints")
+
+# Maximum size of each batch file (2MB in bytes)
+MAX_FILE_SIZE_BYTES = 2 * 1024 * 1024
+
+# Business object and optional filter for each entity type.
+# Output goes to <entity>_batches/<entity>_batch_<n>.json
+ENTITIES = {
+    "documents": {"object": "FRS_Knowledge__Documents"},
+    "error_messages": {"object": "FRS_Knowledge__ErrorMessages"},
+    "incidents": {"object": "Incidents", "filter": "Status eq 'Resolved'"},
+    "knowledges": {"object": "FRS_Knowledges"},
+    "problems": {"object": "Problems"},
+    "references": {"object": "FRS_Knowledge__References"},
+    "resolution_actions": {"object": "ProblemResolutionActions"},
+    "service_requests": {"object": "ServiceReqs", "filter": "Resolution ne '$NULL'"},
+    "sources": {"object": "ProblemSources"},
+    "workarounds": {"object": "ProblemWorkarounds"},
+}
+
+
+def create_session(pool_size=EXPORT_WORKERS, retries=EXPORT_RETRIES):
+    # One pooled session per export; retries back off exponentially and honour Retry-After
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        backoff_jitter=0.25,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Authorization"] = f"rest_api_key={IVANTI_API_KEY}"
+    return session
+
+
+def _write_json(path, data):
+    # Write to a temporary file first so a crash never leaves a half-written page behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class ODataExtractor:
+    """Fetches every record of one entity, concurrently and resumably.
+
+    The first page asks for `$count=true`. If the server returns a total, the
+    remaining pages are fetched in parallel with `$skip`/`$top` (ordered by
+    RecId so pages don't overlap). Otherwise it falls back to following
+    `@odata.nextLink` one page at a time. Each page is saved under the
+    checkpoint directory as soon as it arrives, so a rerun after a failure only
+    fetches the pages that are still missing. The field profile (see
+    field_profiles) decides the `$select` and narrows the `$filter`.
+    """
+
+    def __init__(self, entity, session=None, base_url=IVANTI_BASE_URL, workers=EXPORT_WORKERS,
+                 page_size=PAGE_SIZE, checkpoint_dir=CHECKPOINT_DIR, odata_filter=None, profile=EXPORT_PROFILE):
+        self.entity = entity
+        self.config = ENTITIES[entity]
+        self.profile = profile
+        self.select = select_clause(entity, profile)
+        # Callers (e.g. the delta sync) can replace the entity's default $filter
+        if odata_filter is None:
+            odata_filter = filter_clause(self.config.get("filter"), entity, profile)
+        self.odata_filter = odata_filter
+        self.session = session or create_session(workers)
+        self.url = f"{base_url}/{self.config['object']}"
+        self.workers = workers
+        self.page_size = page_size
+        self.checkpoint_path = os.path.join(checkpoint_dir, entity)
+        self.requests_made = 0
+        self.bytes_downloaded = 0
+        self.parse_seconds = 0.0
+
+    def query_params(self):
+        params = {"$top": self.page_size, "$orderby": "RecId"}
+        if self.select:
+            params["$select"] = self.select
+        if self.odata_filter:
+            params["$filter"] = self.odata_filter
+        return params
+
+    # --- Checkpoint files ---
+
+    def _page_path(self, index):
+        return os.path.join(self.checkpoint_path, f"page_{index:06d}.json")
+
+    def _state_path(self):
+        return os.path.join(self.checkpoint_path, "state.json")
+
+    def _load_state(self):
+        # A checkpoint is only reused if it was made with the same query
+        if os.path.exists(self._state_path()):
+            with open(self._state_path(), encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("query") == self.query_params():
+                return state
+            print(f"Query for {self.entity} changed, discarding old checkpoint")
+        self.clear_checkpoint()
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+        return {"query": self.query_params()}
+
+    def _save_state(self, state):
+        _write_json(self._state_path(), state)
+
+    def clear_checkpoint(self):
+        shutil.rmtree(self.checkpoint_path, ignore_errors=True)
+
+    # --- Fetching ---
+
+    def _get(self, url, params=None):
+        self.requests_made += 1
+        response = self.session.get(url, params=params, timeout=60)
+        response.raise_for_status()  # retries are already exhausted at this point
+        start = time.perf_counter()
+        data = json.loads(response.content)
+        self.parse_seconds += time.perf_counter() - start
+        self.bytes_downloaded += len(response.content)
+        return data
+
+    def _fetch_page(self, index):
+        params = dict(self.query_params(), **{"$skip": index * self.page_size})
+        data = self._get(self.url, params)
+        _write_json(self._page_path(index), data.get("value", []))
+        return index
+
+    def _read_page(self, index):
+        with open(self._page_path(index), encoding="utf-8") as f:
+            return json.load(f)
+
+    def _pages_partitioned(self, state):
+        pages = max(1, math.ceil(state["total"] / self.page_size))
+        missing = [index for index in range(pages) if not os.path.exists(self._page_path(index))]
+        if missing:
+            print(f"Fetching {len(missing)} of {pages} pages of {self.entity} with {self.workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {index: pool.submit(self._fetch_page, index) for index in missing}
+            # Hand pages over in order as soon as each one is on disk
+            for index in range(pages):
+                if index in futures:
+                    futures[index].result()  # re-raises a page that failed after all retries
+                yield self._read_page(index)
+
+    def _pages_sequential(self, state):
+        # Pages saved by an earlier, interrupted run come first
+        for index in range(state["pages"]):
+            yield self._read_page(index)
+
+        # Server didn't report a count: follow @odata.nextLink from where we stopped
+        while state.get("next_url"):
+            print(f"Fetching: {state['next_url']}")
+            data = self._get(state["next_url"])
+            page = data.get("value", [])
+            index = state["pages"]
+            _write_json(self._page_path(index), page)
+            state["pages"] = index + 1
+            state["next_url"] = data.get("@odata.nextLink")
+            self._save_state(state)
+            yield page
+
+    def iter_pages(self):
+        """Yield the entity's pages in order; only one page is held in memory at a time."""
+        state = self._load_state()
+
+        # First page tells us whether the pages can be fetched in parallel
+        if "pages" not in state and "total" not in state:
+            data = self._get(self.url, dict(self.query_params(), **{"$count": "true"}))
+            _write_json(self._page_path(0), data.get("value", []))
+            if data.get("@odata.count") is not None:
+                state["total"] = int(data["@odata.count"])
+            else:
+                state["pages"] = 1
+                state["next_url"] = data.get("@odata.nextLink")
+            self._save_state(state)
+
+        if "total" in state:
+            yield from self._pages_partitioned(state)
+        else:
+            yield from self._pages_sequential(state)
+
+    def iter_records(self):
+        # Records in page order, dropping any record seen twice (pages can shift while exporting)
+        seen = set()
+        for page in self.iter_pages():
+            for record in page:
+                key = record.get("RecId")
+                if key is not None and key in seen:
+                    continue
+                seen.add(key)
+                yield record
+
+    def fetch_all(self):
+        return list(self.iter_records())
+
+
+def clean_record(record):
+    # Remove keys with None, empty string, empty list, or empty dict values
+    return {key: value for key, value in record.items() if value not in [None, "", [], {}]}
+
+
+class BatchWriter:
+    """Streams records into rolling <prefix>_batch_<n>.json files.
+
+    Each record is encoded once and written straight to disk in the same
+    layout json.dump(batch, indent=2) produces. Batch sizes are tracked from
+    the bytes actually written, so every file stays under max_file_size_bytes
+    (a single record larger than the limit gets a file of its own).
+
+    Files are written as .tmp and only renamed into place, replacing the
+    previous export, when the writer is closed without an exception; a failed
+    export leaves the previous batches as they were.
+    """
+
+    HEADER = b"[\n"
+    SEPARATOR = b",\n"
+    FOOTER = b"\n]"
+
+    def __init__(self, output_dir, prefix, max_file_size_bytes=MAX_FILE_SIZE_BYTES):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_file_size_bytes = max_file_size_bytes
+        self.batch_num = 0
+        self.file = None
+        self.file_size = 0
+        self.file_records = 0
+        self.records_written = 0
+        self.bytes_written = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _path(self, batch_num):
+        return os.path.join(self.output_dir, f"{self.prefix}_batch_{batch_num}.json")
+
+    def _encode(self, record):
+        # Indent the record one level, as it sits inside the batch's JSON array
+        text = json.dumps(record, indent=2, ensure_ascii=False)
+        return ("  " + text.replace("\n", "\n  ")).encode("utf-8")
+
+    def _open_next(self):
+        self.batch_num += 1
+        self.file = open(self._path(self.batch_num) + ".tmp", "wb")
+        self.file.write(self.HEADER)
+        self.file_size = len(self.HEADER)
+        self.file_records = 0
+
+    def _close_file(self):
+        self.file.write(self.FOOTER)
+        self.file_size += len(self.FOOTER)
+        self.file.close()
+        self.bytes_written += self.file_size
+        print(f"Wrote batch {self.batch_num} with {self.file_records} records ({self.file_size} bytes)")
+        self.file = None
+
+    def write(self, record):
+        encoded = self._encode(record)
+
+        # Start a new file if this record would push the current one over the limit
+        if self.file is not None and self.file_records:
+            projected = self.file_size + len(self.SEPARATOR) + len(encoded) + len(self.FOOTER)
+            if projected > self.max_file_size_bytes:
+                self._close_file()
+
+        if self.file is None:
+            self._open_next()
+        elif self.file_records:
+            self.file.write(self.SEPARATOR)
+            self.file_size += len(self.SEPARATOR)
+
+        self.file.write(encoded)
+        self.file_size += len(encoded)
+        self.file_records += 1
+        self.records_written += 1
+
+    def close(self):
+        if self.file is not None:
+            self._close_file()
+        for batch_num in range(1, self.batch_num + 1):
+            os.replace(self._path(batch_num) + ".tmp", self._path(batch_num))
+
+        # Remove batch files left over from an earlier, larger export
+        stale = self.batch_num + 1
+        while os.path.exists(self._path(stale)):
+            os.remove(self._path(stale))
+            stale += 1
+        return self.batch_num
+
+    def abort(self):
+        # Drop this run's files; the previous export stays in place
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for batch_num in range(1, self.batch_num + 1):
+            if os.path.exists(self._path(batch_num) + ".tmp"):
+                os.remove(self._path(batch_num) + ".tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_batches(records, output_dir, prefix, max_file_size_bytes=MAX_FILE_SIZE_BYTES):
+    # Split records into JSON files that each stay under max_file_size_bytes
+    with BatchWriter(output_dir, prefix, max_file_size_bytes) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.batch_num
+
+
+def export_entity(entity, output_root=".", offload=True, blob_dir=BLOB_DIR, columnar_dir=None, offload_sizes=False,
+                  **extractor_args):
+    """Fetch, clean and batch one entity; returns the number of records written.
+
+    With `offload`, HTML fields are converted to text and images, attachments
+    and the original HTML are moved into the blob directory (see content_offload);
+    `offload_sizes` adds the records' sizes before and after to its report.
+    With `columnar_dir`, the same records also go to a Parquet dataset (see columnar_store).
+    """
+    extractor = ODataExtractor(entity, **extractor_args)
+    blobs = BlobStore(blob_dir) if offload else None
+    stats = OffloadStats(entity, measure_sizes=offload_sizes)
+    columnar = ColumnarStore(columnar_dir).writer(entity) if columnar_dir else None
+
+    fetched = 0
+
+    # Records stream through one page at a time: fetch (concurrent, retried,
+    # resumable), clean, offload heavy fields, then append to the current batch file under 2MB
+    with BatchWriter(os.path.join(output_root, f"{entity}_batches"), entity) as writer:
+        for record in extractor.iter_records():
+            fetched += 1
+            cleaned = clean_record(record)
+            if cleaned:
+                cleaned = offload_record(cleaned, blobs, stats) if offload else cleaned
+                writer.write(cleaned)
+                if columnar is not None:
+                    columnar.write(cleaned)
+
+    if columnar is not None:
+        columnar.close()
+        print(f"Columnar data: {columnar.records_written} {entity} in {columnar_dir}")
+
+    print(f"Fetched {fetched} total {entity} in {extractor.requests_made} requests "
+          f"({extractor.bytes_downloaded} bytes, {extractor.parse_seconds:.2f}s parsing, profile {extractor.profile})")
+    print(f"Cleaned data: {writer.records_written} valid {entity} in {writer.batch_num} batches ({writer.bytes_written} bytes)")
+    if offload:
+        print(f"Offloaded heavy fields: {json.dumps(stats.report(blobs))}")
+
+    # The export finished, so the checkpoint is no longer needed
+    extractor.clear_checkpoint()
+    print(f"All {entity} batches created successfully.")
+    return writer.records_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Ivanti business objects to JSON batch files")
+    parser.add_argument("entities", nargs="*", help=f"entities to export (default: all): {', '.join(sorted(ENTITIES))}")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    parser.add_argument("--base-url", default=IVANTI_BASE_URL)
+    parser.add_argument("--profile", default=EXPORT_PROFILE, choices=sorted(PROFILES), help="field profile ($select/$filter)")
+    parser.add_argument("--keep-html", action="store_true", help="keep HTML fields and attachments inline in the batches")
+    parser.add_argument("--blob-dir", default=BLOB_DIR)
+    parser.add_argument("--offload-sizes", action="store_true", help="report record sizes before and after offloading")
+    parser.add_argument("--columnar", action="store_true", help=f"also write a Parquet dataset under {COLUMNAR_DIR}/")
+    parser.add_argument("--no-graph", action="store_true", help=f"don't rebuild {RELATIONSHIP_GRAPH_PATH} afterwards")
+    args = parser.parse_args()
+
+    unknown = [entity for entity in args.entities if entity not in ENTITIES]
+    if unknown:
+        parser.error(f"unknown entities: {', '.join(unknown)}")
+
+    session = create_session(args.workers)
+    for entity in args.entities or sorted(ENTITIES):
+        export_entity(entity, session=session, base_url=args.base_url, workers=args.workers,
+                      profile=args.profile, offload=not args.keep_html, blob_dir=args.blob_dir,
+                      columnar_dir=COLUMNAR_DIR if args.columnar else None, offload_sizes=args.offload_sizes)
+
+    # Links can point across entities, so the graph is rebuilt from all the batches on disk
+    if not args.no_graph:
+        print(f"Relationship graph: {json.dumps(build_graph_from_batches())}")
+
+
+if __name__ == "__main__":
+    main()
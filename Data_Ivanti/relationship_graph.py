@@ -0,0 +1,126 @@
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from collections import Counter
+
+# Adjacency index of the links between exported records, built from the batch
+# files after an export. Ivanti stores foreign keys as <Link>_RecID columns
+# (a workaround's ParentLink_RecID is its problem) and a few links by name (a
+# problem's Source is a ProblemSources record). Both directions are stored, so
+# the records linked to any RecId are one dictionary lookup away:
+#
+#   {"stats": {counts},
+#    "nodes": {RecId: entity},
+#    "links": {RecId: [[other RecId, link field, "out" | "in"], ...]}}
+#
+# "out" means this record holds the key, "in" that the other record points here.
+# Keys to records that weren't exported (contacts, org units, escalation
+# watches) are counted per field and dropped.
+
+RELATIONSHIP_GRAPH_PATH = os.getenv("RELATIONSHIP_GRAPH_PATH", "relationships.json")
+
+# Every Ivanti foreign key column ends with this (the record's own key is "RecId")
+LINK_SUFFIX = "_RecID"
+
+# Links stored by display value: (entity, field) -> (target entity, target field)
+VALUE_LINKS = {
+    ("problems", "Source"): ("sources", "Source"),
+    ("problems", "ResolutionAction"): ("resolution_actions", "ResolutionAction"),
+}
+
+
+def batch_records(entity, output_root="."):
+    def batch_number(path):
+        return int(re.search(r"_(\d+)\.json$", path).group(1))
+
+    for path in sorted(glob.glob(os.path.join(output_root, f"{entity}_batches", "*.json")), key=batch_number):
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def exported_entities(output_root="."):
+    folders = glob.glob(os.path.join(output_root, "*_batches"))
+    # FRS_Knowledges repeats every document, reference and error message, so
+    # knowledges go last and each RecId keeps its more specific entity
+    return sorted((os.path.basename(folder)[:-len("_batches")] for folder in folders),
+                  key=lambda entity: (entity == "knowledges", entity))
+
+
+def record_links(entity, record):
+    """(field, RecId) for the record's foreign keys and (field, (entity, value)) for its by-name links."""
+    for field, value in record.items():
+        if field.endswith(LINK_SUFFIX) and isinstance(value, str) and value:
+            yield field[:-len(LINK_SUFFIX)], value
+    for (source_entity, field), (target_entity, _) in VALUE_LINKS.items():
+        if source_entity == entity and record.get(field):
+            yield field, (target_entity, record[field])
+
+
+def build_graph(records):
+    """Build the graph from (entity, record) pairs."""
+    start = time.perf_counter()
+    nodes = {}
+    names = {}
+    pending = []
+    for entity, record in records:
+        rec_id = record.get("RecId")
+        if not rec_id:
+            continue
+        nodes.setdefault(rec_id, entity)
+        for (target_entity, target_field) in VALUE_LINKS.values():
+            if entity == target_entity and record.get(target_field):
+                names[(target_entity, record[target_field])] = rec_id
+        pending.extend((rec_id, field, target) for field, target in record_links(entity, record))
+
+    links = {}
+    unresolved = Counter()
+    seen = set()
+    for rec_id, field, target in pending:
+        target = names.get(target) if isinstance(target, tuple) else target
+        if target not in nodes or target == rec_id:
+            unresolved[field] += 1
+            continue
+        if (rec_id, field, target) in seen:
+            continue
+        seen.add((rec_id, field, target))
+        links.setdefault(rec_id, []).append([target, field, "out"])
+        links.setdefault(target, []).append([rec_id, field, "in"])
+
+    stats = {
+        "records": len(nodes),
+        "links": len(seen),
+        "linked_records": len(links),
+        "unresolved": dict(unresolved.most_common()),
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+    return {"stats": stats, "nodes": nodes, "links": links}
+
+
+def write_graph(graph, path=RELATIONSHIP_GRAPH_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(graph, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def build_graph_from_batches(output_root=".", path=None):
+    """Rebuild the graph from every <entity>_batches folder under output_root; returns its stats."""
+    entities = exported_entities(output_root)
+    graph = build_graph((entity, record) for entity in entities for record in batch_records(entity, output_root))
+    write_graph(graph, path or os.path.join(output_root, RELATIONSHIP_GRAPH_PATH))
+    return graph["stats"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the RecId relationship graph from the exported batches")
+    parser.add_argument("--output-root", default=".")
+    parser.add_argument("--output", default=None, help=f"graph file (default: <output-root>/{RELATIONSHIP_GRAPH_PATH})")
+    args = parser.parse_args()
+    print(json.dumps(build_graph_from_batches(args.output_root, args.output)))
+
+
+if __name__ == "__main__":
+    main()
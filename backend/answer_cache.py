@@ -0,0 +1,245 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Answer cache settings (can be overridden from the .env file)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SQLITE_PATH = os.getenv("ANSWER_CACHE_SQLITE_PATH")  # unset = memory only
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "false").lower() == "true"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+
+def normalize_prompt(prompt):
+    # "How do I reset my password?" and "how do i reset my password" share an entry
+    return " ".join(PUNCTUATION_PATTERN.sub(" ", prompt.lower()).split())
+
+
+def content_version(chunk):
+    # The local indexes keep the chunker's content_hash; Azure Search results only carry the content
+    if chunk.get("content_hash"):
+        return chunk["content_hash"]
+    return hashlib.sha1(f"{chunk.get('title') or ''}\n{chunk.get('content') or ''}".encode("utf-8")).hexdigest()
+
+
+def chunk_fingerprint(chunks):
+    # Changes whenever retrieval returns a different set of chunks for the question, or one of
+    # them was edited: chunk IDs are stable ({rec_id}_{index}), so their content counts too
+    chunks = sorted(f"{chunk.get('chunk_id')}:{content_version(chunk)}" for chunk in chunks)
+    return hashlib.sha1("\n".join(chunks).encode("utf-8")).hexdigest()
+
+
+def cache_key(normalized_prompt, fingerprint):
+    return hashlib.sha1(f"{normalized_prompt}\n{fingerprint}".encode("utf-8")).hexdigest()
+
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class CachedAnswer:
+    key: str
+    fingerprint: str
+    answer: str
+    created_at: float
+    embedding: list = None
+
+
+class SqliteAnswerStore:
+    """On-disk copy of the cache so answers survive a restart."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT, answer TEXT, created_at REAL, embedding TEXT)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS answers_fingerprint ON answers (fingerprint)")
+
+    def _row_to_entry(self, row):
+        key, fingerprint, answer, created_at, embedding = row
+        return CachedAnswer(key, fingerprint, answer, created_at, json.loads(embedding) if embedding else None)
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT key, fingerprint, answer, created_at, embedding FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def by_fingerprint(self, fingerprint):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT key, fingerprint, answer, created_at, embedding FROM answers WHERE fingerprint = ?", (fingerprint,)
+            ).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
+    def put(self, entry):
+        embedding = json.dumps(entry.embedding) if entry.embedding is not None else None
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (entry.key, entry.fingerprint, entry.answer, entry.created_at, embedding)
+            )
+
+    def delete(self, key):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def purge_older_than(self, cutoff):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM answers WHERE created_at < ?", (cutoff,))
+
+    def trim(self, keep):
+        # Keep only the `keep` newest answers
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM answers WHERE key NOT IN (SELECT key FROM answers ORDER BY created_at DESC LIMIT ?)", (keep,)
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM answers")
+
+    def close(self):
+        self.connection.close()
+
+
+class AnswerCache:
+    """LRU + TTL cache of generated answers.
+
+    Entries are keyed on the normalized prompt plus a fingerprint of the chunks
+    retrieved for it, so an answer stops matching as soon as the index returns
+    different (or edited) chunks. The store holds the same entries as memory:
+    evicted answers are deleted from it too. With `semantic=True`, a miss falls back to the
+    cached answer with the most similar prompt embedding among entries that
+    share the same chunk fingerprint.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL,
+                 store=None, semantic=ANSWER_CACHE_SEMANTIC, similarity=ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.semantic = semantic
+        self.similarity = similarity
+        self.entries = OrderedDict()
+        self.by_fingerprint = {}
+        self.counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        if self.store is not None:
+            self.store.purge_older_than(time.time() - self.ttl_seconds)
+            # Stores written with a larger max_entries (or before evictions reached the store)
+            self.store.trim(self.max_entries)
+
+    def _expired(self, entry):
+        return time.time() - entry.created_at >= self.ttl_seconds
+
+    def _remember(self, entry):
+        # Add to the in-memory LRU, evicting the least recently used entry when full
+        self.entries[entry.key] = entry
+        self.entries.move_to_end(entry.key)
+        self.by_fingerprint.setdefault(entry.fingerprint, set()).add(entry.key)
+
+        while len(self.entries) > self.max_entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.by_fingerprint.get(evicted.fingerprint, set()).discard(evicted.key)
+            if self.store is not None:
+                self.store.delete(evicted.key)
+            self.counters["evictions"] += 1
+
+    def _forget(self, entry):
+        self.entries.pop(entry.key, None)
+        self.by_fingerprint.get(entry.fingerprint, set()).discard(entry.key)
+        if self.store is not None:
+            self.store.delete(entry.key)
+        self.counters["expired"] += 1
+
+    def _lookup_exact(self, key):
+        entry = self.entries.get(key)
+        if entry is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._remember(entry)
+
+        if entry is not None and self._expired(entry):
+            self._forget(entry)
+            return None
+
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _lookup_similar(self, fingerprint, embedding):
+        candidates = [self.entries[key] for key in self.by_fingerprint.get(fingerprint, ())]
+        if self.store is not None:
+            known = {entry.key for entry in candidates}
+            candidates += [entry for entry in self.store.by_fingerprint(fingerprint) if entry.key not in known]
+
+        best, best_score = None, self.similarity
+        for entry in candidates:
+            if entry.embedding is None or self._expired(entry):
+                continue
+            score = cosine_similarity(embedding, entry.embedding)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def get(self, prompt, chunks, embedding=None):
+        fingerprint = chunk_fingerprint(chunks)
+        entry = self._lookup_exact(cache_key(normalize_prompt(prompt), fingerprint))
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry.answer
+
+        if self.semantic and embedding is not None:
+            entry = self._lookup_similar(fingerprint, embedding)
+            if entry is not None:
+                self.counters["semantic_hits"] += 1
+                return entry.answer
+
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, prompt, chunks, answer, embedding=None):
+        fingerprint = chunk_fingerprint(chunks)
+        entry = CachedAnswer(cache_key(normalize_prompt(prompt), fingerprint), fingerprint, answer, time.time(), embedding)
+        self._remember(entry)
+        if self.store is not None:
+            self.store.put(entry)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_fingerprint.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+        hits = self.counters["hits"] + self.counters["semantic_hits"]
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "persistent": self.store is not None,
+            "semantic": self.semantic,
+        }
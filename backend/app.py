@@ -1,20 +1,239 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-from azure.search.documents.models import QueryType
-from openai import AzureOpenAI
+from azure.search.documents.aio import SearchClient
+from openai import AsyncAzureOpenAI
+import asyncio
+import httpx
+import json
+import logging
+import math
 import os
-import traceback
+import time
 
 # Load environment variables from a .env file
 load_dotenv()
 
+# Local modules read their settings from the environment, so import them after .env is loaded
+from telemetry import REQUEST_ID_HEADER, RequestTelemetryMiddleware, configure_logging, record_span, registry, request_id, span
+from retrieval import embed_query, fetch_all_documents, RETRIEVAL_MODE, ROUTING_SELECT_FIELDS
+from corpus_cache import CorpusCache
+from context_packer import count_tokens, pack_context
+from filters import RetrievalFilters
+from answer_cache import AnswerCache, SqliteAnswerStore, ANSWER_CACHE_ENABLED, ANSWER_CACHE_SQLITE_PATH
+from sessions import (
+    SessionStore, SqliteSessionStore, SESSION_SQLITE_PATH, SESSION_SUMMARY_MAX_TOKENS, history_messages, turn_text
+)
+from bm25_index import BM25Index
+from link_expansion import LINK_EXPANSION_ENABLED, LinkExpander
+from retrievers import (
+    AzureSearchRetriever, HybridRetriever, LocalBM25Retriever, LocalVectorRetriever, RETRIEVER_BACKEND, RETRIEVER_BACKENDS
+)
+from vector_index import VectorIndex, query_embedder
+from generation_gateway import GenerationGateway, GenerationUnavailable
+from model_router import ROUTING_ENABLED, RouteStats, choose_route, extractive_answer, large_route
+
+configure_logging()
+logger = logging.getLogger("backend.app")
+
+# Load Azure Search credentials and settings
+AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
+AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
+AZURE_SEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME")
+
+# Size of the shared connection pool to Azure OpenAI
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+
+# Batch endpoint: prompts answered at the same time (a request may ask for fewer) and prompts per request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "1000"))
+
+# Async clients, created once in the lifespan hook so every request shares their connection pools.
+# Tests and benchmarks can put their own clients (and retriever) in place before the app starts.
+search_client = None
+openai_client = None
+retriever = None
+link_expander = None
+# Every chat completion goes through it: coalescing, concurrency and token budget, backoff on 429
+generation = None
+
+def create_search_client():
+    # Connect to Azure Search
+    return SearchClient(
+        endpoint=AZURE_SEARCH_ENDPOINT,
+        index_name=AZURE_SEARCH_INDEX_NAME,
+        credential=AzureKeyCredential(AZURE_SEARCH_KEY)
+    )
+
+def create_openai_client():
+    # Set up connection to Azure OpenAI
+    return AsyncAzureOpenAI(
+        azure_endpoint=os.getenv("OPENAI_API_BASE"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        api_version=os.getenv("OPENAI_API_VERSION"),
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+        )
+    )
+
+if RETRIEVER_BACKEND not in RETRIEVER_BACKENDS:
+    raise ValueError(f"Unknown RETRIEVER_BACKEND: {RETRIEVER_BACKEND}")
+
+# Keep a warm copy of the whole index when the full corpus is sent to the model
+CORPUS_CACHE_ENABLED = RETRIEVER_BACKEND == "azure" and os.getenv(
+    "CORPUS_CACHE_ENABLED", str(RETRIEVAL_MODE == "full")
+).lower() == "true"
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+corpus_cache = CorpusCache(lambda: fetch_all_documents(search_client))
+
+# Reuse answers to repeated questions while the retrieved chunks stay the same
+answer_cache = AnswerCache(store=SqliteAnswerStore(ANSWER_CACHE_SQLITE_PATH) if ANSWER_CACHE_SQLITE_PATH else None)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Summarize this support conversation for the assistant that continues it. Keep the user's problem, "
+    "the systems and error messages involved, the steps already suggested and what the user reported back. "
+    "Merge the new turns into the summary so far. Be brief."
+)
+
+async def summarize_history(summary, turns):
+    # Rolling summary of a conversation's older turns, written by the chat model
+    transcript = "\n\n".join(turn_text(turn) for turn in turns)
+    completion = await generation.complete(
+        model=os.getenv("OPENAI_DEPLOYMENT"),
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Summary so far:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ],
+        max_tokens=SESSION_SUMMARY_MAX_TOKENS,
+        temperature=0.2
+    )
+    count_usage([], completion.choices[0].message.content, completion.usage)
+    return completion.choices[0].message.content
+
+# Recent turns of the conversations that send a conversation_id
+session_store = SessionStore(
+    store=SqliteSessionStore(SESSION_SQLITE_PATH) if SESSION_SQLITE_PATH else None,
+    summarize=summarize_history
+)
+# Compactions run after the answer has gone out; the set keeps their tasks alive
+compaction_tasks = set()
+
+# Metrics on /metrics next to the request and span latency histograms (see telemetry.py)
+tokens_total = registry.counter("rag_tokens_total", "Tokens by kind: context (packed chunks), prompt, completion", ("kind",))
+cache_lookups = registry.counter(
+    "rag_cache_lookups_total", "Lookups by cache (answer, session_chunks) and result (hit, miss)", ("cache", "result")
+)
+
+def cache_hit_ratios():
+    counts = dict(cache_lookups.values)
+    ratios = {}
+    for cache in ("answer", "session_chunks"):
+        hits, misses = counts.get((cache, "hit"), 0), counts.get((cache, "miss"), 0)
+        ratios[(cache,)] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+    return ratios
+
+registry.gauge("rag_cache_hit_ratio", "Share of cache lookups that hit since startup", cache_hit_ratios, ("cache",))
+registry.gauge("rag_corpus_documents", "Documents in the cached corpus snapshot", lambda: {(): len(corpus_cache.snapshot().docs)})
+registry.gauge("rag_sessions", "Conversation sessions held in memory", lambda: {(): len(session_store.sessions)})
+
+def generation_load():
+    # Queue depth and upstream calls of the generation gateway (wait times are a histogram in generation_gateway.py)
+    if generation is None:
+        return {}
+    return {("queued",): len(generation.waiting), ("in_flight",): generation.in_flight}
+
+registry.gauge(
+    "rag_generation_requests", "Chat completions waiting for a gateway slot (queued) or running upstream (in_flight)",
+    generation_load, ("state",)
+)
+
+def count_usage(messages, reply, usage=None):
+    # Streamed completions come without usage, so those tokens are counted locally; returns (prompt, completion) tokens
+    prompt_tokens = usage.prompt_tokens if usage else sum(count_tokens(message["content"]) for message in messages)
+    completion_tokens = usage.completion_tokens if usage else count_tokens(reply or "")
+    tokens_total.inc(prompt_tokens, kind="prompt")
+    tokens_total.inc(completion_tokens, kind="completion")
+    return prompt_tokens, completion_tokens
+
+# Latency, tokens and estimated cost of each answer route (cache, extractive, small, large)
+route_stats = RouteStats()
+
+def error_body(e):
+    # The request ID lets a user's report be matched to the server log
+    return {"error": "Internal Server Error", "details": str(e), "request_id": request_id()}
+
+def unavailable_body(e):
+    # Generation is saturated or throttled upstream; the request can be retried later
+    return dict(error_body(e), error="Service Unavailable", retry_after=math.ceil(e.retry_after) if e.retry_after else None)
+
+def unavailable_response(e):
+    body = unavailable_body(e)
+    headers = {"Retry-After": str(body["retry_after"])} if body["retry_after"] else None
+    return JSONResponse(body, status_code=503, headers=headers)
+
+def create_local_vector_retriever():
+    index = VectorIndex()
+    # Indexes built with the fake embedder embed queries locally too
+    embed = query_embedder(index.model) or (lambda text: embed_query(openai_client, text))
+    return LocalVectorRetriever(index, embed)
+
+def create_retriever():
+    # The local backends serve from the memory-mapped indexes built by vector_index.py and bm25_index.py
+    if RETRIEVER_BACKEND == "local":
+        return create_local_vector_retriever()
+    if RETRIEVER_BACKEND == "bm25":
+        return LocalBM25Retriever(BM25Index())
+    if RETRIEVER_BACKEND == "hybrid":
+        return HybridRetriever(LocalBM25Retriever(BM25Index()), create_local_vector_retriever())
+
+    return AzureSearchRetriever(
+        search_client,
+        embed=lambda text: embed_query(openai_client, text),
+        corpus=(lambda: corpus_cache.snapshot().docs) if CORPUS_CACHE_ENABLED else None,
+        select=ROUTING_SELECT_FIELDS if ROUTING_ENABLED else None
+    )
+
+@asynccontextmanager
+async def lifespan(app):
+    global search_client, openai_client, retriever, link_expander, generation
+
+    if search_client is None and RETRIEVER_BACKEND == "azure":
+        search_client = create_search_client()
+    if openai_client is None:
+        openai_client = create_openai_client()
+    if generation is None:
+        generation = GenerationGateway(openai_client)
+    if retriever is None:
+        retriever = create_retriever()
+    if link_expander is None and LINK_EXPANSION_ENABLED:
+        link_expander = LinkExpander.load()
+
+    # Load the corpus snapshot before serving and refresh it on its TTL
+    if CORPUS_CACHE_ENABLED:
+        await corpus_cache.start()
+
+    yield
+
+    await corpus_cache.stop()
+    answer_cache.close()
+    session_store.close()
+    await retriever.close()
+    if search_client is not None:
+        await search_client.close()
+    await openai_client.close()
+    search_client = None
+    openai_client = None
+    retriever = None
+    link_expander = None
+    generation = None
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allow requests from any frontend (CORS policy)
 app.add_middleware(
@@ -22,30 +241,34 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER, "Server-Timing"],
 )
 
+# Request ID header, per-request trace and latency histograms; added last so it wraps everything else
+app.add_middleware(RequestTelemetryMiddleware)
+
 # Define the data format expected from the user
 class PromptRequest(BaseModel):
     prompt: str
+    # Optional scope (service, category, status, priority, entity, created_from/created_to)
+    filters: RetrievalFilters | None = None
+    # Continue a conversation: its earlier turns are kept server-side and sent with the prompt
+    conversation_id: str | None = None
 
-# Load Azure Search credentials and settings
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
-AZURE_SEARCH_INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX_NAME")
-
-# Connect to Azure Search
-search_client = SearchClient(
-    endpoint=AZURE_SEARCH_ENDPOINT,
-    index_name=AZURE_SEARCH_INDEX_NAME,
-    credential=AzureKeyCredential(AZURE_SEARCH_KEY)
-)
+class BatchPrompt(BaseModel):
+    prompt: str
+    # Echoed back on the result line (e.g. the incident number)
+    id: str | int | None = None
+    filters: RetrievalFilters | None = None
+    # Continue a conversation: items sharing one run in request order, each seeing the turns before it
+    conversation_id: str | None = None
 
-# Set up connection to Azure OpenAI
-openai_client = AzureOpenAI(
-    azure_endpoint=os.getenv("OPENAI_API_BASE"),
-    api_key=os.getenv("OPENAI_API_KEY"),
-    api_version=os.getenv("OPENAI_API_VERSION")
-)
+class BatchPromptRequest(BaseModel):
+    # Plain strings or {"prompt", "id", "filters", "conversation_id"} items
+    prompts: list[BatchPrompt | str]
+    # Used for the items that don't set their own
+    filters: RetrievalFilters | None = None
+    concurrency: int | None = None
 
 # Base instruction to guide the AI assistant's behavior
 BASE_SYSTEM_PROMPT = {
@@ -57,6 +280,144 @@ BASE_SYSTEM_PROMPT = {
     )
 }
 
+def build_messages(prompt, packed, history=()):
+    # Build the message history for the AI: instructions, the conversation so far, one context message, then the question
+    messages = [BASE_SYSTEM_PROMPT, *history]
+
+    if packed.text:
+        messages.append({
+            "role": "user",
+            "content": f"Please consider the following information:\n\n{packed.text}"
+        })
+
+    # Add user's prompt to the conversation
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+async def prepare_prompt(prompt, filters=None, source=None, session=None):
+    # Retrieve only the chunks that match the user's prompt (within the filters, if any).
+    # `source` replaces the app's retriever (a batch pins one to its snapshot).
+    retrieval_start = time.perf_counter()
+    with span("retrieval"):
+        # A follow-up that refines the previous question is answered from the chunks that question got
+        all_docs = session_store.reusable_chunks(session, prompt, filters) if session is not None else None
+        reused = all_docs is not None
+        if session is not None and session.turns:
+            cache_lookups.inc(cache="session_chunks", result="hit" if reused else "miss")
+        if reused:
+            logger.info(f"♻️ Reusing {len(all_docs)} chunks from the previous turn")
+        else:
+            all_docs = await (source or retriever).retrieve(prompt, filters=filters)
+            # Pull in the records linked to what was found (workarounds of a problem, ...).
+            # They belong to a record inside the filters, so they are kept even without the filtered fields.
+            if link_expander is not None:
+                all_docs = link_expander.expand(all_docs)
+            logger.info(f"✅ Retrieved {len(all_docs)} documents from index")
+    retrieval_ms = (time.perf_counter() - retrieval_start) * 1000
+
+    # Fit the best chunks into one context message under the token budget
+    with span("packing"):
+        packed = pack_context(all_docs)
+        messages = build_messages(prompt, packed, history_messages(session) if session is not None else ())
+    tokens_total.inc(packed.used_tokens, kind="context")
+
+    logger.info(f"📦 Context: {packed.report()}")
+    return all_docs, packed, messages, retrieval_ms, reused
+
+def answers_cacheable(session):
+    # An answer given with earlier turns in the prompt depends on them, so it isn't cached
+    return ANSWER_CACHE_ENABLED and (session is None or not (session.turns or session.summary))
+
+def record_turn(session, prompt, reply, packed, filters):
+    session_store.add_turn(session, prompt, reply, packed.chunks, filters)
+    # The summary is written after the answer has gone out, off the request's path
+    if session_store.needs_compaction(session):
+        task = asyncio.create_task(session_store.compact(session))
+        compaction_tasks.add(task)
+        task.add_done_callback(compaction_tasks.discard)
+
+async def lookup_answer(prompt, all_docs, session=None):
+    # Returns (cached answer or None, prompt embedding used for the semantic lookup)
+    if not answers_cacheable(session):
+        return None, None
+
+    with span("answer_cache"):
+        embedding = await embed_query(openai_client, prompt) if answer_cache.semantic else None
+        cached = answer_cache.get(prompt, all_docs, embedding)
+    cache_lookups.inc(cache="answer", result="miss" if cached is None else "hit")
+    return cached, embedding
+
+def completion_args(messages, route=None):
+    # Settings shared by the blocking and streaming endpoints; the route picks the deployment and answer length
+    route = route or large_route()
+    return {
+        "model": route.deployment,
+        "messages": messages,
+        "max_tokens": route.max_tokens,
+        "temperature": 0.7,
+        "top_p": 0.9
+    }
+
+def route_prompt(prompt, all_docs, session=None):
+    # Follow-ups with earlier turns in the prompt never get an extractive answer
+    has_history = session is not None and bool(session.turns or session.summary)
+    route = choose_route(prompt, all_docs, has_history, ROUTING_ENABLED)
+    logger.info(f"🔀 Route: {route.name} ({route.reason})")
+    return route
+
+def extract_answer(prompt, all_docs):
+    with span("extractive"):
+        return extractive_answer(prompt, all_docs)
+
+def citations(packed):
+    return [
+        {"chunk_id": chunk.get("chunk_id"), "title": chunk.get("title"), "score": chunk.get("score")}
+        for chunk in packed.chunks
+    ]
+
+def sse_event(event, data):
+    # One server-sent event: a name and a JSON payload
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def answer_prompt(prompt, filters=None, source=None, session=None):
+    # Retrieval, answer cache and generation for one prompt (the blocking and batch endpoints)
+    all_docs, packed, messages, retrieval_ms, reused = await prepare_prompt(prompt, filters, source, session)
+    cacheable = answers_cacheable(session)
+    answer = {"packed": packed, "retrieval_ms": retrieval_ms, "reused_context": reused}
+
+    cached, prompt_embedding = await lookup_answer(prompt, all_docs, session)
+    if cached is not None:
+        logger.info(f"💾 Answer cache hit, retrieval={retrieval_ms:.1f}ms")
+        if session is not None:
+            record_turn(session, prompt, cached, packed, filters)
+        route_stats.record("cache", retrieval_ms / 1000)
+        return dict(answer, response=cached, cached=True, generation_ms=0.0, route="cache")
+
+    route = route_prompt(prompt, all_docs, session)
+    generation_start = time.perf_counter()
+    if route.name == "extractive":
+        # The top chunk already answers it: no model call
+        reply = extract_answer(prompt, all_docs)
+        prompt_tokens = completion_tokens = 0
+    else:
+        # Call Azure OpenAI to get a response
+        with span("generation"):
+            completion = await generation.complete(**completion_args(messages, route))
+        reply = completion.choices[0].message.content
+        prompt_tokens, completion_tokens = count_usage(messages, reply, completion.usage)
+
+    generation_ms = (time.perf_counter() - generation_start) * 1000
+    route_stats.record(route.name, (retrieval_ms + generation_ms) / 1000, prompt_tokens, completion_tokens)
+
+    logger.info(f"⏱️ retrieval={retrieval_ms:.1f}ms generation={generation_ms:.1f}ms chunks={len(all_docs)} route={route.name}")
+
+    if cacheable and reply:
+        answer_cache.put(prompt, all_docs, reply, prompt_embedding)
+    if session is not None and reply:
+        record_turn(session, prompt, reply, packed, filters)
+
+    return dict(answer, response=reply, cached=False, generation_ms=generation_ms, route=route.name)
+
 @app.post("/api/prompt")
 async def chat_with_ai(data: PromptRequest):
     prompt = data.prompt.strip()
@@ -65,62 +426,342 @@ async def chat_with_ai(data: PromptRequest):
         return JSONResponse({"error": "Prompt cannot be empty"}, status_code=400)
 
     try:
-        # Retrieve all documents from Azure Search using by_page to handle >1000
-        all_docs = []
-        pages = search_client.search(
-            search_text="*",
-            query_type=QueryType.SIMPLE,
-            search_mode="all",
-            top=1000,
-            order_by=["chunk_id asc"]  # sort by a stable field
-        ).by_page()
-
-        for page in pages:
-            for doc in page:
-                all_docs.append(doc)
-
-        print(f"✅ Retrieved {len(all_docs)} documents from index\n")
-
-        # Limit each document to 1500 characters
-        content_chunks = []
-        for i, doc in enumerate(all_docs):
-            content = doc.get("content", "")
-            title = doc.get("title", f"Document {i+1}")
-            if content:
-                chunk = f"[{title}]\n{content.strip()[:1500]}"
-                content_chunks.append(chunk)
-
-        # Build the message history for the AI
-        messages = [BASE_SYSTEM_PROMPT]
-
-        if content_chunks:
-            for i, chunk in enumerate(content_chunks):
-                messages.append({
-                    "role": "user",
-                    "content": f"Please consider the following information (chunk {i+1}):\n{chunk}"
+        session = session_store.get(data.conversation_id) if data.conversation_id else None
+        answer = await answer_prompt(prompt, data.filters, session=session)
+        # Rendered here rather than by FastAPI so the serialization span covers it
+        with span("serialization"):
+            return JSONResponse({
+                "response": answer["response"],
+                "context": answer["packed"].report(),
+                "cached": answer["cached"],
+                "conversation_id": data.conversation_id,
+                "reused_context": answer["reused_context"],
+                "route": answer["route"]
+            })
+
+    except GenerationUnavailable as e:
+        logger.warning(f"⚠️ Prompt not answered: {e}")
+        return unavailable_response(e)
+
+    except Exception as e:
+        logger.exception("Prompt failed")
+        return JSONResponse(error_body(e), status_code=500)
+
+@app.post("/api/prompt/stream")
+async def chat_with_ai_stream(data: PromptRequest, request: Request):
+    prompt = data.prompt.strip()
+
+    if not prompt:
+        return JSONResponse({"error": "Prompt cannot be empty"}, status_code=400)
+
+    async def events():
+        request_start = time.perf_counter()
+        stream = None
+        serialization_s = 0.0
+
+        def event(name, payload):
+            # Summed over the stream and recorded as one serialization span at the end
+            nonlocal serialization_s
+            start = time.perf_counter()
+            text = sse_event(name, payload)
+            serialization_s += time.perf_counter() - start
+            return text
+
+        try:
+            session = session_store.get(data.conversation_id) if data.conversation_id else None
+            all_docs, packed, messages, retrieval_ms, reused = await prepare_prompt(prompt, data.filters, session=session)
+            cacheable = answers_cacheable(session)
+
+            # Citations go out first so the UI can show sources while the answer is generated
+            yield event("citations", {"citations": citations(packed), "context": packed.report()})
+
+            cached, prompt_embedding = await lookup_answer(prompt, all_docs, session)
+            if cached is not None:
+                logger.info(f"💾 Answer cache hit, retrieval={retrieval_ms:.1f}ms")
+                if session is not None:
+                    record_turn(session, prompt, cached, packed, data.filters)
+                route_stats.record("cache", retrieval_ms / 1000)
+                yield event("delta", {"content": cached})
+                yield event("done", {
+                    "retrieval_ms": round(retrieval_ms, 1), "cached": True, "reused_context": reused, "route": "cache"
                 })
+                return
 
-        # Add user's prompt to the conversation
-        messages.append({"role": "user", "content": prompt})
+            route = route_prompt(prompt, all_docs, session)
+            generation_start = time.perf_counter()
+            if route.name == "extractive":
+                # The top chunk already answers it: one delta, no model call
+                reply = extract_answer(prompt, all_docs)
+                if cacheable:
+                    answer_cache.put(prompt, all_docs, reply, prompt_embedding)
+                if session is not None:
+                    record_turn(session, prompt, reply, packed, data.filters)
+                generation_ms = (time.perf_counter() - generation_start) * 1000
+                route_stats.record(route.name, (retrieval_ms + generation_ms) / 1000)
+                yield event("delta", {"content": reply})
+                yield event("done", {
+                    "retrieval_ms": round(retrieval_ms, 1), "generation_ms": round(generation_ms, 1),
+                    "cached": False, "reused_context": reused, "route": route.name
+                })
+                return
 
-        # Call Azure OpenAI to get a response
-        completion = openai_client.chat.completions.create(
-            model=os.getenv("OPENAI_DEPLOYMENT"),
-            messages=messages,
-            max_tokens=800,
-            temperature=0.7,
-            top_p=0.9
-        )
+            stream = await generation.stream(**completion_args(messages, route))
+            first_token_ms = None
+            reply_parts = []
+            disconnected = False
 
-        reply = completion.choices[0].message.content
-        return {"response": reply}
+            async for chunk in stream:
+                if await request.is_disconnected():
+                    logger.info("⚠️ Client disconnected, cancelling generation")
+                    disconnected = True
+                    break
+
+                # Azure sends a content-filter chunk with no choices first
+                if not chunk.choices:
+                    continue
+
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - request_start) * 1000
+                        record_span("first_token", time.perf_counter() - generation_start, generation_start)
+                    reply_parts.append(delta)
+                    yield event("delta", {"content": delta})
+
+            # Only a complete answer goes into the cache and the conversation
+            if reply_parts and not disconnected:
+                if cacheable:
+                    answer_cache.put(prompt, all_docs, "".join(reply_parts), prompt_embedding)
+                if session is not None:
+                    record_turn(session, prompt, "".join(reply_parts), packed, data.filters)
+
+            generation_ms = (time.perf_counter() - generation_start) * 1000
+            record_span("generation", generation_ms / 1000, generation_start)
+            prompt_tokens, completion_tokens = count_usage(messages, "".join(reply_parts))
+            route_stats.record(route.name, (retrieval_ms + generation_ms) / 1000, prompt_tokens, completion_tokens)
+            first_token = f"{first_token_ms:.1f}ms" if first_token_ms is not None else "n/a"
+            logger.info(
+                f"⏱️ retrieval={retrieval_ms:.1f}ms first_token={first_token} generation={generation_ms:.1f}ms "
+                f"chunks={len(all_docs)} route={route.name}"
+            )
+
+            yield event("done", {
+                "retrieval_ms": round(retrieval_ms, 1),
+                "first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+                "generation_ms": round(generation_ms, 1),
+                "cached": False,
+                "reused_context": reused,
+                "route": route.name
+            })
+
+        except GenerationUnavailable as e:
+            logger.warning(f"⚠️ Streamed prompt not answered: {e}")
+            yield event("error", unavailable_body(e))
+
+        except Exception as e:
+            logger.exception("Streamed prompt failed")
+            yield event("error", error_body(e))
+
+        finally:
+            # Closing the stream drops the upstream HTTP connection, which stops the generation
+            if stream is not None:
+                await stream.close()
+            record_span("serialization", serialization_s)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
+async def batch_retriever():
+    """The retriever every prompt of a batch runs against, and a description of its snapshot.
+
+    In "full" mode the corpus is read once for the whole batch (or taken from
+    the corpus cache) instead of once per prompt. The other backends query an
+    index that doesn't change under the batch, so they are used as they are.
+    """
+    if not (isinstance(retriever, AzureSearchRetriever) and retriever.mode == "full"):
+        return retriever, {"backend": retriever.name}
+
+    if CORPUS_CACHE_ENABLED:
+        snapshot = corpus_cache.snapshot()
+        docs, version = snapshot.docs, snapshot.version
+    else:
+        docs, version = await fetch_all_documents(search_client), None
+
+    pinned = AzureSearchRetriever(search_client, embed=retriever.embed, corpus=lambda: docs, mode="full")
+    return pinned, {"backend": retriever.name, "mode": "full", "documents": len(docs), "corpus_version": version}
+
+def ndjson_line(data):
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+@app.post("/api/prompt/batch")
+async def chat_with_ai_batch(data: BatchPromptRequest):
+    items = [BatchPrompt(prompt=item) if isinstance(item, str) else item for item in data.prompts]
+
+    if not items:
+        return JSONResponse({"error": "No prompts given"}, status_code=400)
+    if len(items) > BATCH_MAX_PROMPTS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_PROMPTS} prompts per batch"}, status_code=413)
+
+    concurrency = max(1, min(data.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+
+    try:
+        source, snapshot = await batch_retriever()
     except Exception as e:
-        traceback.print_exc()
-        return JSONResponse(
-            {"error": "Internal Server Error", "details": str(e)},
-            status_code=500
-        )
+        logger.exception("Batch snapshot failed")
+        return JSONResponse(error_body(e), status_code=500)
+
+    slots = asyncio.Semaphore(concurrency)
+    # One lock per conversation; tasks reach it in request order and asyncio locks are FIFO
+    conversations = {item.conversation_id: asyncio.Lock() for item in items if item.conversation_id}
+
+    async def run_item(index, item):
+        result = {"index": index, "id": item.id}
+        prompt = item.prompt.strip()
+        if not prompt:
+            return dict(result, error="Prompt cannot be empty")
+        if item.conversation_id:
+            result["conversation_id"] = item.conversation_id
+            async with conversations[item.conversation_id]:
+                return await answer_item(result, prompt, item, session_store.get(item.conversation_id))
+        return await answer_item(result, prompt, item)
+
+    async def answer_item(result, prompt, item, session=None):
+        queued_start = time.perf_counter()
+        async with slots:
+            start = time.perf_counter()
+            result["queue_ms"] = round((start - queued_start) * 1000, 1)
+            try:
+                answer = await answer_prompt(prompt, item.filters or data.filters, source, session)
+                result.update(
+                    response=answer["response"],
+                    cached=answer["cached"],
+                    citations=citations(answer["packed"]),
+                    context=answer["packed"].report(),
+                    retrieval_ms=round(answer["retrieval_ms"], 1),
+                    generation_ms=round(answer["generation_ms"], 1),
+                    route=answer["route"],
+                    error=None
+                )
+            except Exception as e:
+                # One failed prompt is reported on its own line; the rest of the batch goes on
+                logger.exception(f"Batch prompt {result['index']} failed")
+                result["error"] = str(e)
+            finally:
+                result["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def lines():
+        batch_start = time.perf_counter()
+        tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+        failed = cached = 0
+        serialization_s = 0.0
+
+        try:
+            # Results go out as they finish, not in request order; "index" ties them to the request
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                failed += result["error"] is not None
+                cached += bool(result.get("cached"))
+                start = time.perf_counter()
+                line = ndjson_line(result)
+                serialization_s += time.perf_counter() - start
+                yield line
+
+            wall_ms = (time.perf_counter() - batch_start) * 1000
+            logger.info(f"⏱️ batch prompts={len(items)} failed={failed} concurrency={concurrency} wall={wall_ms:.1f}ms")
+
+            yield ndjson_line({"summary": {
+                "prompts": len(items),
+                "succeeded": len(items) - failed,
+                "failed": failed,
+                "cached": cached,
+                "concurrency": concurrency,
+                "snapshot": snapshot,
+                "wall_ms": round(wall_ms, 1)
+            }})
+
+        finally:
+            # A client that disconnects mid-batch stops the prompts that haven't finished
+            for task in tasks:
+                task.cancel()
+            record_span("serialization", serialization_s)
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/admin/corpus/refresh")
+async def refresh_corpus(x_admin_key: str | None = Header(default=None)):
+    if ADMIN_API_KEY and x_admin_key != ADMIN_API_KEY:
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+
+    if not CORPUS_CACHE_ENABLED:
+        return JSONResponse({"error": "Corpus cache is disabled"}, status_code=409)
+
+    # Refresh runs in the background; requests keep using the current snapshot
+    corpus_cache.refresh_in_background()
+    return {"message": "Corpus refresh started", "corpus": corpus_cache.stats()}
+
+@app.get("/api/admin/corpus")
+async def corpus_status():
+    return {"enabled": CORPUS_CACHE_ENABLED, "corpus": corpus_cache.stats()}
+
+@app.get("/api/admin/retriever")
+async def retriever_status():
+    return dict(retriever.stats(), link_expansion=link_expander.stats() if link_expander else None)
+
+@app.get("/api/admin/answer-cache")
+async def answer_cache_status():
+    return {"enabled": ANSWER_CACHE_ENABLED, "cache": answer_cache.stats()}
+
+@app.post("/api/admin/answer-cache/clear")
+async def clear_answer_cache(x_admin_key: str | None = Header(default=None)):
+    if ADMIN_API_KEY and x_admin_key != ADMIN_API_KEY:
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+
+    answer_cache.clear()
+    return {"message": "Answer cache cleared", "cache": answer_cache.stats()}
+
+@app.get("/api/conversations/{conversation_id}")
+async def conversation_state(conversation_id: str):
+    session = session_store.get(conversation_id, create=False)
+    if session is None:
+        return JSONResponse({"error": "Conversation not found"}, status_code=404)
+
+    return {
+        "conversation_id": conversation_id,
+        "summary": session.summary,
+        "summarized_turns": session.summarized_turns,
+        "turns": [{"prompt": turn.prompt, "response": turn.response, "tokens": turn.tokens} for turn in session.turns],
+        "history_tokens": session.history_tokens()
+    }
+
+@app.delete("/api/conversations/{conversation_id}")
+async def forget_conversation(conversation_id: str):
+    session_store.delete(conversation_id)
+    return {"message": "Conversation state deleted", "conversation_id": conversation_id}
+
+@app.get("/api/admin/sessions")
+async def session_status():
+    return {"sessions": session_store.stats()}
+
+@app.get("/api/admin/generation")
+async def generation_status():
+    return {"generation": generation.stats()}
+
+@app.get("/api/admin/routing")
+async def routing_status():
+    return {"enabled": ROUTING_ENABLED, "routes": route_stats.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 async def root():
@@ -0,0 +1,102 @@
+import argparse
+import json
+import sys
+import time
+
+import httpx
+
+from chunker import DATA_DIR, load_records
+
+# Sends many prompts through /api/prompt/batch and writes the NDJSON result
+# lines as they arrive (one per prompt, in completion order, then a summary).
+# Prompts come from a file (JSON lines with "prompt" and optional "id" and
+# "filters", or plain text lines) or from the exported incidents, whose
+# Subject and Symptom make the prompt and IncidentNumber the id.
+# Usage (from the backend folder):
+#   python batch_prompts.py --incidents --status Resolved --output results.ndjson
+#   python batch_prompts.py --input prompts.jsonl --concurrency 4
+
+API_URL = "http://127.0.0.1:8000"
+# Prompts per request; longer inputs are sent as consecutive batches
+BATCH_SIZE = 200
+
+
+def file_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line) if line.startswith("{") else {"prompt": line}
+            item.setdefault("id", number)
+            yield item
+
+
+def incident_prompts(data_dir=DATA_DIR, statuses=None):
+    for record in load_records("incidents", data_dir):
+        if statuses and record.get("Status") not in statuses:
+            continue
+        text = "\n".join(part for part in (record.get("Subject"), record.get("Symptom")) if part)
+        if text:
+            yield {"id": record.get("IncidentNumber") or record.get("RecId"), "prompt": text}
+
+
+def run_batches(prompts, api_url, out, batch_size=BATCH_SIZE, concurrency=None, filters=None, timeout=600):
+    """Post the prompts in batches, copy every result line to `out`; returns the merged summary."""
+    totals = {"prompts": 0, "succeeded": 0, "failed": 0, "cached": 0}
+    start = time.perf_counter()
+    with httpx.Client(base_url=api_url, timeout=timeout) as client:
+        for offset in range(0, len(prompts), batch_size):
+            body = {"prompts": prompts[offset:offset + batch_size], "concurrency": concurrency, "filters": filters}
+            with client.stream("POST", "/api/prompt/batch", json=body) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise RuntimeError(f"Batch at {offset} failed ({response.status_code}): {response.text}")
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    if "summary" in result:
+                        for key in totals:
+                            totals[key] += result["summary"][key]
+                        continue
+                    # Indexes are per request; make them positions in the whole input
+                    result["index"] += offset
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+            print(f"{min(offset + batch_size, len(prompts))}/{len(prompts)} prompts done", file=sys.stderr)
+    totals["wall_seconds"] = round(time.perf_counter() - start, 1)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many prompts through the assistant's batch endpoint")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSON lines ({\"prompt\", \"id\", \"filters\"}) or one prompt per line")
+    source.add_argument("--incidents", action="store_true", help="use the exported incidents' Subject and Symptom")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--status", action="append", help="only incidents with this Status (repeatable)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--filters", type=json.loads, default=None, help="filters for every prompt, as JSON")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=None, help="default: the server's BATCH_CONCURRENCY")
+    parser.add_argument("--output", default=None, help="result lines (default: stdout)")
+    args = parser.parse_args()
+
+    prompts = list(file_prompts(args.input) if args.input else incident_prompts(args.data_dir, args.status))
+    prompts = prompts[:args.limit] if args.limit else prompts
+    if not prompts:
+        parser.error("no prompts to send")
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_batches(prompts, args.api_url, out, args.batch_size, args.concurrency, args.filters)
+    finally:
+        if args.output:
+            out.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
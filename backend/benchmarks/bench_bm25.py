@@ -0,0 +1,116 @@
+import argparse
+import json
+import math
+import os
+import tempfile
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from bm25_index import BM25Index, build_index, tokenize
+from benchmarks.bench_vector_index import latency
+
+# Query latency of the BM25 index as the corpus grows, next to a plain
+# dict-of-postings BM25 over the same documents (checked to rank the same
+# chunks). Documents are synthetic: words drawn from a Zipf distribution, like
+# ticket text, so a few terms have very long postings. Queries are a few words
+# picked from a random document.
+# Usage (from the backend folder): python -m benchmarks.bench_bm25 --sizes 10000,100000,1000000
+
+
+def synthetic_docs(count, vocabulary, length, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.minimum(rng.zipf(1.2, (count, length)), vocabulary) - 1
+    return [
+        {"chunk_id": str(i), "title": f"chunk {i}", "content": " ".join(f"w{w}" for w in row)}
+        for i, row in enumerate(words)
+    ]
+
+
+class DictBM25:
+    """Straightforward BM25: a dict of term -> [(row, tf)] walked per query."""
+
+    def __init__(self, docs, k1=1.2, b=0.75):
+        self.k1, self.b = k1, b
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for row, doc in enumerate(docs):
+            tokens = tokenize(f"{doc['title']}\n{doc['content']}")
+            self.lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((row, tf))
+        self.average_length = sum(self.lengths) / len(self.lengths)
+
+    def scores(self, query):
+        scores = defaultdict(float)
+        count = len(self.lengths)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term, [])
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / self.average_length)
+                scores[row] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search_rows(self, query, top_k):
+        scores = self.scores(query)
+        return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+
+def same_ranking(baseline, query, found, expected):
+    # Chunks tied at the cut-off may be picked differently, so compare the scores the baseline gives both lists
+    scores = baseline.scores(query)
+    return np.allclose(sorted((scores[row] for row in found), reverse=True), [scores[row] for row in expected], rtol=1e-4)
+
+
+def directory_mb(path):
+    return round(sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--length", type=int, default=120, help="words per chunk")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--baseline-max", type=int, default=100_000, help="largest corpus to also run the dict baseline on")
+    args = parser.parse_args()
+
+    report = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        docs = synthetic_docs(size, args.vocabulary, args.length)
+        rng = np.random.default_rng(1)
+        queries = []
+        for row in rng.choice(size, args.queries, replace=False):
+            words = docs[row]["content"].split()
+            queries.append(" ".join(rng.choice(words, rng.integers(2, 6), replace=False)))
+
+        with tempfile.TemporaryDirectory() as path:
+            meta = build_index(docs, path)
+            index = BM25Index(path)
+            found, timing = latency(lambda q: index.search_rows(q, args.top_k)[0].tolist(), queries)
+            entry = {
+                "chunks": size,
+                "terms": meta["terms"],
+                "postings": meta["postings"],
+                "build_seconds": meta["build_seconds"],
+                "index_mb": directory_mb(path),
+                "bm25_index": timing,
+            }
+
+            if size <= args.baseline_max:
+                baseline = DictBM25(docs)
+                expected, entry["dict_baseline"] = latency(lambda q: baseline.search_rows(q, args.top_k), queries)
+                entry["same_results"] = all(
+                    same_ranking(baseline, q, f, e) for q, f, e in zip(queries, found, expected)
+                )
+            index.close()
+        report.append(entry)
+        print(json.dumps(entry))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
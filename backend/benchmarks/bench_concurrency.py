@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.fakes import make_corpus
+from benchmarks.harness import start_stack
+
+# Sends N prompts to /api/prompt at the same time. With the async clients the
+# batch should finish in about one request's latency, not N times that.
+# Usage (from the backend folder): python -m benchmarks.bench_concurrency --concurrency 20
+
+
+async def timed_prompt(client, prompt):
+    start = time.perf_counter()
+    response = await client.post("/api/prompt", json={"prompt": prompt})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(api_url, prompts):
+    async with httpx.AsyncClient(base_url=api_url, timeout=120) as client:
+        single_ms = await timed_prompt(client, prompts[0])
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(timed_prompt(client, prompt) for prompt in prompts))
+        wall_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "concurrency": len(prompts),
+        "single_request_ms": round(single_ms, 1),
+        "concurrent_wall_ms": round(wall_ms, 1),
+        "slowdown_vs_single": round(wall_ms / single_ms, 2),
+        "slowest_request_ms": round(max(latencies), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--page-latency", type=float, default=0.05, help="fake search latency per request")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    args = parser.parse_args()
+
+    stack = start_stack(
+        page_latency=args.page_latency,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+    )
+    prompts = [doc["title"] for doc in make_corpus(args.concurrency)]
+    report = asyncio.run(run(stack.api_url, prompts))
+    stack.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
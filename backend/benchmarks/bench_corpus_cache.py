@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.fakes import FakeSearchClient, make_corpus
+from corpus_cache import CorpusCache
+from retrieval import fetch_all_documents, retrieve_chunks
+
+# Measures full-mode retrieval with and without the corpus cache, and checks
+# that reads stay fast while a refresh is running.
+# Usage (from the backend folder): python -m benchmarks.bench_corpus_cache --chunks 5000
+
+
+async def time_requests(requests, fn):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+async def reads_during_refresh(cache, requests):
+    # Start a refresh, then keep reading the snapshot until it has been swapped
+    refresh = cache.refresh_in_background()
+    timings = []
+    while len(timings) < requests or not refresh.done():
+        start = time.perf_counter()
+        await retrieve_chunks(None, "", mode="full", corpus=cache.snapshot().docs)
+        timings.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0)
+    await refresh
+    return round(max(timings), 3)
+
+
+async def run(args):
+    client = FakeSearchClient(make_corpus(args.chunks), page_latency=args.page_latency)
+    cache = CorpusCache(lambda: fetch_all_documents(client))
+    await cache.refresh()
+
+    uncached = await time_requests(args.requests, lambda: retrieve_chunks(client, "", mode="full"))
+    cached = await time_requests(args.requests, lambda: retrieve_chunks(client, "", mode="full", corpus=cache.snapshot().docs))
+    worst_read_during_refresh = await reads_during_refresh(cache, args.requests)
+
+    return {
+        "chunks": args.chunks,
+        "uncached_p50_ms": uncached,
+        "cached_p50_ms": cached,
+        "worst_read_during_refresh_ms": worst_read_during_refresh,
+        "snapshot": cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--page-latency", type=float, default=0.05, help="seconds per page of 1000 results")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import make_corpus
+from embeddings import EmbeddingCache, FakeEmbedder, embed_chunks
+
+# Embedding a corpus one chunk per request (no cache) versus batched, parallel
+# requests with the content-hash cache, then a refresh where a few chunks changed.
+# Uses the fake embedder with a fixed latency per request.
+# Usage (from the backend folder): python -m benchmarks.bench_embeddings --chunks 5000
+
+
+async def one_by_one(chunks, latency):
+    embedder = FakeEmbedder(latency=latency)
+    start = time.perf_counter()
+    for chunk in chunks:
+        await embedder([chunk["title"] + "\n" + chunk["content"]])
+    return {"requests": embedder.calls, "seconds": round(time.perf_counter() - start, 2)}
+
+
+async def run(args):
+    chunks = make_corpus(args.chunks)
+    # make_corpus cycles through the records; give every chunk its own text
+    for i, chunk in enumerate(chunks):
+        chunk["content"] += f"\n(copy {i})"
+
+    report = {"chunks": len(chunks), "latency_per_request": args.latency}
+    sample = chunks[:args.sequential_sample]
+    sequential = await one_by_one(sample, args.latency)
+    report["one_by_one_estimated_seconds"] = round(sequential["seconds"] * len(chunks) / len(sample), 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EmbeddingCache(os.path.join(directory, "embeddings.db"))
+        embedder = FakeEmbedder(latency=args.latency)
+
+        vectors, report["first_run"] = await embed_chunks(chunks, embedder, cache, args.batch_size, args.concurrency)
+
+        # A refresh where a few records changed
+        for chunk in chunks[:args.changed]:
+            chunk["content"] += " (edited)"
+        again, report["refresh"] = await embed_chunks(chunks, embedder, cache, args.batch_size, args.concurrency)
+
+        unchanged = chunks[args.changed]["chunk_id"]
+        # The cache stores float32, so compare within float32 precision
+        report["unchanged_vector_reused"] = max(abs(a - b) for a, b in zip(vectors[unchanged], again[unchanged])) < 1e-6
+        cache.close()
+
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per embedding request")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--changed", type=int, default=50, help="chunks edited before the refresh")
+    parser.add_argument("--sequential-sample", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import statistics
+import tempfile
+
+import numpy as np
+
+from bm25_index import BM25Index, build_index as build_bm25
+from filters import RetrievalFilters
+from vector_index import VectorIndex, build_index as build_vector, normalize
+from benchmarks.bench_bm25 import synthetic_docs
+from benchmarks.bench_vector_index import clustered_vectors, latency
+
+# Filters pushed into the local indexes (a row mask applied while scoring)
+# against the alternative of searching unfiltered and dropping what doesn't
+# match afterwards (fetching `--overfetch` times top_k). For each selectivity
+# the report has the latency of both and how many of the top_k slots they fill.
+# Usage (from the backend folder): python -m benchmarks.bench_filters --chunks 100000
+
+SCOPES = {
+    "50%": RetrievalFilters(category=[f"c{i}" for i in range(5)]),
+    "10%": RetrievalFilters(category="c3"),
+    "1%": RetrievalFilters(service=[f"s{i}" for i in range(10)]),
+    "0.1%": RetrievalFilters(service="s7"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=4)
+    args = parser.parse_args()
+
+    docs = synthetic_docs(args.chunks, 50_000, 120)
+    for i, doc in enumerate(docs):
+        doc.update(service=f"s{i % 1000}", category=f"c{i % 10}", entity="incidents")
+    vectors = clustered_vectors(args.chunks, 256, 2000)
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(args.chunks, args.queries, replace=False)
+    text_queries = [" ".join(rng.choice(docs[row]["content"].split(), 3, replace=False)) for row in picks]
+    vector_queries = normalize(vectors[picks] + 0.3 * normalize(rng.standard_normal((args.queries, 256))))
+
+    report = {"chunks": args.chunks, "top_k": args.top_k, "scopes": []}
+    with tempfile.TemporaryDirectory() as bm25_path, tempfile.TemporaryDirectory() as vector_path:
+        build_bm25(docs, bm25_path)
+        build_vector(docs, vectors, vector_path, model="synthetic")
+        bm25 = BM25Index(bm25_path)
+        vector = VectorIndex(vector_path)
+
+        for scope, filters in SCOPES.items():
+            entry = {"scope": scope}
+            for name, index, queries in (("bm25", bm25, text_queries), ("vector", vector, vector_queries)):
+                mask_ms = latency(lambda _: index.docs.mask(filters), range(20))[1]
+                pushed, pushed_timing = latency(lambda q: index.search(q, args.top_k, filters=filters), queries)
+                post, post_timing = latency(
+                    lambda q: [hit for hit in index.search(q, args.top_k * args.overfetch)
+                               if filters.matches(hit)][:args.top_k],
+                    queries,
+                )
+                entry[name] = {
+                    "mask": mask_ms,
+                    "pushed_down": dict(pushed_timing, filled=round(statistics.mean(map(len, pushed)) / args.top_k, 3)),
+                    "post_filter": dict(post_timing, filled=round(statistics.mean(map(len, post)) / args.top_k, 3)),
+                }
+            report["scopes"].append(entry)
+            print(json.dumps(entry))
+        bm25.close()
+        vector.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
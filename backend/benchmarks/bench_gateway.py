@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import time
+
+import openai
+from openai import AsyncAzureOpenAI
+
+from benchmarks import fake_openai
+from benchmarks.bench_load import percentiles
+from benchmarks.fakes import make_corpus, serve_in_thread
+from generation_gateway import GenerationGateway, GenerationUnavailable
+
+# Sends a burst of chat completions, with repeated prompts among them, to a
+# fake LLM that throttles (random 429s and/or a tokens-per-minute quota):
+# once straight through the SDK client (its default two retries) and once
+# through the GenerationGateway. Reports how many requests got an answer,
+# how many upstream calls and 429s it took, and the latency percentiles.
+# Usage (from the backend folder): python -m benchmarks.bench_gateway --throttle-rate 0.3
+
+
+def completion_args(prompt, max_tokens):
+    return {
+        "model": "fake-gpt",
+        "messages": [{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+    }
+
+
+async def timed(call):
+    # (milliseconds, error name or None)
+    start = time.perf_counter()
+    try:
+        await call
+        error = None
+    except GenerationUnavailable:
+        error = "unavailable"
+    except openai.APIStatusError as e:
+        error = str(e.status_code)
+    except openai.APIError as e:
+        error = type(e).__name__
+    return (time.perf_counter() - start) * 1000, error
+
+
+async def run(name, create, prompts, max_tokens, llm_app, gateway=None):
+    upstream_before, throttled_before = llm_app.state.requests, llm_app.state.throttled
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed(create(**completion_args(prompt, max_tokens))) for prompt in prompts))
+    wall = time.perf_counter() - start
+
+    errors = {}
+    for _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    report = {
+        "client": name,
+        "requests": len(prompts),
+        "answered": sum(1 for _, error in results if error is None),
+        "errors": errors,
+        "upstream_requests": llm_app.state.requests - upstream_before,
+        "upstream_429s": llm_app.state.throttled - throttled_before,
+        "wall_s": round(wall, 2),
+        **percentiles([elapsed for elapsed, _ in results]),
+    }
+    if gateway is not None:
+        report["gateway"] = gateway.stats()
+    return report
+
+
+async def compare(args, llm_app):
+    titles = [doc["title"] for doc in make_corpus(args.distinct)]
+    # Every distinct prompt is sent several times in the same burst
+    prompts = [titles[i % len(titles)] for i in range(args.requests)]
+    client = AsyncAzureOpenAI(azure_endpoint=f"http://127.0.0.1:{args.port}", api_key="fake", api_version="2024-02-01")
+    gateway = GenerationGateway(
+        client, max_concurrency=args.max_concurrency, tokens_per_minute=args.gateway_tokens_per_minute,
+        queue_timeout=args.queue_timeout
+    )
+    try:
+        direct = await run("direct", client.chat.completions.create, prompts, args.max_tokens, llm_app)
+        # Let the fake's quota window drain so both runs start from the same state
+        await asyncio.sleep(args.cooldown)
+        gated = await run("gateway", gateway.complete, prompts, args.max_tokens, llm_app, gateway)
+    finally:
+        await client.close()
+    return [direct, gated]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=50, help="distinct prompts among the requests")
+    parser.add_argument("--max-tokens", type=int, default=100)
+    parser.add_argument("--throttle-rate", type=float, default=0.2, help="share of upstream calls answered 429")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--tokens-per-minute", type=int, default=0, help="the fake's quota; 0 = none")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--gateway-tokens-per-minute", type=int, default=0)
+    parser.add_argument("--queue-timeout", type=float, default=30)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=500)
+    parser.add_argument("--cooldown", type=float, default=0.0, help="seconds between the two runs")
+    parser.add_argument("--port", type=int, default=8791)
+    args = parser.parse_args()
+
+    llm_app = fake_openai.create_app(
+        args.first_token_latency, args.tokens_per_second, args.max_tokens,
+        args.throttle_rate, args.retry_after, args.tokens_per_minute
+    )
+    server = serve_in_thread(llm_app, args.port)
+    try:
+        results = asyncio.run(compare(args, llm_app))
+    finally:
+        server.should_exit = True
+        server.thread.join()
+    print(json.dumps({"settings": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
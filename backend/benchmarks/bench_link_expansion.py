@@ -0,0 +1,74 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from chunker import DATA_DIR
+from link_expansion import LinkExpander
+
+# The graph builder lives with the export code
+sys.path.insert(0, DATA_DIR)
+from relationship_graph import build_graph
+
+# Cost of the link expansion step on a synthetic Ivanti-shaped corpus: problems
+# with a few workarounds each (ParentLink_RecID) and incidents pointing at
+# contacts and org units that aren't exported. Each request expands a page of
+# retrieved chunks; the report has the graph build time and per-request latency.
+# Usage (from the backend folder): python -m benchmarks.bench_link_expansion --problems 100000
+
+
+def synthetic_records(problems, workarounds_per_problem, incidents, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for p in range(problems):
+        records.append(("problems", {"RecId": f"P{p}", "OrgUnitLink_RecID": f"ORG{p % 50}"}))
+        for w in range(rng.randint(0, workarounds_per_problem)):
+            records.append(("workarounds", {"RecId": f"W{p}_{w}", "ParentLink_RecID": f"P{p}"}))
+    for i in range(incidents):
+        records.append(("incidents", {"RecId": f"I{i}", "ProfileLink_RecID": f"C{i % 1000}"}))
+    return records
+
+
+def first_chunk(entity, rec_id):
+    return {"chunk_id": f"{rec_id}_0", "title": f"{entity} {rec_id}", "content": "", "entity": entity,
+            "rec_id": rec_id, "chunk_index": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--problems", type=int, default=100_000)
+    parser.add_argument("--workarounds", type=int, default=3, help="most workarounds per problem")
+    parser.add_argument("--incidents", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.problems, args.workarounds, args.incidents)
+    graph = build_graph(records)
+    expander = LinkExpander(graph, [first_chunk(entity, record["RecId"]) for entity, record in records])
+
+    rng = random.Random(1)
+    timings = []
+    added = []
+    for _ in range(args.requests):
+        picks = rng.sample(records, args.top_k)
+        retrieved = [dict(first_chunk(entity, record["RecId"]), score=1.0) for entity, record in picks]
+        start = time.perf_counter()
+        expanded = expander.expand(retrieved)
+        timings.append((time.perf_counter() - start) * 1000)
+        added.append(len(expanded) - len(retrieved))
+    timings.sort()
+
+    print(json.dumps({
+        "graph": graph["stats"],
+        "requests": args.requests,
+        "chunks_added_mean": round(statistics.mean(added), 2),
+        "p50_ms": round(statistics.median(timings), 4),
+        "p99_ms": round(timings[int(len(timings) * 0.99) - 1], 4),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from benchmarks.fakes import make_corpus
+
+# End-to-end benchmark of /api/prompt against the local stand-ins: the fake
+# Azure Search service (seeded from Data_Ivanti, reached through the real SDK)
+# and the fake OpenAI server. The backend and both fakes run as separate
+# processes, so the fakes and the load generator don't compete with the
+# backend for the GIL. For each corpus size it measures
+#
+#   single       sequential requests: latency percentiles and the per-stage
+#                split from the Server-Timing header
+#   concurrency  throughput and latency with N requests in flight
+#   memory       backend RSS after startup and its growth per in-flight request
+#   server       the backend's own span quantiles, scraped from /metrics
+#
+# and writes everything to a JSON report. With --baseline, the headline
+# numbers are compared with an earlier report and the run fails (exit code 1)
+# when one got worse by more than --tolerance.
+# Usage (from the backend folder):
+#   python -m benchmarks.bench_load --corpus-sizes 1000,10000 --output load_report.json
+#   python -m benchmarks.bench_load --baseline load_report.json
+#   RETRIEVAL_MODE=hybrid python -m benchmarks.bench_load --corpus-sizes 1000
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1], 2)}
+
+
+def server_timing(header):
+    # "retrieval;dur=12.3, generation;dur=310.0" -> {"retrieval": 12.3, "generation": 310.0}
+    spans = {}
+    for part in (header or "").split(","):
+        name, _, duration = part.strip().partition(";dur=")
+        if name and duration:
+            spans[name] = spans.get(name, 0.0) + float(duration)
+    return spans
+
+
+def incident_prompts(corpus, count):
+    # Questions shaped like the real ones: titles of the seeded records
+    titles = [doc["title"] for doc in corpus if doc.get("title")]
+    return [titles[i % len(titles)] for i in range(count)]
+
+
+def cycle(prompts, count):
+    return [prompts[i % len(prompts)] for i in range(count)]
+
+
+async def timed_prompt(client, prompt):
+    # (milliseconds, error or None, Server-Timing spans); the error is the status code or exception name
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/prompt", json={"prompt": prompt})
+        error = None if response.status_code == 200 else str(response.status_code)
+        spans = server_timing(response.headers.get("server-timing"))
+    except httpx.HTTPError as e:
+        error, spans = type(e).__name__, {}
+    return (time.perf_counter() - start) * 1000, error, spans
+
+
+async def run_single(client, prompts):
+    latencies = []
+    spans = {}
+    errors = {}
+    for prompt in prompts:
+        elapsed, error, request_spans = await timed_prompt(client, prompt)
+        latencies.append(elapsed)
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+        for name, duration in request_spans.items():
+            spans.setdefault(name, []).append(duration)
+    return {
+        "requests": len(prompts),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        **percentiles(latencies),
+        "spans": {name: percentiles(values) for name, values in sorted(spans.items())},
+    }
+
+
+async def run_concurrent(client, prompts, concurrency):
+    queue = list(reversed(prompts))
+    latencies = []
+    errors = {}
+
+    async def worker():
+        while queue:
+            elapsed, error, _ = await timed_prompt(client, queue.pop())
+            latencies.append(elapsed)
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(prompts),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(prompts) / wall, 2),
+        **percentiles(latencies),
+    }
+
+
+def rss_kb(pid):
+    # Resident set size from /proc (Linux)
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        return int(re.search(r"VmRSS:\s+(\d+)", f.read()).group(1))
+
+
+class RssSampler:
+    """Highest RSS of a process while the `with` block runs, sampled every few milliseconds."""
+
+    def __init__(self, pid, interval=0.005):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self.running = False
+
+    def _sample(self):
+        while self.running:
+            self.peak_kb = max(self.peak_kb, rss_kb(self.pid))
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+
+
+async def run_memory(client, prompts, concurrency, pid):
+    idle_kb = rss_kb(pid)
+    with RssSampler(pid) as sampler:
+        await asyncio.gather(*(timed_prompt(client, prompt) for prompt in prompts[:concurrency]))
+    return {
+        "concurrency": concurrency,
+        "idle_rss_mb": round(idle_kb / 1024, 1),
+        "peak_rss_mb": round(sampler.peak_kb / 1024, 1),
+        "peak_kb_per_request": round(max(0, sampler.peak_kb - idle_kb) / concurrency, 1),
+    }
+
+
+SPAN_QUANTILE = re.compile(r'rag_span_seconds_recent\{span="(\w+)",quantile="([\d.]+)"\} (\S+)')
+
+
+async def server_spans(client):
+    # p50/p95/p99 of each pipeline stage as the backend measured them
+    spans = {}
+    for name, quantile, value in SPAN_QUANTILE.findall((await client.get("/metrics")).text):
+        spans.setdefault(name, {})[f"p{round(float(quantile) * 100)}_ms"] = round(float(value) * 1000, 2)
+    return spans
+
+
+async def measure(api_url, prompts, concurrency_levels, timeout, pid):
+    limits = httpx.Limits(max_connections=max(concurrency_levels) * 2)
+    async with httpx.AsyncClient(base_url=api_url, timeout=timeout, limits=limits) as client:
+        # First request opens the connections and loads what is lazily loaded
+        await timed_prompt(client, prompts[0])
+        single = await run_single(client, prompts)
+        # Four rounds of requests per level keep the slowest-request tail out of the throughput
+        concurrent = [await run_concurrent(client, cycle(prompts, level * 4), level) for level in concurrency_levels]
+        memory = await run_memory(client, cycle(prompts, max(concurrency_levels)), max(concurrency_levels), pid)
+        spans = await server_spans(client)
+    return single, concurrent, memory, spans
+
+
+def spawn(args, env=None):
+    return subprocess.Popen(
+        [sys.executable, *args], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=dict(os.environ, **(env or {})), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_up(process, url, timeout=300):
+    # Any HTTP answer means the server is listening
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not start in {timeout}s")
+
+
+def start_processes(size, args, port):
+    """Start the fake LLM, the fake search service and the backend; returns (processes, API URL, startup seconds)."""
+    llm_port, search_port = port + 1, port + 2
+    llm = spawn(["-m", "benchmarks.fake_openai", "--port", str(llm_port),
+                 "--first-token-latency", str(args.first_token_latency),
+                 "--tokens-per-second", str(args.tokens_per_second), "--reply-tokens", str(args.reply_tokens)])
+    search = spawn(["-m", "benchmarks.fake_search", "--port", str(search_port), "--chunks", str(size),
+                    "--latency", str(args.search_latency)])
+    processes = [llm, search]
+    try:
+        wait_until_up(llm, f"http://127.0.0.1:{llm_port}/")
+        wait_until_up(search, f"http://127.0.0.1:{search_port}/")
+
+        # Settings in the environment win over the .env file
+        start = time.perf_counter()
+        backend = spawn(["-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"], {
+            "AZURE_SEARCH_ENDPOINT": f"http://127.0.0.1:{search_port}",
+            "AZURE_SEARCH_KEY": "fake",
+            "AZURE_SEARCH_INDEX_NAME": "ivanti",
+            "OPENAI_API_BASE": f"http://127.0.0.1:{llm_port}",
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_API_VERSION": "2024-02-01",
+            "OPENAI_DEPLOYMENT": "fake-gpt",
+            "OPENAI_EMBEDDING_DEPLOYMENT": "fake-embedding",
+            "RETRIEVER_BACKEND": "azure",
+            # Repeated prompts would otherwise be answered from the cache instead of the fake LLM
+            "ANSWER_CACHE_ENABLED": "false",
+            "LOG_LEVEL": "WARNING",
+        })
+        processes.append(backend)
+        api_url = f"http://127.0.0.1:{port}"
+        wait_until_up(backend, f"{api_url}/")
+        return processes, api_url, time.perf_counter() - start
+    except Exception:
+        stop_processes(processes)
+        raise
+
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def run_corpus_size(size, args, port):
+    processes, api_url, startup_s = start_processes(size, args, port)
+    try:
+        prompts = incident_prompts(make_corpus(min(size, 5000)), args.requests)
+        single, concurrent, memory, spans = asyncio.run(
+            measure(api_url, prompts, args.concurrency, args.timeout, processes[-1].pid)
+        )
+    finally:
+        stop_processes(processes)
+
+    return {
+        "corpus_chunks": size,
+        "backend_startup_s": round(startup_s, 2),
+        "single": single,
+        "concurrency": concurrent,
+        "memory": memory,
+        "server_spans": spans,
+    }
+
+
+def headline(report):
+    """Flat {metric: (value, "lower" | "higher" is better)} used for the baseline comparison."""
+    metrics = {}
+    for entry in report["corpus_sizes"]:
+        prefix = f"chunks={entry['corpus_chunks']}"
+        metrics[f"{prefix} single p50_ms"] = (entry["single"]["p50_ms"], "lower")
+        metrics[f"{prefix} single p95_ms"] = (entry["single"]["p95_ms"], "lower")
+        for level in entry["concurrency"]:
+            metrics[f"{prefix} c={level['concurrency']} throughput_rps"] = (level["throughput_rps"], "higher")
+            metrics[f"{prefix} c={level['concurrency']} p95_ms"] = (level["p95_ms"], "lower")
+            metrics[f"{prefix} c={level['concurrency']} errors"] = (level["errors"], "lower")
+        metrics[f"{prefix} peak_kb_per_request"] = (entry["memory"]["peak_kb_per_request"], "lower")
+    return metrics
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    current = headline(report)
+    for name, (old, better) in headline(baseline).items():
+        if name not in current:
+            continue
+        new = current[name][0]
+        if name.endswith("errors"):
+            worse = new > old
+        elif better == "lower":
+            worse = new > old * (1 + tolerance)
+        else:
+            worse = new < old * (1 - tolerance)
+        if worse:
+            regressions.append({"metric": name, "baseline": old, "current": new})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus-sizes", type=lambda text: [int(v) for v in text.split(",")], default=[1000, 10000])
+    parser.add_argument("--requests", type=int, default=20, help="sequential requests per corpus size")
+    parser.add_argument("--concurrency", type=lambda text: [int(v) for v in text.split(",")], default=[4, 16, 64])
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--reply-tokens", type=int, default=100)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--port", type=int, default=8810, help="first of the three ports used (API, LLM, search)")
+    parser.add_argument("--output", default=None, help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", default=None, help="earlier report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "retrieval_mode": os.getenv("RETRIEVAL_MODE", "keyword"),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "corpus_sizes": [],
+    }
+    for size in args.corpus_sizes:
+        entry = run_corpus_size(size, args, args.port)
+        report["corpus_sizes"].append(entry)
+        print(json.dumps({"corpus_chunks": size, "single_p50_ms": entry["single"]["p50_ms"],
+                          "throughput_rps": [level["throughput_rps"] for level in entry["concurrency"]]}),
+              file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.tolerance)
+        report["baseline_commit"] = baseline.get("meta", {}).get("commit")
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if report.get("regressions"):
+        print(f"{len(report['regressions'])} metrics regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
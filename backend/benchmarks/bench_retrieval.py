@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.fakes import FakeSearchClient, make_corpus
+from retrieval import retrieve_chunks
+
+# Compares the old full-index scan with top-k keyword retrieval on a fake index.
+# Usage (from the backend folder): python -m benchmarks.bench_retrieval --chunks 5000
+
+
+def retrieved_chars(docs):
+    # Amount of text that came back from the index for one prompt
+    return sum(len(doc.get("content", "")) for doc in docs)
+
+
+async def run(mode, client, queries, top_k):
+    timings = []
+    chars = []
+    for query in queries:
+        start = time.perf_counter()
+        docs = await retrieve_chunks(client, query, mode=mode, top_k=top_k, min_score=0)
+        timings.append((time.perf_counter() - start) * 1000)
+        chars.append(retrieved_chars(docs))
+    return {
+        "mode": mode,
+        "p50_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "avg_retrieved_chars": round(statistics.mean(chars)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--page-latency", type=float, default=0.05, help="seconds per page of 1000 results")
+    args = parser.parse_args()
+
+    docs = make_corpus(args.chunks)
+    client = FakeSearchClient(docs, page_latency=args.page_latency)
+    queries = [doc["title"] for doc in docs[:args.queries]]
+
+    results = [asyncio.run(run(mode, client, queries, args.top_k)) for mode in ("full", "keyword")]
+    print(json.dumps({"chunks": args.chunks, "top_k": args.top_k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
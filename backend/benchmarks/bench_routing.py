@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+import app as backend
+import model_router
+from benchmarks.fakes import make_corpus
+from benchmarks.harness import start_stack
+from model_router import RouteStats
+from retrieval import ROUTING_SELECT_FIELDS
+
+# Runs the same mix of prompts with model routing off and on and compares the
+# per-route latency and estimated cost from /api/admin/routing. The mix has
+# record lookups ("What is the status of <title>?"), short questions (a
+# record's subject) and diagnostic ones ("Why does ... keep happening?").
+# The fake LLM answers every deployment; the small route only differs by its
+# lower max_tokens and its price.
+# Usage (from the backend folder): python -m benchmarks.bench_routing --prompts 60
+
+
+def prompt_mix(corpus, count):
+    titles = [doc["title"] for doc in corpus if doc.get("title")]
+    shapes = ("What is the status of {}?", "{}", "Why does {} keep happening and how do I troubleshoot it?")
+    return [shapes[i % len(shapes)].format(titles[i % len(titles)]) for i in range(count)]
+
+
+async def run(api_url, prompts, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    routes = {}
+
+    async def send(client, prompt):
+        async with slots:
+            response = await client.post("/api/prompt", json={"prompt": prompt})
+            response.raise_for_status()
+            route = response.json()["route"]
+            routes[route] = routes.get(route, 0) + 1
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(send(client, prompt) for prompt in prompts))
+        wall = time.perf_counter() - start
+        stats = (await client.get("/api/admin/routing")).json()["routes"]
+
+    return {
+        "wall_s": round(wall, 2),
+        "routes": stats,
+        "cost_usd": round(sum(route["cost_usd"] for route in stats.values()), 6),
+        "llm_tokens": sum(route["prompt_tokens"] + route["completion_tokens"] for route in stats.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--reply-tokens", type=int, default=400)
+    args = parser.parse_args()
+
+    stack = start_stack(
+        chunks=args.chunks, first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens,
+    )
+    prompts = prompt_mix(make_corpus(args.chunks), args.prompts)
+    report = {"prompts": len(prompts)}
+    try:
+        # Prices of a small deployment apply only when one is configured
+        model_router.OPENAI_SMALL_DEPLOYMENT = "fake-gpt-mini"
+        # As if ROUTING_ENABLED had been set at startup; both runs retrieve the same fields
+        backend.retriever.select = ROUTING_SELECT_FIELDS
+        for enabled in (False, True):
+            backend.ROUTING_ENABLED = enabled
+            backend.route_stats = RouteStats()
+            report["routing_on" if enabled else "routing_off"] = asyncio.run(run(stack.api_url, prompts, args.concurrency))
+    finally:
+        stack.stop()
+
+    off, on = report["routing_off"], report["routing_on"]
+    report["cost_saved"] = round(1 - on["cost_usd"] / off["cost_usd"], 3) if off["cost_usd"] else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks.fakes import make_corpus
+from benchmarks.harness import start_stack
+
+# Time-to-first-token of /api/prompt versus /api/prompt/stream, with the
+# backend and a fake streaming LLM both served locally over HTTP.
+# Usage (from the backend folder): python -m benchmarks.bench_streaming
+
+
+def blocking_request(client, prompt):
+    start = time.perf_counter()
+    response = client.post("/api/prompt", json={"prompt": prompt})
+    response.raise_for_status()
+    elapsed = (time.perf_counter() - start) * 1000
+    # The whole answer arrives at once, so first token == total
+    return elapsed, elapsed
+
+
+def streaming_request(client, prompt, disconnect_after=None):
+    start = time.perf_counter()
+    first_token_ms = None
+    deltas = 0
+    with client.stream("POST", "/api/prompt/stream", json={"prompt": prompt}) as response:
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "delta":
+                deltas += 1
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                if disconnect_after and deltas >= disconnect_after:
+                    break
+    return first_token_ms, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--reply-tokens", type=int, default=100)
+    parser.add_argument("--llm-port", type=int, default=8781)
+    parser.add_argument("--api-port", type=int, default=8780)
+    args = parser.parse_args()
+
+    stack = start_stack(
+        api_port=args.api_port,
+        llm_port=args.llm_port,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+    )
+
+    prompts = [doc["title"] for doc in make_corpus(args.requests)]
+    report = {}
+    with httpx.Client(base_url=stack.api_url, timeout=60) as client:
+        for name, fn in (("blocking", blocking_request), ("streaming", streaming_request)):
+            results = [fn(client, prompt) for prompt in prompts]
+            report[name] = {
+                "first_token_p50_ms": round(statistics.median(r[0] for r in results), 1),
+                "total_p50_ms": round(statistics.median(r[1] for r in results), 1),
+            }
+
+        # Hang up after a few tokens and check the upstream generation was cancelled
+        cancelled_before = stack.llm_app.state.cancelled
+        streaming_request(client, prompts[0], disconnect_after=3)
+        time.sleep(1)
+        report["disconnect_cancelled_upstream"] = stack.llm_app.state.cancelled > cancelled_before
+
+    stack.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
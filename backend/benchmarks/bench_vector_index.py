@@ -0,0 +1,81 @@
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex, build_index, normalize
+
+# Recall and latency of the IVF index against brute-force search over the same
+# vectors. Vectors are synthetic: points scattered around random topic centres,
+# like chunks about the same subjects. Queries are perturbed corpus vectors.
+# Usage (from the backend folder): python -m benchmarks.bench_vector_index --chunks 100000
+
+
+def clustered_vectors(count, dimensions, topics, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((topics, dimensions)))
+    labels = rng.integers(0, topics, count)
+    return normalize(centres[labels] + 0.6 * normalize(rng.standard_normal((count, dimensions))))
+
+
+def latency(fn, queries):
+    timings = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return results, {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p99_ms": round(timings[int(len(timings) * 0.99) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--probes", default="1,4,8,16,32")
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.chunks, args.dimensions, args.topics)
+    docs = [{"chunk_id": str(i), "title": f"chunk {i}", "content": ""} for i in range(args.chunks)]
+    rng = np.random.default_rng(1)
+    picks = rng.choice(args.chunks, args.queries, replace=False)
+    queries = normalize(vectors[picks] + 0.3 * normalize(rng.standard_normal((args.queries, args.dimensions))))
+
+    with tempfile.TemporaryDirectory() as path:
+        meta = build_index(docs, vectors, path, model="synthetic")
+
+        start = time.perf_counter()
+        index = VectorIndex(path)
+        open_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        exact, brute = latency(lambda q: set(index.brute_force_rows(q, args.top_k)[0].tolist()), queries)
+        report = {
+            "chunks": args.chunks,
+            "dimensions": args.dimensions,
+            "lists": meta["lists"],
+            "build_seconds": meta["build_seconds"],
+            "open_ms": open_ms,
+            "brute_force": brute,
+            "ivf": [],
+        }
+        for probes in [int(p) for p in args.probes.split(",")]:
+            found, timing = latency(lambda q: set(index.search_rows(q, args.top_k, probes)[0].tolist()), queries)
+            recall = statistics.mean(len(f & e) / args.top_k for f, e in zip(found, exact))
+            report["ivf"].append({"probes": probes, f"recall@{args.top_k}": round(recall, 3), **timing})
+        index.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
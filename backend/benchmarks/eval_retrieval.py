@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import bm25_index
+import vector_index
+from chunker import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, DATA_DIR, chunk_entities, chunk_record, load_records
+from context_packer import count_tokens
+from embeddings import EmbeddingCache, EMBEDDING_CACHE_PATH, create_embedder, embed_chunks
+from retrieval import retrieve_chunks
+from retrievers import HybridRetriever, LocalBM25Retriever, LocalVectorRetriever
+
+# Retrieval quality and speed on questions mined from the export. Resolved
+# incidents and closed service requests pair a question (Subject + Symptom)
+# with the Resolution that answered it. Those records are held out: they are
+# indexed with their Resolution only, so a retriever has to find the answer
+# from the question rather than match the question's own text. Every other
+# record is chunked as usual. A chunk answers a question when it belongs to
+# the held-out record or carries the same resolution text (many service
+# requests were closed with the same one).
+#
+# Each configuration (full scan, BM25, vector, hybrid, at each top-k) answers
+# every question, and the report gives side by side:
+#
+#   recall@k         share of questions whose resolution is among the k chunks
+#   mrr              mean of 1 / rank of the first such chunk (0 when missing)
+#   p50/p95 ms       per-query retrieval latency
+#   context_tokens   mean tokens of the returned chunks, i.e. prompt cost
+#
+# The cheapest configuration whose recall is close enough to the best is the
+# one to run. Vectors come from the embedding deployment (and its cache), or
+# with --fake from the local hashing embedder so the run is fully offline.
+# Usage (from the backend folder): python -m benchmarks.eval_retrieval --fake --top-k 3,5,8
+
+# Statuses that mean the Resolution really answered the question
+RESOLVED_STATUSES = {
+    "incidents": {"Resolved", "Closed"},
+    "service_requests": {"Closed", "Fulfilled"},
+}
+# Record fields that hold the question; blanked in the indexed copy of a held-out record
+QUESTION_FIELDS = ["Subject", "Symptom", "HTML_Description", "HTML_Description_Text"]
+
+
+def mine_questions(data_dir=DATA_DIR, limit=None):
+    """(entity, record) pairs with a question and a resolution, incidents first."""
+    pairs = []
+    for entity, statuses in RESOLVED_STATUSES.items():
+        for record in load_records(entity, data_dir):
+            question = question_text(record)
+            if record.get("Status") in statuses and record.get("Resolution") and question and record.get("RecId"):
+                pairs.append((entity, record))
+    return pairs[:limit] if limit else pairs
+
+
+def question_text(record):
+    return "\n".join(str(record[field]).strip() for field in ("Subject", "Symptom") if record.get(field))
+
+
+def evaluation_chunks(pairs, data_dir=DATA_DIR):
+    """All chunks, with each held-out record reduced to its resolution."""
+    held_out = {record["RecId"]: (entity, record) for entity, record in pairs}
+    chunks = [chunk for chunk in chunk_entities(data_dir=data_dir) if chunk["rec_id"] not in held_out]
+    for entity, record in held_out.values():
+        answer_only = dict(record, **{field: None for field in QUESTION_FIELDS})
+        chunks.extend(chunk_record(entity, answer_only, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS))
+    return chunks
+
+
+def normalized(text):
+    return " ".join(str(text).lower().split())
+
+
+def first_relevant_rank(chunks, record):
+    resolution = normalized(record["Resolution"])
+    for rank, chunk in enumerate(chunks, start=1):
+        if chunk.get("rec_id") == record["RecId"] or resolution in normalized(chunk.get("content") or ""):
+            return rank
+    return None
+
+
+async def evaluate(name, retrieve, pairs, top_k):
+    """Run every question through `retrieve(query, top_k)`; returns the metrics and the per-query rows."""
+    ranks, timings, tokens, rows = [], [], [], []
+    for entity, record in pairs:
+        start = time.perf_counter()
+        chunks = await retrieve(question_text(record), top_k)
+        elapsed = (time.perf_counter() - start) * 1000
+        rank = first_relevant_rank(chunks, record)
+        ranks.append(rank)
+        timings.append(elapsed)
+        tokens.append(sum(count_tokens(chunk.get("content") or "") for chunk in chunks))
+        rows.append({"rec_id": record["RecId"], "entity": entity, "rank": rank, "ms": round(elapsed, 2)})
+
+    timings.sort()
+    metrics = {
+        "config": name,
+        "top_k": top_k,
+        "queries": len(pairs),
+        "recall": round(sum(rank is not None for rank in ranks) / len(ranks), 3),
+        "mrr": round(statistics.mean(1 / rank if rank else 0.0 for rank in ranks), 3),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 2),
+        "context_tokens": round(statistics.mean(tokens)),
+    }
+    return metrics, rows
+
+
+async def embed_query_with(embedder, model):
+    # Fake-embedder indexes are queried locally; others go through the embedding deployment
+    local = vector_index.query_embedder(model)
+    if local is not None:
+        return local
+
+    async def embed(text):
+        return (await embedder([text]))[0]
+    return embed
+
+
+async def build_retrievers(chunks, path, fake):
+    """The retrievers to compare, as {name: async retrieve(query, top_k)}, plus build stats."""
+    bm25_meta = bm25_index.build_index(chunks, os.path.join(path, "bm25"))
+    bm25 = LocalBM25Retriever(bm25_index.BM25Index(os.path.join(path, "bm25")))
+
+    embedder = create_embedder(fake)
+    cache = EmbeddingCache(os.path.join(path, "embeddings.db") if fake else EMBEDDING_CACHE_PATH)
+    vectors, embedding_stats = await embed_chunks(chunks, embedder, cache)
+    cache.close()
+    vector_meta = vector_index.build_index(
+        chunks, [vectors[chunk["chunk_id"]] for chunk in chunks], os.path.join(path, "vector"), embedder.model
+    )
+    vector = LocalVectorRetriever(
+        vector_index.VectorIndex(os.path.join(path, "vector")), await embed_query_with(embedder, embedder.model)
+    )
+    hybrid = HybridRetriever(bm25, vector)
+
+    async def full(query, top_k):
+        # The old behaviour: every chunk goes to the model, whatever top_k is
+        return await retrieve_chunks(None, query, mode="full", corpus=chunks)
+
+    retrievers = {
+        "full": full,
+        "bm25": lambda query, top_k: bm25.retrieve(query, top_k, min_score=0),
+        "vector": lambda query, top_k: vector.retrieve(query, top_k, min_score=-1),
+        "hybrid": lambda query, top_k: hybrid.retrieve(query, top_k, min_score=-1),
+    }
+    stats = {"bm25": bm25_meta, "vector": vector_meta, "embedding": embedding_stats}
+    return retrievers, hybrid, stats
+
+
+async def run(args):
+    pairs = mine_questions(args.data_dir, args.limit)
+    if not pairs:
+        raise SystemExit(f"no resolved incidents or service requests under {args.data_dir}")
+    chunks = evaluation_chunks(pairs, args.data_dir)
+
+    with tempfile.TemporaryDirectory() as path:
+        retrievers, hybrid, stats = await build_retrievers(chunks, path, args.fake)
+        results, details = [], {}
+        try:
+            for name, retrieve in retrievers.items():
+                if name not in args.configs:
+                    continue
+                # Full scan ignores top_k, so it is run once
+                for top_k in ([max(args.top_k)] if name == "full" else args.top_k):
+                    metrics, rows = await evaluate(name, retrieve, pairs, top_k)
+                    if name == "full":
+                        metrics["top_k"] = None
+                    results.append(metrics)
+                    details[f"{name}@{metrics['top_k'] or 'all'}"] = rows
+        finally:
+            # Closes the BM25 and vector indexes too
+            await hybrid.close()
+
+    report = {
+        "questions": len(pairs),
+        "by_entity": {entity: sum(1 for e, _ in pairs if e == entity) for entity in RESOLVED_STATUSES},
+        "chunks": len(chunks),
+        "embedding_model": stats["vector"]["model"],
+        "index": stats,
+        "results": results,
+    }
+    if args.per_query:
+        report["per_query"] = details
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k, MRR and latency of each retriever on mined questions")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--limit", type=int, default=None, help="questions to use (default: all mined)")
+    parser.add_argument("--top-k", type=lambda value: [int(k) for k in value.split(",")], default=[1, 3, 5, 8, 10])
+    parser.add_argument("--configs", type=lambda value: value.split(","), default=["full", "bm25", "vector", "hybrid"])
+    parser.add_argument("--fake", action="store_true", help="use the deterministic local embedder")
+    parser.add_argument("--per-query", action="store_true", help="include every question's rank and latency")
+    parser.add_argument("--output", default=None, help="write the report here as well as to stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
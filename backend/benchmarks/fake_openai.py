@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from embeddings import FakeEmbedder
+
+# Local stand-in for the Azure OpenAI chat completions and embeddings APIs.
+# Latency before the first token and the token rate are configurable, so
+# time-to-first-token and total generation time can be measured offline.
+# It can also throttle like the service: a share of requests answered 429 at
+# random, and/or a tokens-per-minute quota (prompt words + reply tokens over a
+# sliding minute), both with Retry-After and retry-after-ms headers.
+# Embeddings come from FakeEmbedder, the same one the fake search service
+# embeds its documents with, so vector and hybrid retrieval work end to end.
+#
+# Run on its own:  python -m benchmarks.fake_openai --port 8081
+# then point OPENAI_API_BASE at http://127.0.0.1:8081
+
+FIRST_TOKEN_LATENCY = float(os.getenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0.3"))
+TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+REPLY_TOKENS = int(os.getenv("FAKE_LLM_REPLY_TOKENS", "100"))
+THROTTLE_RATE = float(os.getenv("FAKE_LLM_THROTTLE_RATE", "0"))
+THROTTLE_RETRY_AFTER = float(os.getenv("FAKE_LLM_THROTTLE_RETRY_AFTER", "1"))
+TOKENS_PER_MINUTE = int(os.getenv("FAKE_LLM_TOKENS_PER_MINUTE", "0"))  # 0 = no quota
+
+
+def create_app(first_token_latency=FIRST_TOKEN_LATENCY, tokens_per_second=TOKENS_PER_SECOND, reply_tokens=REPLY_TOKENS,
+               throttle_rate=THROTTLE_RATE, throttle_retry_after=THROTTLE_RETRY_AFTER, tokens_per_minute=TOKENS_PER_MINUTE):
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.cancelled = 0
+    app.state.throttled = 0
+    # (time, tokens) of the requests admitted in the last minute
+    quota = deque()
+    embedder = FakeEmbedder()
+
+    def throttled(retry_after):
+        app.state.throttled += 1
+        return JSONResponse(
+            {"error": {"code": "429", "message": "Requests to the ChatCompletions_Create Operation have exceeded "
+                                                 f"the rate limit. Please retry after {math.ceil(retry_after)} seconds."}},
+            status_code=429,
+            headers={"retry-after": str(math.ceil(retry_after)), "retry-after-ms": str(round(retry_after * 1000))}
+        )
+
+    def over_quota(tokens):
+        # Seconds until the request would fit the quota, or None when it fits now
+        now = time.monotonic()
+        while quota and now - quota[0][0] >= 60:
+            quota.popleft()
+        if sum(used for _, used in quota) + tokens > tokens_per_minute and quota:
+            return quota[0][0] + 60 - now
+        quota.append((now, tokens))
+        return None
+
+    def reply_words(body):
+        # Echo a bit of the question so answers differ per prompt; max_tokens cuts the reply short like the service
+        question = body["messages"][-1]["content"].split()
+        length = min(reply_tokens, body.get("max_tokens") or reply_tokens)
+        return [question[i % len(question)] if question else "token" for i in range(length)]
+
+    def prompt_words(body):
+        return sum(len(str(message.get("content") or "").split()) for message in body["messages"])
+
+    def completion_id():
+        return f"chatcmpl-fake-{app.state.requests}"
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        words = reply_words(body)
+        created = int(time.time())
+
+        if throttle_rate and random.random() < throttle_rate:
+            return throttled(throttle_retry_after)
+        if tokens_per_minute:
+            wait = over_quota(prompt_words(body) + len(words))
+            if wait is not None:
+                return throttled(wait)
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_latency + len(words) / tokens_per_second)
+            return {
+                "id": completion_id(),
+                "object": "chat.completion",
+                "created": created,
+                "model": deployment,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                # Words stand in for tokens
+                "usage": {
+                    "prompt_tokens": prompt_words(body),
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_words(body) + len(words),
+                },
+            }
+
+        async def chunks():
+            def chunk(delta, finish_reason=None):
+                payload = {
+                    "id": completion_id(),
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": deployment,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            try:
+                await asyncio.sleep(first_token_latency)
+                yield chunk({"role": "assistant", "content": ""})
+                for word in words:
+                    yield chunk({"content": word + " "})
+                    await asyncio.sleep(1 / tokens_per_second)
+                yield chunk({}, "stop")
+                yield "data: [DONE]\n\n"
+            except asyncio.CancelledError:
+                # The backend closed the stream before the reply finished
+                app.state.cancelled += 1
+                raise
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        words = sum(len(str(text).split()) for text in texts)
+        return {
+            "object": "list",
+            "model": deployment,
+            "data": [{"object": "embedding", "index": i, "embedding": embedder.embed(text)} for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": words, "total_tokens": words},
+        }
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--first-token-latency", type=float, default=FIRST_TOKEN_LATENCY)
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND)
+    parser.add_argument("--reply-tokens", type=int, default=REPLY_TOKENS)
+    parser.add_argument("--throttle-rate", type=float, default=THROTTLE_RATE, help="share of requests answered 429")
+    parser.add_argument("--retry-after", type=float, default=THROTTLE_RETRY_AFTER)
+    parser.add_argument("--tokens-per-minute", type=int, default=TOKENS_PER_MINUTE, help="quota; 0 = none")
+    args = parser.parse_args()
+
+    app = create_app(
+        args.first_token_latency, args.tokens_per_second, args.reply_tokens,
+        args.throttle_rate, args.retry_after, args.tokens_per_minute
+    )
+    uvicorn.run(app, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
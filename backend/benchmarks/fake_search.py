@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+
+from azure.search.documents.models import VectorizedQuery
+from fastapi import FastAPI, Request
+
+from benchmarks.fakes import FakeSearchClient, make_corpus
+
+# Local stand-in for the Azure AI Search REST API, seeded from the Data_Ivanti
+# batches. Unlike FakeSearchClient (which replaces the SDK object), the backend
+# talks to it through the real azure-search-documents client over HTTP, so
+# serialization and connection handling are part of what gets measured.
+# Only the documents search POST is served; keyword and vector scoring, $filter,
+# $select, $orderby and paging come from FakeSearchClient and follow the service:
+# 50 results per page without `top`, at most 1000 per response, and
+# @search.nextPageParameters when more results are left.
+#
+# Run on its own:  python -m benchmarks.fake_search --port 8082 --chunks 5000
+# then point AZURE_SEARCH_ENDPOINT at http://127.0.0.1:8082
+
+SEARCH_LATENCY = float(os.getenv("FAKE_SEARCH_LATENCY", "0.02"))
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+def sort_documents(docs, order_by):
+    # "$orderby": "chunk_id asc, title desc"; applied last clause first so the first one wins
+    for clause in reversed([clause.split() for clause in order_by.split(",") if clause.strip()]):
+        field, direction = clause[0], (clause[1] if len(clause) > 1 else "asc")
+        docs.sort(key=lambda doc: (doc.get(field) is None, doc.get(field) or ""), reverse=direction == "desc")
+    return docs
+
+
+def create_app(docs, latency=SEARCH_LATENCY):
+    app = FastAPI()
+    app.state.requests = 0
+    index = FakeSearchClient(docs)
+
+    @app.post("/indexes('{index_name}')/docs/search.post.search")
+    async def search(index_name: str, request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        await asyncio.sleep(latency)  # service-side query time
+
+        vector_queries = [
+            VectorizedQuery(vector=query["vector"], k_nearest_neighbors=query.get("k") or DEFAULT_PAGE_SIZE,
+                            fields=query.get("fields"))
+            for query in body.get("vectorQueries") or ()
+        ]
+        select = [field.strip() for field in body["select"].split(",")] if body.get("select") else None
+        results = await index.search(
+            search_text=body.get("search"), select=select, filter=body.get("filter"), vector_queries=vector_queries
+        )
+        docs = results.docs
+        if body.get("orderby"):
+            docs = sort_documents(list(docs), body["orderby"])
+
+        top = body.get("top")
+        skip = body.get("skip") or 0
+        page_size = min(top, MAX_PAGE_SIZE) if top is not None else DEFAULT_PAGE_SIZE
+        response = {"value": docs[skip:skip + page_size]}
+
+        remaining = len(docs) - skip - page_size
+        if remaining > 0 and (top is None or top > page_size):
+            response["@search.nextPageParameters"] = dict(
+                body, skip=skip + page_size, top=top - page_size if top is not None else None
+            )
+        return response
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=SEARCH_LATENCY)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(make_corpus(args.chunks), args.latency), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import asyncio
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+import uvicorn
+
+from chunker import content_hash
+from embeddings import FakeEmbedder, embedding_text
+from filters import record_filter_fields
+
+# Local stand-ins for the Azure services so the backend can be measured offline.
+# Run the benchmarks from the backend folder, e.g. `python -m benchmarks.bench_retrieval`.
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "Data_Ivanti")
+
+# Text fields that make up a chunk for each kind of record
+TEXT_FIELDS = ["Subject", "Title", "Symptom", "Description", "Details", "Resolution", "ResolutionAction"]
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def load_ivanti_records():
+    # Read every exported batch file under Data_Ivanti/*_batches; each record gets its "_entity"
+    records = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*_batches", "*.json"))):
+        entity = os.path.basename(os.path.dirname(path))[:-len("_batches")]
+        with open(path, encoding="utf-8") as f:
+            records.extend(dict(record, _entity=entity) for record in json.load(f))
+    return records
+
+
+def make_corpus(size):
+    """Build `size` chunk documents by cycling through the exported Ivanti records."""
+    records = [r for r in load_ivanti_records() if any(r.get(field) for field in TEXT_FIELDS)]
+    docs = []
+    for i in range(size):
+        record = records[i % len(records)]
+        title = record.get("Subject") or record.get("Title") or record.get("RecId")
+        content = "\n".join(str(record[field]) for field in TEXT_FIELDS if record.get(field))
+        fields = record_filter_fields(record["_entity"], record)
+        docs.append({
+            "chunk_id": f"{record['RecId']}_{i}",
+            "title": title,
+            "content": content,
+            "content_hash": content_hash(title, content, fields),
+            **fields,
+        })
+    return docs
+
+
+# The $filter shapes RetrievalFilters.odata() produces
+ODATA_CLAUSE = re.compile(
+    r"(\w+) eq '((?:[^']|'')*)'"
+    r"|search\.in\((\w+), '((?:[^']|'')*)', '\|'\)"
+    r"|(\w+) (ge|lt) (\S+)"
+)
+
+
+def odata_matches(doc, expression):
+    for eq_field, eq_value, in_field, in_values, cmp_field, operator, bound in ODATA_CLAUSE.findall(expression):
+        if eq_field and doc.get(eq_field) != eq_value.replace("''", "'"):
+            return False
+        if in_field and doc.get(in_field) not in in_values.replace("''", "'").split("|"):
+            return False
+        if cmp_field:
+            value = doc.get(cmp_field)
+            if value is None or not (value >= bound if operator == "ge" else value < bound):
+                return False
+    return True
+
+
+class FakeSearchPage:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeSearchResults:
+    def __init__(self, docs, page_size, page_latency):
+        self.docs = docs
+        self.page_size = page_size
+        self.page_latency = page_latency
+
+    async def by_page(self):
+        for start in range(0, len(self.docs), self.page_size):
+            await asyncio.sleep(self.page_latency)  # one HTTP round trip per page
+            yield FakeSearchPage(self.docs[start:start + self.page_size])
+
+    async def __aiter__(self):
+        async for page in self.by_page():
+            async for doc in page:
+                yield doc
+
+
+class FakeSearchClient:
+    """In-memory stand-in for azure.search.documents.aio.SearchClient.
+
+    A wildcard search ("*") matches the whole corpus, which the "full" mode
+    reads with `top`/`skip` pages. Any other text is scored with a small TF-IDF so
+    the top results resemble a keyword query. Vector queries are answered by
+    brute-force cosine over the documents embedded with FakeEmbedder (the fake
+    LLM's embeddings endpoint uses the same one), and text plus vectors are
+    fused with reciprocal rank fusion like the service's hybrid search. Each
+    page of results costs `page_latency` seconds to simulate the network.
+    """
+
+    def __init__(self, docs, page_latency=0.0, page_size=1000):
+        self.docs = docs
+        self.page_latency = page_latency
+        self.page_size = page_size
+        self.search_calls = 0
+        self.embedder = FakeEmbedder()
+        self._vectors = None
+
+        # Inverted index: term -> {doc position: term frequency}
+        self.postings = defaultdict(dict)
+        for position, doc in enumerate(docs):
+            for term, count in Counter(tokenize(f"{doc.get('title', '')} {doc.get('content', '')}")).items():
+                self.postings[term][position] = count
+
+    def _score(self, search_text):
+        scores = defaultdict(float)
+        for term in set(tokenize(search_text)):
+            matches = self.postings.get(term, {})
+            if not matches:
+                continue
+            idf = math.log(1 + len(self.docs) / len(matches))
+            for position, count in matches.items():
+                scores[position] += (1 + math.log(count)) * idf
+        return scores
+
+    def _vector_ranking(self, query, allowed):
+        # (position, score) of the query's k nearest documents; cosine scores like the service's 1 / (1 + distance)
+        if self._vectors is None:
+            self._vectors = np.array([self.embedder.embed(embedding_text(doc)) for doc in self.docs], dtype=np.float32)
+        if len(query.vector) != self._vectors.shape[1]:
+            raise ValueError(f"Vector query has {len(query.vector)} dimensions; the fake index has {self._vectors.shape[1]}")
+        similarity = self._vectors @ np.asarray(query.vector, dtype=np.float32)
+        ranked = [position for position in np.argsort(-similarity) if allowed(position)][:query.k_nearest_neighbors]
+        return [(int(position), 1 / (2 - float(similarity[position]))) for position in ranked]
+
+    async def search(self, search_text=None, top=None, skip=None, select=None, vector_queries=None, order_by=None,
+                     filter=None, **kwargs):
+        self.search_calls += 1
+
+        def allowed(position):
+            return not filter or odata_matches(self.docs[position], filter)
+
+        if vector_queries:
+            rankings = [self._vector_ranking(query, allowed) for query in vector_queries]
+            if search_text not in (None, "*"):
+                scores = self._score(search_text)
+                rankings.append(sorted(((p, s) for p, s in scores.items() if allowed(p)), key=lambda item: item[1], reverse=True))
+            if len(rankings) > 1:
+                # Reciprocal rank fusion, as the service scores hybrid queries
+                fused = defaultdict(float)
+                for ranking in rankings:
+                    for rank, (position, _) in enumerate(ranking, start=1):
+                        fused[position] += 1 / (60 + rank)
+                ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+            else:
+                ranked = rankings[0]
+            results = [dict(self.docs[position], **{"@search.score": score}) for position, score in ranked]
+        elif search_text in (None, "*"):
+            results = [dict(doc, **{"@search.score": 1.0}) for position, doc in enumerate(self.docs) if allowed(position)]
+        else:
+            scores = self._score(search_text)
+            ranked = sorted(((p, s) for p, s in scores.items() if allowed(p)), key=lambda item: item[1], reverse=True)
+            results = [dict(self.docs[position], **{"@search.score": score}) for position, score in ranked]
+        # Like the service, `top` limits the whole result set
+        results = results[skip or 0:][:top]
+
+        if select:
+            results = [{k: v for k, v in doc.items() if k in select or k.startswith("@search.")} for doc in results]
+
+        return FakeSearchResults(results, self.page_size, self.page_latency)
+
+    async def close(self):
+        pass
+
+
+def serve_in_thread(asgi_app, port):
+    """Run an ASGI app with uvicorn on a background thread; returns the server (set should_exit to stop).
+
+    The thread is kept on `server.thread` so callers can wait for the shutdown.
+    """
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    server.thread = thread
+    while not server.started:
+        time.sleep(0.01)
+    return server
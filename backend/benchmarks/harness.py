@@ -0,0 +1,64 @@
+import os
+from dataclasses import dataclass, field
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents.aio import SearchClient
+from openai import AsyncAzureOpenAI
+
+import app as backend
+import retrieval
+from benchmarks import fake_openai, fake_search
+from benchmarks.fakes import FakeSearchClient, make_corpus, serve_in_thread
+
+# Starts the real backend app plus a fake LLM server on localhost, wired together.
+# With search_port set, Azure Search is a fake HTTP service reached through the
+# real SDK client instead of the in-process FakeSearchClient.
+
+
+@dataclass
+class LocalStack:
+    api_url: str
+    llm_app: object
+    search_client: FakeSearchClient
+    servers: list
+    search_app: object = None
+    corpus: list = field(default_factory=list)
+
+    def stop(self):
+        for server in self.servers:
+            server.should_exit = True
+        # Wait for the backend's lifespan shutdown so another stack can start in this process
+        for server in self.servers:
+            server.thread.join()
+
+
+def start_stack(api_port=8780, llm_port=8781, chunks=2000, page_latency=0.0,
+                first_token_latency=0.3, tokens_per_second=50, reply_tokens=100, answer_cache=False,
+                search_port=None, search_latency=fake_search.SEARCH_LATENCY):
+    llm_app = fake_openai.create_app(first_token_latency, tokens_per_second, reply_tokens)
+    llm_server = serve_in_thread(llm_app, llm_port)
+    servers = [llm_server]
+    corpus = make_corpus(chunks)
+
+    # Point the backend at the local stand-ins before its lifespan hook runs
+    os.environ["OPENAI_DEPLOYMENT"] = "fake-gpt"
+    # Vector and hybrid modes embed the prompt through the fake LLM
+    retrieval.EMBEDDING_DEPLOYMENT = retrieval.EMBEDDING_DEPLOYMENT or "fake-embedding"
+    search_app = None
+    if search_port is not None:
+        search_app = fake_search.create_app(corpus, search_latency)
+        servers.append(serve_in_thread(search_app, search_port))
+        search_client = SearchClient(
+            endpoint=f"http://127.0.0.1:{search_port}", index_name="ivanti", credential=AzureKeyCredential("fake")
+        )
+    else:
+        search_client = FakeSearchClient(corpus, page_latency=page_latency)
+    backend.search_client = search_client
+    backend.openai_client = AsyncAzureOpenAI(
+        azure_endpoint=f"http://127.0.0.1:{llm_port}", api_key="fake", api_version="2024-02-01"
+    )
+    # Repeated prompts would otherwise be answered from the cache instead of the fake LLM
+    backend.ANSWER_CACHE_ENABLED = answer_cache
+    api_server = serve_in_thread(backend.app, api_port)
+
+    return LocalStack(f"http://127.0.0.1:{api_port}", llm_app, search_client, [api_server] + servers, search_app, corpus)
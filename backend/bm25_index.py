@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import re
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from chunker import CHUNKS_PATH, INDEX_DIR, load_chunks
+from doc_store import DocStore, write_docs
+
+# In-process BM25 index over the chunks. Postings are stored as flat arrays in
+# term order (CSR layout) rather than dicts of lists, and each posting already
+# holds its length-normalised BM25 term weight, so a query is a few array
+# slices, one multiply per posting and a partial sort:
+#
+#   meta.json        counts, average length, k1/b
+#   terms.json       vocabulary; a term's position is its id
+#   offsets.npy      (terms + 1,) where each term's postings start
+#   postings.npy     (postings,) int32 row of each posting
+#   weights.npy      (postings,) float32 tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+#   max_weights.npy  (terms,) float32 largest weight in each term's postings
+#   docs.jsonl       the chunk documents (see doc_store)
+#
+# Everything except the vocabulary is memory-mapped on load. Queries use
+# MaxScore pruning: terms are scored rarest first, and once the terms left
+# cannot lift an unseen chunk into the top_k, the common terms only look up the
+# chunks already found instead of walking their whole postings.
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", os.path.join(INDEX_DIR, "bm25"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Words too common to help ranking; skipping them keeps the longest postings out of every query
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its of on or so such that the their "
+    "then there these they this to was were will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def index_text(chunk):
+    return f"{chunk.get('title', '')}\n{chunk.get('content', '')}"
+
+
+def build_index(docs, path=BM25_INDEX_DIR, k1=BM25_K1, b=BM25_B):
+    """Write a BM25 index for `docs` (chunk dicts) to `path`; returns its meta."""
+    start = time.perf_counter()
+    term_ids = {}
+    posting_terms = array("i")
+    posting_rows = array("i")
+    posting_tfs = array("f")
+    lengths = np.zeros(len(docs), dtype=np.float32)
+
+    for row, doc in enumerate(docs):
+        tokens = tokenize(index_text(doc))
+        lengths[row] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            posting_terms.append(term_ids.setdefault(term, len(term_ids)))
+            posting_rows.append(row)
+            posting_tfs.append(tf)
+
+    terms = np.frombuffer(posting_terms, dtype=np.int32)
+    rows = np.frombuffer(posting_rows, dtype=np.int32)
+    tfs = np.frombuffer(posting_tfs, dtype=np.float32)
+    average_length = float(lengths.mean()) if len(docs) else 0.0
+
+    # Group postings by term (rows stay ascending within a term)
+    order = np.argsort(terms, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(term_ids)))]).astype(np.int64)
+    norm = k1 * (1 - b + b * lengths[rows] / max(average_length, 1e-9))
+    weights = (tfs * (k1 + 1) / (tfs + norm))[order].astype(np.float32)
+    # Every term has at least one posting, so no reduceat segment is empty
+    max_weights = np.maximum.reduceat(weights, offsets[:-1]) if len(term_ids) else np.zeros(0, dtype=np.float32)
+
+    os.makedirs(path, exist_ok=True)
+    arrays = (("offsets", offsets), ("postings", rows[order]), ("weights", weights), ("max_weights", max_weights))
+    for name, values in arrays:
+        np.save(os.path.join(path, f"{name}.tmp.npy"), values)
+        os.replace(os.path.join(path, f"{name}.tmp.npy"), os.path.join(path, f"{name}.npy"))
+    with open(os.path.join(path, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(term_ids, key=term_ids.get), f, ensure_ascii=False)
+    write_docs(path, docs)
+
+    meta = {
+        "chunks": len(docs),
+        "terms": len(term_ids),
+        "postings": len(rows),
+        "average_length": round(average_length, 2),
+        "k1": k1,
+        "b": b,
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class BM25Index:
+    """Read-only view of an index written by build_index()."""
+
+    def __init__(self, path=BM25_INDEX_DIR):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            self.term_ids = {term: term_id for term_id, term in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+        self.max_weights = np.load(os.path.join(path, "max_weights.npy"))
+        self.docs = DocStore(path)
+
+    def __len__(self):
+        return self.meta["chunks"]
+
+    def idf(self, document_frequency):
+        count = len(self)
+        return np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search_rows(self, query, top_k, mask=None):
+        """(rows, scores) of the top_k chunks for the query text, best first.
+
+        `mask` (a boolean per row, from DocStore.mask) limits the search to the rows it allows.
+        """
+        terms = []
+        for term_id in {self.term_ids[token] for token in tokenize(query) if token in self.term_ids}:
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            idf = np.float32(self.idf(end - start))
+            terms.append((start, end, idf, float(self.max_weights[term_id] * idf)))
+        if not terms or top_k <= 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+        # Rarest terms first: they have the shortest postings and the highest score bounds
+        terms.sort(key=lambda term: term[1] - term[0])
+        # Highest score a chunk can still gain from terms[i:]
+        remaining = np.cumsum([term[3] for term in terms][::-1])[::-1]
+
+        rows = np.zeros(0, dtype=np.int32)
+        scores = np.zeros(0, dtype=np.float32)
+        dense = None
+        # Lowest score among the best top_k so far (None while fewer chunks match)
+        threshold = None
+        for i, (start, end, idf, _) in enumerate(terms):
+            # Once no unseen chunk can reach the threshold, only the candidates need the remaining terms.
+            # That is only cheaper than walking the postings while the candidates are comparatively few.
+            if dense is None and threshold is not None and remaining[i] < threshold and len(rows) * 16 <= end - start:
+                scores = self._finish_candidates(terms[i:], rows, scores)
+                break
+
+            postings = self.postings[start:end]
+            weights = self.weights[start:end] * idf
+            if mask is not None:
+                # Filtered-out rows never get a score (idf stays corpus-wide)
+                keep = mask[postings]
+                postings, weights = postings[keep], weights[keep]
+            if dense is None and len(rows) + len(postings) > len(self) // 8:
+                # Long postings: switch to one score slot per chunk instead of merging row lists
+                dense = np.zeros(len(self), dtype=np.float32)
+                dense[rows] = scores
+            if dense is not None:
+                # A row appears at most once per term, so fancy-index += is safe. No pruning from
+                # here on (the candidates are already many), so there is no threshold to track.
+                dense[postings] += weights
+            else:
+                if len(rows):
+                    rows, inverse = np.unique(np.concatenate([rows, postings]), return_inverse=True)
+                    scores = np.bincount(inverse, weights=np.concatenate([scores, weights]), minlength=len(rows)).astype(np.float32)
+                else:
+                    rows, scores = np.asarray(postings), weights
+                threshold = self._threshold(scores, top_k)
+
+        if dense is not None:
+            rows = np.argpartition(-dense, top_k)[:top_k] if len(dense) > top_k else np.arange(len(dense))
+            rows = rows[dense[rows] > 0]
+            scores = dense[rows]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    @staticmethod
+    def _threshold(scores, top_k):
+        if len(scores) < top_k:
+            return None
+        return float(np.partition(scores, len(scores) - top_k)[len(scores) - top_k])
+
+    def _finish_candidates(self, terms, rows, scores):
+        # Add the contributions of `terms` to the candidate rows only, by binary search in each postings list
+        scores = scores.copy()
+        for start, end, idf, _ in terms:
+            postings = self.postings[start:end]
+            positions = np.minimum(np.searchsorted(postings, rows), len(postings) - 1)
+            hit = postings[positions] == rows
+            scores[hit] += self.weights[start:end][positions[hit]] * idf
+        return scores
+
+    def search(self, query, top_k, filters=None):
+        rows, scores = self.search_rows(query, top_k, self.docs.mask(filters))
+        return [dict(self.docs[row], score=float(score)) for row, score in zip(rows, scores)]
+
+    def close(self):
+        self.docs.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local BM25 index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index the chunks written by chunker.py")
+    build.add_argument("--chunks", default=CHUNKS_PATH)
+    build.add_argument("--output", default=BM25_INDEX_DIR)
+
+    search = commands.add_parser("search", help="print the best chunks for a query")
+    search.add_argument("query")
+    search.add_argument("--index", default=BM25_INDEX_DIR)
+    search.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(json.dumps(build_index(load_chunks(args.chunks), args.output)))
+        return
+
+    index = BM25Index(args.index)
+    for hit in index.search(args.query, args.top_k):
+        print(f"{hit['score']:.3f}  {hit['chunk_id']}  {hit['title']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import glob
+import hashlib
+import html
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from context_packer import count_tokens, split_tokens
+from filters import FILTER_FIELDS, record_filter_fields
+
+# Turns the exported Ivanti records (Data_Ivanti/<entity>_batches) into the
+# chunk_id/title/content documents the search index serves. Each entity has a
+# text template; long texts are split by tokens with some overlap. Chunk IDs
+# are <RecId>_<chunk index>, so an unchanged record always produces the same
+# chunks and only changed ones have to be embedded and uploaded again.
+
+DATA_DIR = os.getenv("IVANTI_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "Data_Ivanti"))
+INDEX_DIR = os.getenv("INDEX_DIR", "index_data")
+CHUNKS_PATH = os.path.join(INDEX_DIR, "chunks.jsonl")
+
+# Chunk size and how much of the previous chunk each one repeats
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))
+
+# Fields uploaded to the Azure Search index; the filter fields must be filterable
+# there (created as Edm.DateTimeOffset, the others Edm.String)
+UPLOAD_FIELDS = ["chunk_id", "title", "content"] + FILTER_FIELDS
+UPLOAD_BATCH_SIZE = 1000
+
+# How each entity is turned into text: a title from a label, number and name,
+# then labelled sections. Each section uses the first field that has a value
+# (the *_Text fields come from the export's heavy-field offloading).
+KNOWLEDGE_TEMPLATE = {
+    "label": "Knowledge",
+    "number": "KnowledgeNumber",
+    "name": "Title",
+    "sections": [("Title", ["Title"]), ("Keywords", ["Keywords"]), ("Details", ["Details_Text", "Details"])],
+}
+
+TEMPLATES = {
+    "incidents": {
+        "label": "Incident",
+        "number": "IncidentNumber",
+        "name": "Subject",
+        "sections": [
+            ("Subject", ["Subject"]),
+            ("Symptom", ["Symptom", "HTML_Description_Text", "HTML_Description"]),
+            ("Resolution", ["Resolution"]),
+        ],
+    },
+    "service_requests": {
+        "label": "Service request",
+        "number": "ServiceReqNumber",
+        "name": "Subject",
+        "sections": [
+            ("Subject", ["Subject"]),
+            ("Symptom", ["Symptom", "HTML_Description_Text", "HTML_Description"]),
+            ("Resolution", ["Resolution"]),
+        ],
+    },
+    "problems": {
+        "label": "Problem",
+        "number": "ProblemNumber",
+        "name": "Subject",
+        "sections": [("Subject", ["Subject"]), ("Description", ["Description"])],
+    },
+    "knowledges": KNOWLEDGE_TEMPLATE,
+    "documents": dict(KNOWLEDGE_TEMPLATE, label="Document"),
+    "references": dict(KNOWLEDGE_TEMPLATE, label="Reference"),
+    "error_messages": dict(
+        KNOWLEDGE_TEMPLATE,
+        label="Error message",
+        sections=KNOWLEDGE_TEMPLATE["sections"] + [("Resolution", ["Resolution"])],
+    ),
+    "workarounds": {
+        "label": "Workaround",
+        "number": None,
+        "name": "Environment",
+        "sections": [("Environment", ["Environment"]), ("Workaround", ["Description"])],
+    },
+}
+
+# FRS_Knowledges and its subtypes share RecIds, so they are always chunked together
+KNOWLEDGE_FAMILY = ("knowledges", "documents", "references", "error_messages")
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+BLOCK_TAG_PATTERN = re.compile(r"<\s*(br|/p|/div|/li|/tr|/h\d)\b[^>]*>", re.I)
+HIDDEN_PATTERN = re.compile(r"<(head|style|script)\b.*?</\1\s*>", re.I | re.S)
+
+
+def html_to_text(value):
+    # Records exported before heavy-field offloading still carry raw HTML
+    value = HIDDEN_PATTERN.sub(" ", value)
+    value = BLOCK_TAG_PATTERN.sub("\n", value)
+    value = html.unescape(TAG_PATTERN.sub(" ", value)).replace("\xa0", " ")
+    lines = (" ".join(line.split()) for line in value.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _field_text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).replace("\r\n", "\n").strip()
+    if text.startswith("<") and ">" in text:
+        text = html_to_text(text)
+    return text
+
+
+def _first_value(record, fields):
+    for field in fields:
+        if record.get(field) not in (None, ""):
+            text = _field_text(record[field])
+            if text:
+                return text
+    return ""
+
+
+def record_title(entity, record):
+    template = TEMPLATES[entity]
+    number = _field_text(record[template["number"]]) if template["number"] and record.get(template["number"]) else ""
+    name = _field_text(record.get(template["name"]) or "")
+    prefix = f"{template['label']} {number}".strip()
+    return f"{prefix}: {name}" if name else prefix
+
+
+def record_text(entity, record):
+    sections = []
+    seen = set()
+    for label, fields in TEMPLATES[entity]["sections"]:
+        text = _first_value(record, fields)
+        # Ivanti often repeats the subject as the symptom; don't say it twice
+        if text and text not in seen:
+            seen.add(text)
+            sections.append(f"{label}: {text}")
+    return "\n\n".join(sections)
+
+
+def content_hash(title, content, fields=None):
+    # The filter fields count too, so a record that only changed status is uploaded again
+    extra = json.dumps(fields, sort_keys=True) if fields else ""
+    return hashlib.sha1(f"{title}\n{content}\n{extra}".encode("utf-8")).hexdigest()
+
+
+def chunk_record(entity, record, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Split one record into chunk documents; returns [] for records without text."""
+    rec_id = record.get("RecId")
+    text = record_text(entity, record)
+    if not rec_id or not text:
+        return []
+
+    title = record_title(entity, record)
+    fields = record_filter_fields(entity, record)
+    chunks = []
+    for index, content in enumerate(split_tokens(text, max_tokens, overlap_tokens)):
+        chunks.append({
+            "chunk_id": f"{rec_id}_{index}",
+            "title": title,
+            "content": content,
+            **fields,
+            "rec_id": rec_id,
+            "chunk_index": index,
+            "tokens": count_tokens(content),
+            "content_hash": content_hash(title, content, fields),
+            "last_modified": record.get("LastModDateTime"),
+        })
+    return chunks
+
+
+def load_records(entity, data_dir=DATA_DIR):
+    def batch_number(path):
+        return int(re.search(r"_(\d+)\.json$", path).group(1))
+
+    for path in sorted(glob.glob(os.path.join(data_dir, f"{entity}_batches", "*.json")), key=batch_number):
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def chunk_entities(entities=None, data_dir=DATA_DIR, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    # FRS_Knowledges also returns every document, reference and error message
+    # (same RecId), so the subtypes go first and a RecId is only chunked once
+    entities = sorted(entities or TEMPLATES, key=lambda entity: (entity == "knowledges", entity))
+    seen = set()
+    for entity in entities:
+        for record in load_records(entity, data_dir):
+            if record.get("RecId") in seen:
+                continue
+            seen.add(record.get("RecId"))
+            yield from chunk_record(entity, record, max_tokens, overlap_tokens)
+
+
+def load_chunks(path=CHUNKS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_chunks(chunks, path=CHUNKS_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def diff_chunks(old_chunks, new_chunks):
+    """Returns (new or changed chunks, IDs of chunks that no longer exist)."""
+    old_hashes = {chunk["chunk_id"]: chunk["content_hash"] for chunk in old_chunks}
+    new_ids = {chunk["chunk_id"] for chunk in new_chunks}
+    changed = [chunk for chunk in new_chunks if old_hashes.get(chunk["chunk_id"]) != chunk["content_hash"]]
+    deleted = [chunk_id for chunk_id in old_hashes if chunk_id not in new_ids]
+    return changed, deleted
+
+
+def upload_chunks(search_client, changed, deleted):
+    # Only what changed goes to the index; removed chunks are deleted by key
+    for start in range(0, len(changed), UPLOAD_BATCH_SIZE):
+        batch = [{field: chunk[field] for field in UPLOAD_FIELDS} for chunk in changed[start:start + UPLOAD_BATCH_SIZE]]
+        search_client.merge_or_upload_documents(documents=batch)
+    for start in range(0, len(deleted), UPLOAD_BATCH_SIZE):
+        batch = [{"chunk_id": chunk_id} for chunk_id in deleted[start:start + UPLOAD_BATCH_SIZE]]
+        search_client.delete_documents(documents=batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk the exported Ivanti records for the search index")
+    parser.add_argument("entities", nargs="*", help=f"entities to chunk (default: all): {', '.join(sorted(TEMPLATES))}")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", default=CHUNKS_PATH)
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--upload", action="store_true", help="upload new/changed chunks and delete removed ones")
+    args = parser.parse_args()
+
+    unknown = [entity for entity in args.entities if entity not in TEMPLATES]
+    if unknown:
+        parser.error(f"unknown entities: {', '.join(unknown)}")
+
+    # Re-chunking only part of the knowledge family would keep the rest's chunks next to the
+    # same RecIds chunked again, so asking for one member re-chunks them all
+    if set(args.entities) & set(KNOWLEDGE_FAMILY):
+        args.entities = list(dict.fromkeys(args.entities + list(KNOWLEDGE_FAMILY)))
+
+    old_chunks = load_chunks(args.output)
+    new_chunks = list(chunk_entities(args.entities, args.data_dir, args.max_tokens, args.overlap))
+    # Chunks of entities that weren't re-chunked this time are kept as they are
+    kept = [chunk for chunk in old_chunks if args.entities and chunk["entity"] not in args.entities]
+    old_chunks = [chunk for chunk in old_chunks if not args.entities or chunk["entity"] in args.entities]
+    changed, deleted = diff_chunks(old_chunks, new_chunks)
+    write_chunks(kept + new_chunks, args.output)
+
+    print(json.dumps({
+        "chunks": len(new_chunks),
+        "records": len({chunk["rec_id"] for chunk in new_chunks}),
+        "changed": len(changed),
+        "deleted": len(deleted),
+        "unchanged": len(new_chunks) - len(changed),
+        "output": args.output,
+    }))
+
+    if args.upload:
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchClient
+
+        search_client = SearchClient(
+            endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+            index_name=os.getenv("AZURE_SEARCH_INDEX_NAME"),
+            credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_KEY")),
+        )
+        upload_chunks(search_client, changed, deleted)
+        search_client.close()
+        print(f"Uploaded {len(changed)} chunks, deleted {len(deleted)}")
+
+
+if __name__ == "__main__":
+    main()
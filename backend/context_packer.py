@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+
+# Token budget for the knowledge chunks sent with each prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Largest share of the budget a single chunk may take
+CONTEXT_CHUNK_MAX_TOKENS = int(os.getenv("CONTEXT_CHUNK_MAX_TOKENS", "600"))
+# Chunks whose word shingles overlap this much with an earlier chunk are dropped
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.85"))
+# Don't bother adding a cut-down chunk smaller than this
+MIN_PARTIAL_TOKENS = 50
+# For sizing dropped chunks without tokenizing them (about 4 characters per BPE token in English)
+CHARS_PER_TOKEN = 4
+
+WORD_PATTERN = re.compile(r"\w+")
+# Rough stand-in for BPE tokens: long words are split every 4 characters, punctuation counts alone
+APPROX_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding(os.getenv("TOKEN_ENCODING", "cl100k_base"))
+except Exception:
+    # tiktoken missing or its encoding file can't be downloaded: use the approximation
+    _encoding = None
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(APPROX_TOKEN_PATTERN.findall(text))
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text, max_tokens):
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens])
+
+    matches = list(APPROX_TOKEN_PATTERN.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    return text[:matches[max_tokens - 1].end()]
+
+
+def split_tokens(text, max_tokens, overlap_tokens=0):
+    """Cut text into windows of at most max_tokens, each repeating the last overlap_tokens of the previous one."""
+    step = max(1, max_tokens - overlap_tokens)
+
+    if _encoding is not None:
+        tokens = _encoding.encode(text)
+        starts = range(0, max(1, len(tokens) - overlap_tokens), step)
+        return [_encoding.decode(tokens[start:start + max_tokens]) for start in starts]
+
+    matches = list(APPROX_TOKEN_PATTERN.finditer(text))
+    if len(matches) <= max_tokens:
+        return [text]
+    windows = []
+    for start in range(0, max(1, len(matches) - overlap_tokens), step):
+        window = matches[start:start + max_tokens]
+        windows.append(text[window[0].start():window[-1].end()])
+    return windows
+
+
+def _shingles(text, size=5):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class PackedContext:
+    text: str = ""
+    chunks: list = field(default_factory=list)
+    used_tokens: int = 0
+    dropped_tokens: int = 0
+    dropped_chunks: int = 0
+    duplicate_chunks: int = 0
+
+    def report(self):
+        return {
+            "chunks": len(self.chunks),
+            "used_tokens": self.used_tokens,
+            "dropped_tokens": self.dropped_tokens,
+            "dropped_chunks": self.dropped_chunks,
+            "duplicate_chunks": self.duplicate_chunks,
+        }
+
+
+def format_chunk(index, chunk):
+    title = chunk.get("title") or f"Document {index}"
+    return f"[{index}] {title}\n{chunk.get('content', '').strip()}"
+
+
+def pack_context(chunks, budget=None, chunk_max_tokens=None, duplicate_threshold=None):
+    """Fit the retrieved chunks into one block of text under a token budget.
+
+    Chunks are taken best score first. Exact and near-duplicate chunks are
+    skipped, a chunk longer than chunk_max_tokens is cut down, and once the
+    budget is spent the remaining chunks are dropped and counted. Dropped
+    chunks aren't tokenized (in "full" mode that would be the whole corpus on
+    every request), so dropped_tokens is an estimate from their length.
+    """
+    budget = budget if budget is not None else CONTEXT_TOKEN_BUDGET
+    chunk_max_tokens = chunk_max_tokens if chunk_max_tokens is not None else CONTEXT_CHUNK_MAX_TOKENS
+    duplicate_threshold = duplicate_threshold if duplicate_threshold is not None else CONTEXT_DUPLICATE_THRESHOLD
+
+    packed = PackedContext()
+    parts = []
+    seen_hashes = set()
+    seen_shingles = []
+
+    for chunk in sorted(chunks, key=lambda c: c.get("score", 0.0), reverse=True):
+        # Budget is spent: everything left is dropped (checked first, so these chunks aren't even copied)
+        if budget - packed.used_tokens < MIN_PARTIAL_TOKENS:
+            if chunk.get("content"):
+                packed.dropped_chunks += 1
+                packed.dropped_tokens += estimate_tokens(chunk["content"])
+            continue
+
+        content = chunk.get("content", "").strip()
+        if not content:
+            continue
+
+        text = format_chunk(len(parts) + 1, chunk)
+        tokens = count_tokens(text)
+        allowed = min(chunk_max_tokens, budget - packed.used_tokens)
+
+        # Too little room left for this chunk
+        if tokens > allowed and allowed < MIN_PARTIAL_TOKENS:
+            packed.dropped_chunks += 1
+            packed.dropped_tokens += tokens
+            continue
+
+        # Skip exact and near-identical copies of a chunk we already kept
+        digest = hashlib.sha1(" ".join(content.lower().split()).encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            packed.duplicate_chunks += 1
+            continue
+        shingles = _shingles(content)
+        if any(_similarity(shingles, s) >= duplicate_threshold for s in seen_shingles):
+            packed.duplicate_chunks += 1
+            continue
+
+        # Cut a long chunk down to what is still allowed
+        if tokens > allowed:
+            packed.dropped_tokens += tokens - allowed
+            text = truncate_tokens(text, allowed)
+            tokens = count_tokens(text)
+
+        seen_hashes.add(digest)
+        seen_shingles.append(shingles)
+        parts.append(text)
+        packed.chunks.append(chunk)
+        packed.used_tokens += tokens
+
+    packed.text = "\n\n".join(parts)
+    return packed
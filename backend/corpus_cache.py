@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+# How long a corpus snapshot is served before a background refresh (seconds)
+CORPUS_CACHE_TTL = float(os.getenv("CORPUS_CACHE_TTL", "900"))
+
+logger = logging.getLogger("backend.corpus_cache")
+
+
+@dataclass(frozen=True)
+class CorpusSnapshot:
+    docs: tuple = ()
+    loaded_at: float = 0.0
+    version: int = 0
+    load_ms: float = 0.0
+
+
+class CorpusCache:
+    """Warm in-memory copy of the chunk corpus.
+
+    `loader` is an async function with no arguments returning the documents.
+    Readers call `snapshot()` and always get a complete snapshot straight
+    away; a refresh builds a new snapshot on the side and swaps the reference
+    in one assignment, so requests never wait on it.
+    """
+
+    def __init__(self, loader, ttl_seconds=CORPUS_CACHE_TTL):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._snapshot = CorpusSnapshot()
+        self._refreshing = False
+        self._task = None
+        self._background = None
+
+    def snapshot(self):
+        return self._snapshot
+
+    def is_stale(self):
+        return time.time() - self._snapshot.loaded_at >= self.ttl_seconds
+
+    async def refresh(self):
+        # Only one refresh at a time; a second caller just keeps the current snapshot
+        if self._refreshing:
+            return False
+
+        self._refreshing = True
+        try:
+            start = time.perf_counter()
+            docs = tuple(await self.loader())
+            load_ms = (time.perf_counter() - start) * 1000
+
+            self._snapshot = CorpusSnapshot(
+                docs=docs,
+                loaded_at=time.time(),
+                version=self._snapshot.version + 1,
+                load_ms=load_ms,
+            )
+            logger.info(f"✅ Corpus snapshot v{self._snapshot.version}: {len(docs)} documents in {load_ms:.0f}ms")
+            return True
+        except Exception:
+            # Keep serving the previous snapshot if the index cannot be read
+            logger.exception("Corpus refresh failed, keeping the previous snapshot")
+            return False
+        finally:
+            self._refreshing = False
+
+    def refresh_in_background(self):
+        # Fire-and-forget refresh used by the admin endpoint (the task is kept so it is not garbage collected)
+        self._background = asyncio.get_running_loop().create_task(self.refresh())
+        return self._background
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl_seconds)
+            await self.refresh()
+
+    async def start(self):
+        # Load once at startup, then keep the snapshot fresh on the TTL
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "documents": len(snapshot.docs),
+            "age_seconds": round(time.time() - snapshot.loaded_at, 1) if snapshot.loaded_at else None,
+            "load_ms": round(snapshot.load_ms, 1),
+            "ttl_seconds": self.ttl_seconds,
+        }
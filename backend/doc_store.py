@@ -0,0 +1,124 @@
+import json
+import mmap
+import os
+
+import numpy as np
+
+from filters import DATE_FIELD, FILTER_FIELDS, KEYWORD_FIELDS
+
+# Chunk documents for the local indexes, stored next to them as
+#
+#   docs.jsonl          one chunk document per line, in index row order
+#   doc_offsets.npy     (chunks + 1,) byte offset of each line in docs.jsonl
+#   filter_values.json  the distinct values of each keyword filter field
+#   filter_<field>.npy  (chunks,) int32 position of each row's value in that list, -1 if none
+#   filter_created.npy  (chunks,) datetime64[s] creation time in UTC, NaT if unknown
+#
+# The documents are memory-mapped, so only the ones a query returns are parsed.
+# Filters become a boolean mask over the rows that the indexes apply while
+# scoring; the bitmap of each (field, value) is built once and kept packed.
+
+# Fields kept for each chunk and returned with each hit
+DOC_FIELDS = ["chunk_id", "title", "content", "rec_id", "content_hash"] + FILTER_FIELDS
+
+
+def _save(path, name, values):
+    np.save(os.path.join(path, f"{name}.tmp.npy"), values)
+    os.replace(os.path.join(path, f"{name}.tmp.npy"), os.path.join(path, f"{name}.npy"))
+
+
+def write_docs(path, docs, order=None):
+    """Write `docs` (in `order`, a sequence of positions, if given) to the directory `path`."""
+    docs = [docs[row] for row in order] if order is not None else docs
+    offsets = [0]
+    with open(os.path.join(path, "docs.jsonl.tmp"), "wb") as f:
+        for doc in docs:
+            line = json.dumps({field: doc.get(field) for field in DOC_FIELDS}, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    os.replace(os.path.join(path, "docs.jsonl.tmp"), os.path.join(path, "docs.jsonl"))
+    _save(path, "doc_offsets", np.array(offsets, dtype=np.int64))
+    write_filter_columns(path, docs)
+
+
+def write_filter_columns(path, docs):
+    values = {}
+    for field in KEYWORD_FIELDS:
+        positions = {}
+        codes = np.array([
+            positions.setdefault(doc[field], len(positions)) if doc.get(field) is not None else -1 for doc in docs
+        ], dtype=np.int32)
+        _save(path, f"filter_{field}", codes)
+        values[field] = list(positions)
+    # numpy datetimes are naive; the stored timestamps are all UTC
+    created = np.array([doc.get(DATE_FIELD) and doc[DATE_FIELD].rstrip("Z") or "NaT" for doc in docs], dtype="datetime64[s]")
+    _save(path, f"filter_{DATE_FIELD}", created)
+    with open(os.path.join(path, "filter_values.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(values, f, ensure_ascii=False)
+    os.replace(os.path.join(path, "filter_values.json.tmp"), os.path.join(path, "filter_values.json"))
+
+
+class DocStore:
+    def __init__(self, path):
+        self.offsets = np.load(os.path.join(path, "doc_offsets.npy"), mmap_mode="r")
+        self._file = open(os.path.join(path, "docs.jsonl"), "rb")
+        # mmap can't map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else b""
+
+        # Indexes built before filtering existed have no filter columns
+        self.filter_values = None
+        if os.path.exists(os.path.join(path, "filter_values.json")):
+            with open(os.path.join(path, "filter_values.json"), encoding="utf-8") as f:
+                self.filter_values = {field: {value: code for code, value in enumerate(values)}
+                                      for field, values in json.load(f).items()}
+            self.filter_codes = {field: np.load(os.path.join(path, f"filter_{field}.npy"), mmap_mode="r")
+                                 for field in self.filter_values}
+            self.created = np.load(os.path.join(path, f"filter_{DATE_FIELD}.npy"), mmap_mode="r")
+        self._bitmaps = {}
+        self._no_rows = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._data[start:end])
+
+    def _bitmap(self, field, value):
+        # Packed bits: 1/8 byte per row per indexed (field, value) asked for so far
+        code = self.filter_values[field].get(value)
+        if code is None:
+            # Values come from clients; only the ones in the index are cached, so the cache stays bounded
+            if self._no_rows is None:
+                self._no_rows = np.packbits(np.zeros(len(self), dtype=bool))
+            return self._no_rows
+        key = (field, value)
+        if key not in self._bitmaps:
+            self._bitmaps[key] = np.packbits(self.filter_codes[field] == code)
+        return self._bitmaps[key]
+
+    def mask(self, filters):
+        """Boolean array of the rows matching `filters`, or None when nothing is filtered."""
+        if filters is None or filters.is_empty():
+            return None
+        if self.filter_values is None:
+            raise ValueError("This index was built without filter columns; rebuild it to use filters")
+
+        packed = None
+        for field, values in filters.keyword_conditions():
+            # Any of the field's values, and every field
+            field_bits = np.bitwise_or.reduce([self._bitmap(field, value) for value in values])
+            packed = field_bits if packed is None else packed & field_bits
+        mask = np.unpackbits(packed, count=len(self)).view(bool) if packed is not None else np.ones(len(self), dtype=bool)
+
+        start, end = filters.date_range()
+        if start:
+            mask &= self.created >= np.datetime64(start.rstrip("Z"))
+        if end:
+            mask &= self.created < np.datetime64(end.rstrip("Z"))
+        return mask
+
+    def close(self):
+        if len(self):
+            self._data.close()
+        self._file.close()
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from chunker import CHUNKS_PATH, INDEX_DIR, load_chunks
+
+# Embedding stage for the chunks: inputs are sent in batches, a few batches at
+# a time, and every vector is cached on disk under a hash of the model name and
+# the exact text. Re-running after a refresh only embeds new or changed chunks.
+
+EMBEDDING_DEPLOYMENT = os.getenv("OPENAI_EMBEDDING_DEPLOYMENT")
+# Inputs per request (Azure OpenAI accepts up to 2048) and requests in flight
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(INDEX_DIR, "embeddings.db"))
+
+FAKE_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def embedding_key(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def embedding_text(chunk):
+    # What gets embedded for a chunk: its title and content
+    return f"{chunk.get('title', '')}\n{chunk.get('content', '')}".strip()
+
+
+class EmbeddingCache:
+    """SQLite table of float32 vectors keyed by embedding_key()."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+            )
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        with self.lock:
+            # SQLite limits the number of parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(key, model, array("f", vector).tobytes()) for key, vector in items]
+            )
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class OpenAIEmbedder:
+    def __init__(self, openai_client, deployment=EMBEDDING_DEPLOYMENT):
+        self.openai_client = openai_client
+        self.model = deployment
+
+    async def __call__(self, texts):
+        response = await self.openai_client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for the embedding deployment.
+
+    Words are hashed into `dimensions` buckets (with a hashed sign) and the
+    result is normalised, so texts that share words get similar vectors. Each
+    call sleeps `latency` seconds to imitate one API round trip.
+    """
+
+    def __init__(self, dimensions=256, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.model = f"fake-{dimensions}"
+        self.calls = 0
+        self.inputs = 0
+
+    def embed(self, text):
+        vector = [0.0] * self.dimensions
+        for word in FAKE_TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    async def __call__(self, texts):
+        self.calls += 1
+        self.inputs += len(texts)
+        await asyncio.sleep(self.latency)
+        return [self.embed(text) for text in texts]
+
+
+async def embed_texts(texts, embedder, cache=None, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY):
+    """Return (vectors in input order, stats); only texts missing from the cache hit the API."""
+    keys = [embedding_key(embedder.model, text) for text in texts]
+    vectors = cache.get_many(set(keys)) if cache is not None else {}
+
+    # Each distinct missing text is embedded once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    missing_keys = set(missing)
+    missing = list(missing.items())
+    batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch):
+        async with semaphore:
+            embedded = await embedder([text for _, text in batch])
+        items = [(key, vector) for (key, _), vector in zip(batch, embedded)]
+        if cache is not None:
+            cache.put_many(embedder.model, items)
+        vectors.update(items)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(batch) for batch in batches))
+    stats = {
+        "texts": len(texts),
+        "cached": sum(1 for key in keys if key not in missing_keys),
+        "embedded": len(missing),
+        "requests": len(batches),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return [vectors[key] for key in keys], stats
+
+
+async def embed_chunks(chunks, embedder, cache=None, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY):
+    """Return ({chunk_id: vector}, stats) for the chunks."""
+    vectors, stats = await embed_texts([embedding_text(chunk) for chunk in chunks], embedder, cache, batch_size, concurrency)
+    return {chunk["chunk_id"]: vector for chunk, vector in zip(chunks, vectors)}, stats
+
+
+def create_embedder(fake=False):
+    if fake:
+        return FakeEmbedder()
+
+    import httpx
+    from openai import AsyncAzureOpenAI
+
+    client = AsyncAzureOpenAI(
+        azure_endpoint=os.getenv("OPENAI_API_BASE"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        api_version=os.getenv("OPENAI_API_VERSION"),
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=EMBEDDING_CONCURRENCY)),
+    )
+    return OpenAIEmbedder(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the chunks, reusing cached vectors for unchanged text")
+    parser.add_argument("--chunks", default=CHUNKS_PATH)
+    parser.add_argument("--cache", default=EMBEDDING_CACHE_PATH)
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=EMBEDDING_CONCURRENCY)
+    parser.add_argument("--fake", action="store_true", help="use the deterministic local embedder")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.chunks)
+    cache = EmbeddingCache(args.cache)
+    embedder = create_embedder(args.fake)
+    _, stats = asyncio.run(embed_chunks(chunks, embedder, cache, args.batch_size, args.concurrency))
+    stats["model"] = embedder.model
+    stats["cache_entries"] = cache.count()
+    cache.close()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+from pydantic import BaseModel
+
+# Structured filters a prompt can be scoped with. Chunks carry these fields
+# (copied from their record by the chunker), and each retriever applies the
+# filters inside the index query: an OData $filter for Azure AI Search,
+# per-value bitmaps for the local indexes (see doc_store).
+
+# Filterable chunk fields with exact values, and the record field each comes from
+# ("entity" is set by the chunker itself)
+KEYWORD_FIELDS = {
+    "entity": None,
+    "service": "Service",
+    "category": "Category",
+    "status": "Status",
+    "priority": "Priority",
+}
+# The chunk's record creation time, as UTC "YYYY-MM-DDTHH:MM:SSZ" (compares as text too)
+DATE_FIELD = "created"
+DATE_SOURCE_FIELD = "CreatedDateTime"
+
+FILTER_FIELDS = list(KEYWORD_FIELDS) + [DATE_FIELD]
+
+
+def utc_timestamp(value):
+    # Ivanti timestamps carry an offset (2023-04-24T10:02:39+02:00)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def filter_value(value):
+    # Values are compared as trimmed strings (Priority is "3" in incidents, 3 elsewhere)
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() or None
+
+
+def record_filter_fields(entity, record):
+    """The filterable fields of a record, as stored on each of its chunks."""
+    fields = {field: filter_value(record.get(source)) for field, source in KEYWORD_FIELDS.items() if source}
+    fields["entity"] = entity
+    fields[DATE_FIELD] = utc_timestamp(record[DATE_SOURCE_FIELD]) if record.get(DATE_SOURCE_FIELD) else None
+    return fields
+
+
+def _odata_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+class RetrievalFilters(BaseModel):
+    """Each field takes one value or a list of accepted values; dates are inclusive (UTC)."""
+
+    entity: str | list[str] | None = None
+    service: str | list[str] | None = None
+    category: str | list[str] | None = None
+    status: str | list[str] | None = None
+    priority: str | list[str] | None = None
+    created_from: date | None = None
+    created_to: date | None = None
+
+    def values(self, field):
+        value = getattr(self, field)
+        if value is None:
+            return []
+        return [filter_value(v) for v in ([value] if isinstance(value, str) else value) if filter_value(v)]
+
+    def keyword_conditions(self):
+        """[(field, accepted values)] for the keyword fields that are set."""
+        return [(field, self.values(field)) for field in KEYWORD_FIELDS if self.values(field)]
+
+    def date_range(self):
+        """(first, end) UTC timestamps with an exclusive end; either may be None."""
+        start = utc_timestamp(datetime.combine(self.created_from, time())) if self.created_from else None
+        end = utc_timestamp(datetime.combine(self.created_to + timedelta(days=1), time())) if self.created_to else None
+        return start, end
+
+    def is_empty(self):
+        return not self.keyword_conditions() and self.date_range() == (None, None)
+
+    def odata(self):
+        """Azure AI Search $filter expression, or None when nothing is filtered."""
+        clauses = []
+        for field, values in self.keyword_conditions():
+            if len(values) == 1:
+                clauses.append(f"{field} eq {_odata_string(values[0])}")
+            else:
+                # search.in is faster than a chain of "or" comparisons
+                clauses.append(f"search.in({field}, {_odata_string('|'.join(values))}, '|')")
+        start, end = self.date_range()
+        if start:
+            clauses.append(f"{DATE_FIELD} ge {start}")
+        if end:
+            clauses.append(f"{DATE_FIELD} lt {end}")
+        return " and ".join(clauses) or None
+
+    def matches(self, chunk):
+        # For chunks that are already in memory (the cached corpus)
+        for field, values in self.keyword_conditions():
+            if filter_value(chunk.get(field)) not in values:
+                return False
+        start, end = self.date_range()
+        created = chunk.get(DATE_FIELD)
+        if (start or end) and not created:
+            return False
+        if not isinstance(created, str) and created is not None:
+            created = utc_timestamp(created)
+        return (not start or created >= start) and (not end or created < end)
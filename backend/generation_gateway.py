@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+from collections import deque
+
+import openai
+
+from context_packer import count_tokens
+from telemetry import registry
+
+# Every chat completion the API makes goes through one GenerationGateway:
+#
+#   coalescing   identical requests (same deployment, messages and settings)
+#                that are in flight at the same time share one upstream call
+#   admission    at most GENERATION_MAX_CONCURRENCY calls run at once, and the
+#                estimated tokens (prompt + max_tokens) started in the last
+#                minute stay under GENERATION_TOKENS_PER_MINUTE
+#   queueing     requests that can't start yet wait in FIFO order until
+#                GENERATION_QUEUE_TIMEOUT has passed, then fail with
+#                GenerationUnavailable (the endpoints answer 503)
+#   backoff      a 429 (or 503) pauses admission for its Retry-After, plus
+#                jitter, and the request goes back to the queue; without the
+#                header the pause doubles on each attempt
+#
+# Streams are not coalesced (each caller reads its own), but they take a slot
+# until they are closed. Embeddings don't go through the gateway.
+
+GENERATION_MAX_CONCURRENCY = int(os.getenv("GENERATION_MAX_CONCURRENCY", "32"))
+# 0 = no token budget; set it to the deployment's TPM quota
+GENERATION_TOKENS_PER_MINUTE = int(os.getenv("GENERATION_TOKENS_PER_MINUTE", "0"))
+# Seconds a request may wait for a slot (including backoff pauses) before it fails
+GENERATION_QUEUE_TIMEOUT = float(os.getenv("GENERATION_QUEUE_TIMEOUT", "30"))
+GENERATION_MAX_RETRIES = int(os.getenv("GENERATION_MAX_RETRIES", "4"))
+# First pause after a throttled call without Retry-After, doubled on every attempt
+GENERATION_BACKOFF_BASE = float(os.getenv("GENERATION_BACKOFF_BASE", "0.5"))
+# Up to this share of the pause is added at random, so queued requests don't retry in lockstep
+GENERATION_BACKOFF_JITTER = float(os.getenv("GENERATION_BACKOFF_JITTER", "0.25"))
+
+BUDGET_WINDOW_SECONDS = 60.0
+RETRYABLE_STATUS = (429, 503)
+
+logger = logging.getLogger("backend.generation")
+
+queue_wait_seconds = registry.histogram(
+    "rag_generation_queue_wait_seconds", "Time a chat completion waited for a gateway slot"
+)
+generation_calls = registry.counter(
+    "rag_generation_calls_total",
+    "Chat completions by result (ok, coalesced, throttled, queue_timeout, error)", ("result",)
+)
+
+
+class GenerationUnavailable(Exception):
+    """No slot opened up (or upstream kept throttling) before the request's deadline."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def request_key(args):
+    # Identical requests give identical keys; dict order doesn't matter
+    return hashlib.sha1(json.dumps(args, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def estimated_tokens(args):
+    return sum(count_tokens(message.get("content") or "") for message in args.get("messages", ())) + args.get("max_tokens", 0)
+
+
+def retry_after_seconds(error):
+    # Azure OpenAI sends retry-after-ms and/or retry-after (seconds) with a 429
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class GatewayStream:
+    """A streamed completion holding a gateway slot; the slot is released on close()."""
+
+    def __init__(self, gateway, stream):
+        self.gateway = gateway
+        self.stream = stream
+        self.closed = False
+
+    def __aiter__(self):
+        return self.stream.__aiter__()
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                await self.stream.close()
+            finally:
+                await self.gateway._release()
+
+
+class GenerationGateway:
+    def __init__(self, client, max_concurrency=GENERATION_MAX_CONCURRENCY, tokens_per_minute=GENERATION_TOKENS_PER_MINUTE,
+                 queue_timeout=GENERATION_QUEUE_TIMEOUT, max_retries=GENERATION_MAX_RETRIES,
+                 backoff_base=GENERATION_BACKOFF_BASE, backoff_jitter=GENERATION_BACKOFF_JITTER):
+        # The gateway does the retrying, so the SDK's own retries are turned off
+        self.client = client.with_options(max_retries=0)
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_jitter = backoff_jitter
+
+        self.condition = asyncio.Condition()
+        self.waiting = deque()
+        self.in_flight = 0
+        # (monotonic start time, estimated tokens) of the calls started in the last minute
+        self.budget = deque()
+        self.paused_until = 0.0
+        self.pending = {}
+        self.counters = {
+            "calls": 0, "coalesced": 0, "throttled": 0, "retries": 0, "queue_timeouts": 0, "errors": 0,
+        }
+
+    def _budget_used(self, now):
+        while self.budget and now - self.budget[0][0] >= BUDGET_WINDOW_SECONDS:
+            self.budget.popleft()
+        return sum(tokens for _, tokens in self.budget)
+
+    def _next_opening(self, now):
+        # Seconds until a pause ends or budget frees up on its own; None when only a release can help
+        waits = []
+        if self.paused_until > now:
+            waits.append(self.paused_until - now)
+        if self.tokens_per_minute and self.budget:
+            waits.append(self.budget[0][0] + BUDGET_WINDOW_SECONDS - now)
+        return max(0.01, min(waits)) if waits else None
+
+    def _has_capacity(self, tokens, now):
+        if now < self.paused_until or self.in_flight >= self.max_concurrency:
+            return False
+        if not self.tokens_per_minute:
+            return True
+        used = self._budget_used(now)
+        # A request bigger than the whole budget still runs, alone in its window
+        return used + tokens <= self.tokens_per_minute or not self.budget
+
+    async def _acquire(self, tokens, deadline):
+        loop = asyncio.get_running_loop()
+        ticket = object()
+        queued = loop.time()
+        async with self.condition:
+            self.waiting.append(ticket)
+            try:
+                while not (self.waiting[0] is ticket and self._has_capacity(tokens, loop.time())):
+                    remaining = deadline - loop.time()
+                    opening = self._next_opening(loop.time())
+                    if remaining <= 0:
+                        self.counters["queue_timeouts"] += 1
+                        generation_calls.inc(result="queue_timeout")
+                        raise GenerationUnavailable(
+                            f"No generation slot within {self.queue_timeout:.0f}s ({len(self.waiting)} queued)",
+                            retry_after=opening
+                        )
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), remaining if opening is None else min(remaining, opening))
+                    except asyncio.TimeoutError:
+                        pass
+                self.in_flight += 1
+                self.budget.append((loop.time(), tokens))
+            finally:
+                self.waiting.remove(ticket)
+                # The next request in line may be able to start now
+                self.condition.notify_all()
+        queue_wait_seconds.observe(loop.time() - queued)
+
+    async def _release(self):
+        self.in_flight -= 1
+        async with self.condition:
+            self.condition.notify_all()
+
+    def _pause(self, error, attempt):
+        retry_after = retry_after_seconds(error)
+        delay = retry_after if retry_after is not None else self.backoff_base * 2 ** attempt
+        delay *= 1 + random.uniform(0, self.backoff_jitter)
+        self.paused_until = max(self.paused_until, asyncio.get_running_loop().time() + delay)
+        self.counters["throttled"] += 1
+        generation_calls.inc(result="throttled")
+        logger.warning(f"⚠️ Generation throttled ({error.status_code}), pausing {delay:.2f}s (attempt {attempt + 1})")
+
+    async def _call(self, args, stream=False):
+        deadline = asyncio.get_running_loop().time() + self.queue_timeout
+        tokens = estimated_tokens(args)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(tokens, deadline)
+            try:
+                self.counters["calls"] += 1
+                result = await self.client.chat.completions.create(**args, stream=stream)
+            except openai.APIStatusError as e:
+                await self._release()
+                if e.status_code not in RETRYABLE_STATUS:
+                    self.counters["errors"] += 1
+                    generation_calls.inc(result="error")
+                    raise
+                self._pause(e, attempt)
+                if attempt == self.max_retries:
+                    raise GenerationUnavailable(
+                        f"Generation still throttled after {attempt + 1} attempts", retry_after_seconds(e)
+                    ) from e
+                self.counters["retries"] += 1
+                continue
+            except BaseException:
+                await self._release()
+                self.counters["errors"] += 1
+                generation_calls.inc(result="error")
+                raise
+
+            generation_calls.inc(result="ok")
+            if stream:
+                return GatewayStream(self, result)
+            await self._release()
+            return result
+
+    async def complete(self, **args):
+        """A chat completion; joins an identical call that is already in flight."""
+        key = request_key(args)
+        task = self.pending.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            generation_calls.inc(result="coalesced")
+        else:
+            task = asyncio.ensure_future(self._call(args))
+            self.pending[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded, so a caller that goes away doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        self.pending.pop(key, None)
+        # Every caller may have gone away; reading the exception keeps asyncio from logging it as lost
+        if not task.cancelled():
+            task.exception()
+
+    async def stream(self, **args):
+        """A streamed chat completion; close() the returned stream to give its slot back."""
+        return await self._call(args, stream=True)
+
+    def stats(self):
+        now = asyncio.get_running_loop().time()
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiting),
+            "coalescing": len(self.pending),
+            "max_concurrency": self.max_concurrency,
+            "tokens_per_minute": self.tokens_per_minute,
+            "budget_used": self._budget_used(now),
+            "paused_for_s": round(max(0.0, self.paused_until - now), 2),
+        }
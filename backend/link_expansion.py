@@ -0,0 +1,89 @@
+import json
+import os
+
+from chunker import CHUNKS_PATH, DATA_DIR, TEMPLATES, load_chunks
+from doc_store import DOC_FIELDS
+
+# Retrieval expansion over the RecId relationship graph the export writes
+# (Data_Ivanti/relationship_graph.py). For each retrieved chunk, the records
+# linked to its record (a problem's workarounds, a workaround's problem) are
+# looked up in the graph and their first chunk is added to the results, so
+# related fixes reach the prompt without a second search. Only links to
+# entities the chunker indexes are followed: sources and resolution actions
+# are bare lookup values (a problem's Source, ResolutionAction) with no chunks.
+
+RELATIONSHIP_GRAPH_PATH = os.getenv("RELATIONSHIP_GRAPH_PATH", os.path.join(DATA_DIR, "relationships.json"))
+LINK_EXPANSION_ENABLED = os.getenv("LINK_EXPANSION_ENABLED", "false").lower() == "true"
+# Linked chunks added per retrieved record and per request
+LINK_EXPANSION_PER_RECORD = int(os.getenv("LINK_EXPANSION_PER_RECORD", "2"))
+LINK_EXPANSION_MAX = int(os.getenv("LINK_EXPANSION_MAX", "4"))
+# A linked chunk scores this fraction of the chunk it was reached from, so it packs right after it
+LINK_EXPANSION_DECAY = float(os.getenv("LINK_EXPANSION_DECAY", "0.9"))
+
+
+def chunk_rec_id(chunk):
+    # Azure Search only returns chunk_id, which is <RecId>_<chunk index>
+    return chunk.get("rec_id") or chunk["chunk_id"].rsplit("_", 1)[0]
+
+
+class LinkExpander:
+    def __init__(self, graph, chunks, per_record=LINK_EXPANSION_PER_RECORD, limit=LINK_EXPANSION_MAX,
+                 decay=LINK_EXPANSION_DECAY):
+        nodes = graph.get("nodes", {})
+        self.links = {}
+        for rec_id, links in graph.get("links", {}).items():
+            chunked = [link for link in links if nodes.get(link[0]) in TEMPLATES]
+            if chunked:
+                self.links[rec_id] = chunked
+        self.graph_stats = graph.get("stats", {})
+        self.per_record = per_record
+        self.limit = limit
+        self.decay = decay
+        # A record is represented by its first chunk (title and opening text)
+        self.first_chunks = {}
+        for chunk in chunks:
+            if chunk.get("chunk_index", 0) == 0:
+                self.first_chunks[chunk_rec_id(chunk)] = {field: chunk.get(field) for field in DOC_FIELDS}
+        self.requests = 0
+        self.added = 0
+
+    @classmethod
+    def load(cls, graph_path=RELATIONSHIP_GRAPH_PATH, chunks_path=CHUNKS_PATH):
+        with open(graph_path, encoding="utf-8") as f:
+            graph = json.load(f)
+        return cls(graph, load_chunks(chunks_path))
+
+    def expand(self, chunks):
+        """Return `chunks` (best first) followed by the first chunks of the records linked to them."""
+        records = {chunk_rec_id(chunk) for chunk in chunks}
+        added = []
+        for chunk in chunks:
+            per_record = 0
+            for rec_id, field, _ in self.links.get(chunk_rec_id(chunk), ()):
+                if per_record >= self.per_record or len(added) >= self.limit:
+                    break
+                linked = self.first_chunks.get(rec_id)
+                if linked is None or rec_id in records:
+                    continue
+                records.add(rec_id)
+                added.append(dict(
+                    linked,
+                    score=chunk.get("score", 0.0) * self.decay,
+                    linked_from=chunk["chunk_id"],
+                    link=field,
+                ))
+                per_record += 1
+            if len(added) >= self.limit:
+                break
+
+        self.requests += 1
+        self.added += len(added)
+        return chunks + added
+
+    def stats(self):
+        return {
+            "graph": self.graph_stats,
+            "records_with_chunks": len(self.first_chunks),
+            "requests": self.requests,
+            "chunks_added": self.added,
+        }
@@ -0,0 +1,216 @@
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from bm25_index import tokenize
+from context_packer import truncate_tokens
+from telemetry import registry
+
+# Picks how each prompt is answered, from features of the prompt and of what
+# retrieval found:
+#
+#   extractive   a short lookup question ("what is the status of ...") whose
+#                terms the top chunk covers, clearly ahead of the next one:
+#                answered with that chunk's best section, no generation
+#   small        a short question the chunks cover well: the small deployment
+#                (OPENAI_SMALL_DEPLOYMENT) with a lower max_tokens
+#   large        anything long, multi-part, diagnostic ("why", "compare",
+#                "troubleshoot"), or poorly covered by the chunks: the main
+#                deployment as before
+#
+# Retrieval scores aren't comparable across backends (BM25, cosine, RRF, the
+# flat 1.0 of full mode), so confidence is measured as the share of the
+# prompt's terms found in the top chunk plus the top score's lead over the
+# second. Latency, tokens and estimated cost are kept per route.
+
+ROUTING_ENABLED = os.getenv("ROUTING_ENABLED", "false").lower() == "true"
+ROUTING_EXTRACTIVE_ENABLED = os.getenv("ROUTING_EXTRACTIVE_ENABLED", "true").lower() == "true"
+# Unset: the small route uses the main deployment with the smaller max_tokens
+OPENAI_SMALL_DEPLOYMENT = os.getenv("OPENAI_SMALL_DEPLOYMENT")
+ROUTING_LARGE_MAX_TOKENS = int(os.getenv("ROUTING_LARGE_MAX_TOKENS", "800"))
+ROUTING_SMALL_MAX_TOKENS = int(os.getenv("ROUTING_SMALL_MAX_TOKENS", "300"))
+# Longer prompts always go to the large model; extractive answers only for the shortest
+ROUTING_SIMPLE_MAX_WORDS = int(os.getenv("ROUTING_SIMPLE_MAX_WORDS", "20"))
+ROUTING_EXTRACTIVE_MAX_WORDS = int(os.getenv("ROUTING_EXTRACTIVE_MAX_WORDS", "12"))
+# Share of the prompt's terms the top chunk must contain
+ROUTING_SMALL_MIN_COVERAGE = float(os.getenv("ROUTING_SMALL_MIN_COVERAGE", "0.5"))
+ROUTING_EXTRACTIVE_MIN_COVERAGE = float(os.getenv("ROUTING_EXTRACTIVE_MIN_COVERAGE", "0.8"))
+# Top score / second score needed for an extractive answer
+ROUTING_EXTRACTIVE_MIN_MARGIN = float(os.getenv("ROUTING_EXTRACTIVE_MIN_MARGIN", "1.2"))
+ROUTING_EXTRACTIVE_MAX_TOKENS = int(os.getenv("ROUTING_EXTRACTIVE_MAX_TOKENS", "200"))
+# USD per 1K tokens (prompt, completion), for the cost report; set them to the deployments' prices
+ROUTING_LARGE_PRICES = (
+    float(os.getenv("ROUTING_LARGE_PROMPT_PRICE", "0.0025")), float(os.getenv("ROUTING_LARGE_COMPLETION_PRICE", "0.01"))
+)
+ROUTING_SMALL_PRICES = (
+    float(os.getenv("ROUTING_SMALL_PROMPT_PRICE", "0.00015")), float(os.getenv("ROUTING_SMALL_COMPLETION_PRICE", "0.0006"))
+)
+# Requests per route kept for the latency percentiles in stats()
+ROUTING_STATS_WINDOW = 1024
+
+# Questions that need reasoning over the chunks rather than a lookup
+COMPLEX_PATTERN = re.compile(
+    r"\b(why|how come|compare|comparison|difference|differences|versus|vs|troubleshoot|diagnose|root cause|"
+    r"explain|analy[sz]e|recommend|should i|best way|pros and cons|step[- ]by[- ]step|walk me through)\b",
+    re.I
+)
+# Lookups a single record answers
+LOOKUP_PATTERN = re.compile(
+    r"^\s*(what is|what's|whats|who is|who's|when was|when is|where is|which|is there|status of|show me|"
+    r"what are the (keywords|details))\b|\bstatus\b",
+    re.I
+)
+STATUS_PATTERN = re.compile(r"\bstatus\b", re.I)
+# Words that shape the question rather than name what it is about; left out of the coverage
+QUESTION_WORDS = frozenset(
+    "what whats who whos when where which why how is there status show me tell about does do can could please "
+    "current currently".split()
+)
+
+
+@dataclass
+class Route:
+    name: str
+    deployment: str | None
+    max_tokens: int
+    reason: str
+    features: dict = field(default_factory=dict)
+
+
+def coverage(terms, chunk):
+    # Share of the prompt's terms that appear in the chunk
+    if not terms:
+        return 0.0
+    words = set(tokenize(f"{chunk.get('title') or ''} {chunk.get('content') or ''}"))
+    return sum(1 for term in terms if term in words) / len(terms)
+
+
+def prompt_features(prompt, chunks):
+    terms = sorted(set(tokenize(prompt)) - QUESTION_WORDS)
+    ranked = sorted(chunks, key=lambda chunk: chunk.get("score", 0.0), reverse=True)
+    top = ranked[0] if ranked else None
+    # Copies of the top chunk don't compete with it (the context packer drops them too)
+    others = [chunk for chunk in ranked[1:] if chunk.get("content") != top.get("content")]
+    second = others[0].get("score", 0.0) if others else 0.0
+    top_score = top.get("score", 0.0) if top else 0.0
+    return {
+        "words": len(prompt.split()),
+        "terms": len(terms),
+        "questions": prompt.count("?"),
+        "complex": bool(COMPLEX_PATTERN.search(prompt)),
+        "lookup": bool(LOOKUP_PATTERN.search(prompt)),
+        # A status question can only be answered from a chunk that carries its record's status
+        "status_known": not STATUS_PATTERN.search(prompt) or bool(top and top.get("status")),
+        "chunks": len(ranked),
+        "coverage": round(coverage(terms, top), 3) if top else 0.0,
+        # None: no other chunk competes with the top one
+        "margin": round(top_score / second, 3) if second > 0 else None,
+    }
+
+
+def large_route(reason="default", features=None):
+    main = os.getenv("OPENAI_DEPLOYMENT")
+    return Route("large", main, ROUTING_LARGE_MAX_TOKENS, reason, features or {})
+
+
+def choose_route(prompt, chunks, has_history=False, enabled=None):
+    """The route for a prompt given its retrieved chunks; always "large" when routing is off."""
+    if not (ROUTING_ENABLED if enabled is None else enabled):
+        return large_route("routing disabled")
+
+    features = prompt_features(prompt, chunks)
+    if features["complex"]:
+        return large_route("complex question", features)
+    if features["words"] > ROUTING_SIMPLE_MAX_WORDS or features["questions"] > 1:
+        return large_route("long or multi-part prompt", features)
+
+    # A follow-up depends on the conversation, which an extracted snippet can't take into account
+    if (ROUTING_EXTRACTIVE_ENABLED and not has_history and features["lookup"] and features["status_known"]
+            and features["words"] <= ROUTING_EXTRACTIVE_MAX_WORDS
+            and features["coverage"] >= ROUTING_EXTRACTIVE_MIN_COVERAGE
+            and (features["margin"] is None or features["margin"] >= ROUTING_EXTRACTIVE_MIN_MARGIN)):
+        return Route("extractive", None, 0, "lookup answered by the top chunk", features)
+
+    if features["coverage"] >= ROUTING_SMALL_MIN_COVERAGE:
+        deployment = OPENAI_SMALL_DEPLOYMENT or os.getenv("OPENAI_DEPLOYMENT")
+        return Route("small", deployment, ROUTING_SMALL_MAX_TOKENS, "short question the chunks cover", features)
+    return large_route("chunks cover the question poorly", features)
+
+
+def extractive_answer(prompt, chunks, max_tokens=ROUTING_EXTRACTIVE_MAX_TOKENS):
+    """The top chunk's section that best matches the prompt, with the record's status and its title as source."""
+    top = max(chunks, key=lambda chunk: chunk.get("score", 0.0))
+    content = (top.get("content") or "").strip()
+    terms = set(tokenize(prompt))
+
+    # Chunks are "Label: text" sections separated by blank lines (see chunker.record_text)
+    sections = [section.strip() for section in content.split("\n\n") if section.strip()] or [content]
+
+    def overlap(section):
+        return len(terms & set(tokenize(section)))
+
+    # Resolutions and details answer more than the subject line the question was matched on
+    best = max(sections, key=lambda section: (overlap(section) > 0, section.startswith(("Resolution", "Details", "Workaround")),
+                                               overlap(section)))
+    lines = [truncate_tokens(best, max_tokens)]
+    if top.get("status") and STATUS_PATTERN.search(prompt):
+        lines.insert(0, f"Status: {top['status']}")
+    lines.append(f"Source: {top.get('title') or top.get('chunk_id')}")
+    return "\n\n".join(lines)
+
+
+def route_cost(route, prompt_tokens, completion_tokens):
+    if route == "extractive" or route == "cache":
+        return 0.0
+    prompt_price, completion_price = ROUTING_SMALL_PRICES if route == "small" and OPENAI_SMALL_DEPLOYMENT else ROUTING_LARGE_PRICES
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+route_requests = registry.counter("rag_route_requests_total", "Answered prompts by route (cache, extractive, small, large)", ("route",))
+route_seconds = registry.histogram("rag_route_seconds", "Retrieval to last answer token, by route", ("route",))
+route_cost_total = registry.counter("rag_route_cost_usd_total", "Estimated generation cost by route", ("route",))
+
+
+class RouteStats:
+    """Per-route counts, latency percentiles, tokens and estimated cost since startup."""
+
+    def __init__(self, window=ROUTING_STATS_WINDOW):
+        self.window = window
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, seconds, prompt_tokens=0, completion_tokens=0):
+        cost = route_cost(route, prompt_tokens, completion_tokens)
+        route_requests.inc(route=route)
+        route_seconds.observe(seconds, route=route)
+        route_cost_total.inc(cost, route=route)
+        with self.lock:
+            entry = self.routes.setdefault(route, {
+                "requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+                "latencies": deque(maxlen=self.window),
+            })
+            entry["requests"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += cost
+            entry["latencies"].append(seconds)
+
+    def stats(self):
+        with self.lock:
+            routes = {name: dict(entry, latencies=sorted(entry["latencies"])) for name, entry in self.routes.items()}
+        total = sum(entry["requests"] for entry in routes.values())
+        report = {}
+        for name, entry in sorted(routes.items()):
+            latencies = entry.pop("latencies")
+            report[name] = dict(
+                entry,
+                share=round(entry["requests"] / total, 3),
+                cost_usd=round(entry["cost_usd"], 6),
+                cost_per_request_usd=round(entry["cost_usd"] / entry["requests"], 6),
+                p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+                p95_ms=round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000, 1),
+            )
+        return report
+
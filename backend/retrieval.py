@@ -0,0 +1,103 @@
+import os
+
+from azure.search.documents.models import QueryType, VectorizedQuery
+
+# Retrieval settings (can be overridden from the .env file)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "keyword")  # keyword | vector | hybrid | full
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0"))
+VECTOR_FIELD = os.getenv("AZURE_SEARCH_VECTOR_FIELD", "content_vector")
+EMBEDDING_DEPLOYMENT = os.getenv("OPENAI_EMBEDDING_DEPLOYMENT")
+
+RETRIEVAL_MODES = ("keyword", "vector", "hybrid", "full")
+
+# Only the fields the prompt needs are sent back by the index
+SELECT_FIELDS = ["chunk_id", "title", "content"]
+# With model routing on, status also answers lookups on the extractive route (the index needs a status field)
+ROUTING_SELECT_FIELDS = SELECT_FIELDS + ["status"]
+
+
+async def embed_query(openai_client, text):
+    # Turn the user's prompt into a vector with the embedding deployment
+    response = await openai_client.embeddings.create(model=EMBEDDING_DEPLOYMENT, input=[text])
+    return response.data[0].embedding
+
+
+async def fetch_all_documents(search_client, odata_filter=None, page_size=1000):
+    # Old behaviour: page through the whole index (kept as the "full" mode for comparison).
+    # `top` caps the whole result set, not one page, so the index is read page_size documents at a time with `skip`.
+    all_docs = []
+    while True:
+        results = await search_client.search(
+            search_text="*",
+            query_type=QueryType.SIMPLE,
+            search_mode="all",
+            filter=odata_filter,
+            top=page_size,
+            skip=len(all_docs),
+            order_by=["chunk_id asc"]  # sort by a stable field
+        )
+
+        page = [doc async for doc in results]
+        all_docs.extend(page)
+        if len(page) < page_size:
+            return all_docs
+
+
+async def retrieve_chunks(search_client, query, mode=None, top_k=None, min_score=None, embed=None, corpus=None,
+                          filters=None, select=None):
+    """Return the top_k chunks for the query, best match first.
+
+    Each chunk is the index document with an extra "score" key. Chunks scoring
+    below min_score are dropped. `embed` is an async function turning text into
+    a vector and is only needed for the vector and hybrid modes. In "full" mode
+    a cached `corpus` is returned instead of paging the index when one is given.
+    `filters` (RetrievalFilters) are sent to the index as an OData $filter.
+    """
+    mode = mode or RETRIEVAL_MODE
+    top_k = top_k if top_k is not None else RETRIEVAL_TOP_K
+    min_score = min_score if min_score is not None else RETRIEVAL_MIN_SCORE
+
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    odata_filter = filters.odata() if filters is not None else None
+
+    if mode == "full":
+        if corpus is not None:
+            # The cached corpus is already in memory, so it is filtered here
+            docs = [doc for doc in corpus if filters.matches(doc)] if odata_filter else corpus
+        else:
+            docs = await fetch_all_documents(search_client, odata_filter)
+        return [dict(doc, score=doc.get("@search.score", 1.0)) for doc in docs]
+
+    search_args = {"top": top_k, "select": select or SELECT_FIELDS}
+    if odata_filter:
+        search_args["filter"] = odata_filter
+
+    # Keyword part: run the prompt itself as the search query
+    if mode in ("keyword", "hybrid"):
+        search_args["search_text"] = query
+        search_args["query_type"] = QueryType.SIMPLE
+        search_args["search_mode"] = "any"
+
+    # Vector part: nearest neighbours of the embedded prompt
+    if mode in ("vector", "hybrid"):
+        if embed is None:
+            raise ValueError(f"Retrieval mode '{mode}' needs an embedding function")
+        search_args["vector_queries"] = [
+            VectorizedQuery(vector=await embed(query), k_nearest_neighbors=top_k, fields=VECTOR_FIELD)
+        ]
+        if odata_filter:
+            # Filter before the nearest-neighbour search, so scoped queries still get top_k results
+            search_args["vector_filter_mode"] = "preFilter"
+
+    chunks = []
+    async for doc in await search_client.search(**search_args):
+        score = doc.get("@search.score", 0.0)
+        if score < min_score:
+            continue
+        chunks.append(dict(doc, score=score))
+
+    chunks.sort(key=lambda chunk: chunk["score"], reverse=True)
+    return chunks[:top_k]
@@ -0,0 +1,140 @@
+import asyncio
+import os
+
+from retrieval import RETRIEVAL_MODE, RETRIEVAL_MIN_SCORE, RETRIEVAL_TOP_K, retrieve_chunks
+
+# Retrieval backends the API can serve from. Every retriever has the same interface:
+#
+#   await retriever.retrieve(query, top_k=None, min_score=None, filters=None) -> chunks, best first
+#   retriever.stats() -> dict for the admin endpoint
+#   await retriever.close()
+#
+# Each chunk is a dict with chunk_id, title, content and score, which is what
+# the context packer and the answer cache expect. `filters` (RetrievalFilters)
+# are applied inside the index query, never to the results afterwards.
+
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "azure")  # azure | local | bm25 | hybrid
+# Reciprocal rank fusion constant and how many candidates each side of the hybrid contributes per result
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "3"))
+
+RETRIEVER_BACKENDS = ("azure", "local", "bm25", "hybrid")
+
+
+class AzureSearchRetriever:
+    """Azure AI Search in the configured RETRIEVAL_MODE (keyword, vector, hybrid or full)."""
+
+    name = "azure"
+
+    def __init__(self, search_client, embed=None, corpus=None, mode=None, select=None):
+        self.search_client = search_client
+        self.embed = embed
+        # Fields returned per hit; None = retrieval.SELECT_FIELDS
+        self.select = select
+        # Function returning the cached corpus for "full" mode, or None to page the index
+        self.corpus = corpus
+        self.mode = mode or RETRIEVAL_MODE
+
+    async def retrieve(self, query, top_k=None, min_score=None, filters=None):
+        return await retrieve_chunks(
+            self.search_client,
+            query,
+            mode=self.mode,
+            top_k=top_k,
+            min_score=min_score,
+            embed=self.embed,
+            corpus=self.corpus() if self.corpus else None,
+            filters=filters,
+            select=self.select
+        )
+
+    def stats(self):
+        return {"backend": self.name, "mode": self.mode}
+
+    async def close(self):
+        # The search client is owned (and closed) by the app
+        pass
+
+
+class LocalVectorRetriever:
+    """Nearest chunks from the memory-mapped local vector index; no network calls except the query embedding."""
+
+    name = "local"
+
+    def __init__(self, index, embed):
+        self.index = index
+        self.embed = embed
+
+    async def retrieve(self, query, top_k=None, min_score=None, filters=None):
+        top_k = top_k if top_k is not None else RETRIEVAL_TOP_K
+        min_score = min_score if min_score is not None else RETRIEVAL_MIN_SCORE
+        hits = self.index.search(await self.embed(query), top_k, filters=filters)
+        return [hit for hit in hits if hit["score"] >= min_score]
+
+    def stats(self):
+        return {"backend": self.name, "mode": "vector", "index": self.index.meta}
+
+    async def close(self):
+        self.index.close()
+
+
+class LocalBM25Retriever:
+    """Keyword ranking from the local BM25 index; no network calls at all."""
+
+    name = "bm25"
+
+    def __init__(self, index):
+        self.index = index
+
+    async def retrieve(self, query, top_k=None, min_score=None, filters=None):
+        top_k = top_k if top_k is not None else RETRIEVAL_TOP_K
+        min_score = min_score if min_score is not None else RETRIEVAL_MIN_SCORE
+        hits = self.index.search(query, top_k, filters=filters)
+        return [hit for hit in hits if hit["score"] >= min_score]
+
+    def stats(self):
+        return {"backend": self.name, "mode": "keyword", "index": self.index.meta}
+
+    async def close(self):
+        self.index.close()
+
+
+def reciprocal_rank_fusion(rankings, top_k, k=HYBRID_RRF_K):
+    """Merge ranked chunk lists; a chunk scores sum(1 / (k + rank)) over the lists it appears in."""
+    fused = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            entry = fused.setdefault(chunk["chunk_id"], [0.0, chunk])
+            entry[0] += 1.0 / (k + rank)
+    best = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)[:top_k]
+    return [dict(chunk, score=score) for score, chunk in best]
+
+
+class HybridRetriever:
+    """Keyword and vector retrievers queried concurrently and merged with reciprocal rank fusion.
+
+    min_score is applied by each side to its own scores; fused scores are rank
+    based and not comparable with them.
+    """
+
+    name = "hybrid"
+
+    def __init__(self, keyword, vector, candidates=HYBRID_CANDIDATES):
+        self.keyword = keyword
+        self.vector = vector
+        self.candidates = candidates
+
+    async def retrieve(self, query, top_k=None, min_score=None, filters=None):
+        top_k = top_k if top_k is not None else RETRIEVAL_TOP_K
+        rankings = await asyncio.gather(
+            self.keyword.retrieve(query, top_k * self.candidates, min_score, filters),
+            self.vector.retrieve(query, top_k * self.candidates, min_score, filters),
+        )
+        return reciprocal_rank_fusion(rankings, top_k)
+
+    def stats(self):
+        return {"backend": self.name, "mode": "rrf", "keyword": self.keyword.stats(), "vector": self.vector.stats()}
+
+    async def close(self):
+        await self.keyword.close()
+        await self.vector.close()
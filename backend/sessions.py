@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from bm25_index import tokenize
+from context_packer import count_tokens, truncate_tokens
+
+# Server-side conversation state for the prompt endpoints. A request that
+# carries a conversation_id gets the recent turns of that conversation sent
+# with it; older turns are folded into a rolling summary so the history stays
+# under a token budget. Sessions live in an in-memory LRU; with a SQLite path
+# set, sessions pushed out of the LRU (and all of them at shutdown) are
+# written there and read back on their next request.
+
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH")  # unset = memory only
+# Tokens of history (summary + earlier turns) sent with a prompt
+SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "1500"))
+# Turns always kept word for word; older ones are summarized once the budget is exceeded
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "2"))
+SESSION_SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "300"))
+# A follow-up this short that adds (almost) no new terms reuses the previous turn's chunks
+SESSION_REFINEMENT_MAX_WORDS = int(os.getenv("SESSION_REFINEMENT_MAX_WORDS", "15"))
+SESSION_REFINEMENT_NEW_TERMS = int(os.getenv("SESSION_REFINEMENT_NEW_TERMS", "2"))
+
+logger = logging.getLogger("backend.sessions")
+
+# Chunk fields kept with a turn so its context can be packed again
+TURN_CHUNK_FIELDS = ("chunk_id", "title", "content", "score")
+
+# "why?", "and on Windows?", "what about the second step" ...
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|but|also|so|then|why|how come|what about|how about|what if|can you|could you|please|"
+    r"explain|elaborate|more|tell me more|same|ok|okay)\b",
+    re.I
+)
+# ... or a question that points back at the previous answer
+REFERENCE_PATTERN = re.compile(r"\b(it|its|that|this|these|those|them|they|above|previous|same|step)\b", re.I)
+
+
+def filters_key(filters):
+    # Filters as stored with a turn (a RetrievalFilters or None)
+    return filters.model_dump(mode="json", exclude_none=True) or None if filters is not None else None
+
+
+@dataclass
+class Turn:
+    prompt: str
+    response: str
+    tokens: int
+    chunks: list = field(default_factory=list)
+    filters: dict = None
+    created_at: float = 0.0
+
+
+@dataclass
+class Session:
+    conversation_id: str
+    summary: str = ""
+    summary_tokens: int = 0
+    turns: list = field(default_factory=list)
+    # Turns folded into the summary so far
+    summarized_turns: int = 0
+    updated_at: float = 0.0
+    # Not stored: set while a compaction of this session is running
+    compacting: bool = False
+
+    def history_tokens(self):
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    def to_json(self):
+        data = asdict(self)
+        data.pop("compacting")
+        return json.dumps(data, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        data["turns"] = [Turn(**turn) for turn in data["turns"]]
+        return cls(**data)
+
+
+def is_refinement(session, prompt, filters=None, max_words=SESSION_REFINEMENT_MAX_WORDS,
+                  new_terms=SESSION_REFINEMENT_NEW_TERMS):
+    """Whether `prompt` only refines the previous question, so its chunks still answer it.
+
+    That is a short prompt, with the same filters, that either adds no terms
+    the previous question and its chunks didn't have, or reads as a follow-up
+    ("why?", "what about ...", "does that ...") and adds only a few.
+    """
+    if not session.turns or not session.turns[-1].chunks:
+        return False
+    last = session.turns[-1]
+    if last.filters != filters_key(filters) or len(prompt.split()) > max_words:
+        return False
+
+    known = set(tokenize(last.prompt))
+    for chunk in last.chunks:
+        known.update(tokenize(f"{chunk.get('title') or ''} {chunk.get('content') or ''}"))
+    added = {term for term in tokenize(prompt) if term not in known}
+    if not added:
+        return True
+    follow_up = FOLLOW_UP_PATTERN.match(prompt) or REFERENCE_PATTERN.search(prompt)
+    return bool(follow_up) and len(added) <= new_terms
+
+
+def turn_text(turn):
+    return f"User: {turn.prompt}\nAssistant: {turn.response}"
+
+
+def extractive_summary(summary, turns, max_tokens=SESSION_SUMMARY_MAX_TOKENS):
+    # Used when no summarizer is configured or it fails: keep the questions and the start of each answer
+    lines = [summary] if summary else []
+    lines += [f"- Asked: {turn.prompt} / Answer began: {truncate_tokens(turn.response, 40)}" for turn in turns]
+    text = "\n".join(lines)
+    # The newest lines matter most, so an over-long summary loses its oldest part
+    while count_tokens(text) > max_tokens and len(lines) > 1:
+        lines.pop(0)
+        text = "\n".join(lines)
+    return truncate_tokens(text, max_tokens)
+
+
+def history_messages(session, budget=SESSION_HISTORY_TOKEN_BUDGET):
+    """Chat messages for the conversation so far: the summary, then the newest turns that fit the budget."""
+    messages = []
+    remaining = budget
+    if session.summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+        remaining -= session.summary_tokens
+
+    # Turns that don't fit yet (a compaction may still be running) are left out, newest kept first
+    recent = []
+    for turn in reversed(session.turns):
+        if turn.tokens > remaining:
+            break
+        remaining -= turn.tokens
+        recent.append(turn)
+    for turn in reversed(recent):
+        messages.append({"role": "user", "content": turn.prompt})
+        messages.append({"role": "assistant", "content": turn.response})
+    return messages
+
+
+class SqliteSessionStore:
+    """Spill file for sessions that don't fit in memory (and for all of them at shutdown)."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (conversation_id TEXT PRIMARY KEY, data TEXT, updated_at REAL)"
+            )
+
+    def get(self, conversation_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM sessions WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return Session.from_json(row[0]) if row else None
+
+    def put_many(self, sessions):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                [(session.conversation_id, session.to_json(), session.updated_at) for session in sessions]
+            )
+
+    def delete(self, conversation_id):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE conversation_id = ?", (conversation_id,))
+
+    def purge_older_than(self, cutoff):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class SessionStore:
+    """LRU + TTL store of conversation sessions, with an optional spill store.
+
+    `summarize` is an async function (previous summary, turns) -> summary text
+    used for compaction; without one (or when it fails) the summary is
+    extractive.
+    """
+
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES, ttl_seconds=SESSION_TTL, store=None, summarize=None,
+                 budget=SESSION_HISTORY_TOKEN_BUDGET, recent_turns=SESSION_RECENT_TURNS,
+                 summary_max_tokens=SESSION_SUMMARY_MAX_TOKENS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.summarize = summarize
+        self.budget = budget
+        self.recent_turns = max(1, recent_turns)
+        self.summary_max_tokens = summary_max_tokens
+        self.sessions = OrderedDict()
+        self.counters = {
+            "created": 0, "loaded": 0, "spilled": 0, "evictions": 0, "expired": 0,
+            "turns": 0, "compactions": 0, "summary_fallbacks": 0, "reused_context": 0,
+        }
+
+        if self.store is not None:
+            self.store.purge_older_than(time.time() - self.ttl_seconds)
+
+    def _expired(self, session):
+        return time.time() - session.updated_at >= self.ttl_seconds
+
+    def _remember(self, session):
+        self.sessions[session.conversation_id] = session
+        self.sessions.move_to_end(session.conversation_id)
+
+        evicted = []
+        while len(self.sessions) > self.max_entries:
+            evicted.append(self.sessions.popitem(last=False)[1])
+            self.counters["evictions"] += 1
+        if evicted and self.store is not None:
+            self.store.put_many(evicted)
+            self.counters["spilled"] += len(evicted)
+
+    def get(self, conversation_id, create=True):
+        """The conversation's session; a new empty one if it has none (or it expired) and `create` is set."""
+        session = self.sessions.get(conversation_id)
+        if session is None and self.store is not None:
+            session = self.store.get(conversation_id)
+            if session is not None:
+                self.counters["loaded"] += 1
+
+        if session is not None and self._expired(session):
+            self.delete(conversation_id)
+            self.counters["expired"] += 1
+            session = None
+
+        if session is None:
+            if not create:
+                return None
+            session = Session(conversation_id, updated_at=time.time())
+            self.counters["created"] += 1
+        self._remember(session)
+        return session
+
+    def reusable_chunks(self, session, prompt, filters=None):
+        """The previous turn's chunks when `prompt` is a refinement of it, otherwise None."""
+        if not is_refinement(session, prompt, filters):
+            return None
+        self.counters["reused_context"] += 1
+        return session.turns[-1].chunks
+
+    def add_turn(self, session, prompt, response, chunks, filters=None):
+        tokens = count_tokens(prompt) + count_tokens(response)
+        chunks = [{key: chunk.get(key) for key in TURN_CHUNK_FIELDS} for chunk in chunks]
+        session.turns.append(Turn(prompt, response, tokens, chunks, filters_key(filters), time.time()))
+        session.updated_at = time.time()
+        self.counters["turns"] += 1
+
+    def needs_compaction(self, session):
+        return (not session.compacting and session.history_tokens() > self.budget
+                and len(session.turns) > self.recent_turns)
+
+    async def compact(self, session):
+        """Fold all but the most recent turns into the session's rolling summary."""
+        if not self.needs_compaction(session):
+            return
+        session.compacting = True
+        try:
+            # Turns added while the summary is written stay after the folded ones
+            folded = session.turns[:-self.recent_turns]
+            summary = None
+            if self.summarize is not None:
+                try:
+                    summary = await self.summarize(session.summary, folded)
+                except Exception as e:
+                    logger.warning(f"⚠️ Conversation summary failed, keeping an extractive one: {e}")
+                    self.counters["summary_fallbacks"] += 1
+            if not summary:
+                summary = extractive_summary(session.summary, folded, self.summary_max_tokens)
+
+            session.summary = truncate_tokens(summary.strip(), self.summary_max_tokens)
+            session.summary_tokens = count_tokens(session.summary)
+            session.turns = session.turns[len(folded):]
+            session.summarized_turns += len(folded)
+            self.counters["compactions"] += 1
+        finally:
+            session.compacting = False
+
+    def delete(self, conversation_id):
+        self.sessions.pop(conversation_id, None)
+        if self.store is not None:
+            self.store.delete(conversation_id)
+
+    def close(self):
+        # Everything still in memory goes to the spill store so conversations survive a restart
+        if self.store is not None:
+            self.store.put_many(list(self.sessions.values()))
+            self.store.close()
+
+    def stats(self):
+        return {
+            **self.counters,
+            "sessions": len(self.sessions),
+            "spilled_sessions": self.store.count() if self.store is not None else 0,
+            "persistent": self.store is not None,
+            "history_token_budget": self.budget,
+        }
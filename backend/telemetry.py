@@ -0,0 +1,269 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Request tracing and metrics for the API, with no dependencies. Each request
+# gets an ID (taken from the X-Request-ID header or generated) and a trace;
+# code timed with `span("retrieval")` adds a span to the current trace and an
+# observation to the span latency histogram. /metrics renders every metric in
+# the Prometheus text format:
+#
+#   rag_request_seconds{route, method, status}   histogram, whole request
+#   rag_span_seconds{span}                       histogram, one pipeline stage
+#   <histogram>_recent{..., quantile}            p50/p95/p99 over the last TELEMETRY_WINDOW observations
+#   counters and gauges registered by the app    tokens, cache lookups and hit ratios
+
+REQUEST_ID_HEADER = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+# Observations per series kept for the p50/p95/p99 quantiles
+TELEMETRY_WINDOW = int(os.getenv("TELEMETRY_WINDOW", "2048"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Seconds; from a local index lookup to a long generation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger("backend.telemetry")
+
+
+@dataclass
+class Trace:
+    request_id: str
+    # (span name, start offset, duration) in seconds
+    spans: list = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    def server_timing(self):
+        # Server-Timing header value: browser dev tools show it next to the request
+        return ", ".join(f"{name};dur={duration * 1000:.1f}" for name, _, duration in self.spans)
+
+    def report(self):
+        return " ".join(f"{name}={duration * 1000:.1f}ms" for name, _, duration in self.spans)
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def request_id():
+    trace = current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = sorted(self.values.items())
+        lines += [f"{self.name}{_label_text(self.labels, key)} {_number(value)}" for key, value in values]
+        return lines
+
+
+class Gauge:
+    """A gauge read when /metrics is rendered: `read()` returns {label values tuple: value}."""
+
+    def __init__(self, name, help_text, read, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.read = read
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_label_text(self.labels, key)} {_number(value)}" for key, value in sorted(self.read().items())]
+        return lines
+
+
+class Histogram:
+    """Cumulative Prometheus buckets, plus a window of recent observations for exact quantiles."""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS, window=TELEMETRY_WINDOW):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.window = window
+        # label values -> [bucket counts (+Inf last), sum, count, recent observations]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, deque(maxlen=self.window)]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+            series[3].append(value)
+
+    def render(self):
+        with self.lock:
+            series = sorted((key, list(counts), total, count, sorted(recent))
+                            for key, (counts, total, count, recent) in self.series.items())
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts, total, count, _ in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+
+        recent_name = f"{self.name}_recent"
+        lines += [f"# HELP {recent_name} {self.help} (last {self.window} observations)", f"# TYPE {recent_name} summary"]
+        for key, _, _, _, recent in series:
+            for q in QUANTILES:
+                value = recent[min(len(recent) - 1, int(q * len(recent)))]
+                quantile = 'quantile="' + str(q) + '"'
+                lines.append(f"{recent_name}{_label_text(self.labels, key, quantile)} {_number(value)}")
+            lines.append(f"{recent_name}_sum{_label_text(self.labels, key)} {_number(sum(recent))}")
+            lines.append(f"{recent_name}_count{_label_text(self.labels, key)} {len(recent)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read, labels=()):
+        return self.register(Gauge(name, help_text, read, labels))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+request_seconds = registry.histogram(
+    "rag_request_seconds", "Time from request start to the last response byte", ("route", "method", "status")
+)
+span_seconds = registry.histogram("rag_span_seconds", "Time spent in one stage of the RAG pipeline", ("span",))
+
+
+def record_span(name, duration, start=None):
+    """Add a span measured elsewhere (e.g. summed over a stream) to the histogram and the current trace."""
+    span_seconds.observe(duration, span=name)
+    trace = current_trace.get()
+    if trace is not None:
+        offset = (start if start is not None else time.perf_counter() - duration) - trace.started
+        trace.spans.append((name, offset, duration))
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start, start)
+
+
+class RequestIdFilter(logging.Filter):
+    # Puts the current request's ID on every log record (as "-" outside a request)
+    def filter(self, record):
+        record.request_id = request_id() or "-"
+        return True
+
+
+def configure_logging(level=LOG_LEVEL):
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    handler.addFilter(RequestIdFilter())
+    root = logging.getLogger("backend")
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    root.propagate = False
+
+
+class RequestTelemetryMiddleware:
+    """ASGI middleware: request ID, trace, request latency histogram and one log line per request.
+
+    Plain ASGI rather than an HTTP middleware so streamed responses are timed
+    to their last byte and their body isn't buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = REQUEST_ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(self.header)
+        trace = Trace(incoming.decode("latin-1")[:128] if incoming else uuid.uuid4().hex)
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((self.header, trace.request_id.encode("latin-1")))
+                if trace.spans:
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            duration = time.perf_counter() - trace.started
+            # The route template, so /api/conversations/{conversation_id} is one series
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            request_seconds.observe(duration, route=route, method=scope["method"], status=str(status))
+            logger.info(f"{scope['method']} {scope['path']} {status} {duration * 1000:.1f}ms {trace.report()}")
+            current_trace.reset(token)
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from chunker import CHUNKS_PATH, INDEX_DIR, load_chunks
+from doc_store import DocStore, write_docs
+from embeddings import EMBEDDING_CACHE_PATH, EmbeddingCache, FakeEmbedder, create_embedder, embed_chunks
+
+# Local approximate nearest neighbour index over the chunk embeddings (IVF:
+# vectors are grouped around k-means centroids and a query only scans the
+# groups closest to it). Everything is stored as flat files that are
+# memory-mapped on load, so opening the index is instant and worker
+# processes share the same pages:
+#
+#   meta.json        model, dimensions, counts
+#   centroids.npy    (lists, dimensions) float32
+#   offsets.npy      (lists + 1,) where each list starts in vectors.npy
+#   vectors.npy      (chunks, dimensions) float32, normalised, grouped by list
+#   docs.jsonl       the chunk documents in the same order (see doc_store)
+
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(INDEX_DIR, "vector"))
+# Lists scanned per query; more lists = better recall, slower queries
+VECTOR_INDEX_PROBES = int(os.getenv("VECTOR_INDEX_PROBES", "8"))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50_000
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def default_lists(count):
+    # Roughly 4 * sqrt(n) lists, a common starting point for IVF
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+
+def kmeans(vectors, lists, iterations=KMEANS_ITERATIONS, sample=KMEANS_SAMPLE, seed=0):
+    """Spherical k-means on a sample of the vectors; returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=lists) == 0
+        # An empty list gets a random vector so it can pick up points next round
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign(vectors, centroids, batch_size=65_536):
+    return np.concatenate([
+        np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), batch_size)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def _write_npy(path, array):
+    np.save(path + ".tmp.npy", array)
+    os.replace(path + ".tmp.npy", path)
+
+
+def build_index(docs, vectors, path=VECTOR_INDEX_DIR, model=None, lists=None):
+    """Write an IVF index for `docs` (chunk dicts) and their `vectors` to `path`."""
+    vectors = normalize(vectors)
+    lists = lists or default_lists(len(docs))
+    start = time.perf_counter()
+
+    centroids = kmeans(vectors, lists)
+    assignment = assign(vectors, centroids)
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=lists))]).astype(np.int64)
+
+    os.makedirs(path, exist_ok=True)
+    _write_npy(os.path.join(path, "centroids.npy"), centroids)
+    _write_npy(os.path.join(path, "offsets.npy"), offsets)
+    _write_npy(os.path.join(path, "vectors.npy"), vectors[order])
+    write_docs(path, docs, order)
+
+    meta = {
+        "model": model,
+        "dimensions": int(vectors.shape[1]) if len(vectors) else 0,
+        "chunks": len(docs),
+        "lists": lists,
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class VectorIndex:
+    """Read-only, memory-mapped view of an index written by build_index()."""
+
+    def __init__(self, path=VECTOR_INDEX_DIR, probes=VECTOR_INDEX_PROBES):
+        self.path = path
+        self.probes = probes
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.docs = DocStore(path)
+
+    @property
+    def model(self):
+        return self.meta.get("model")
+
+    def __len__(self):
+        return self.meta["chunks"]
+
+    def _top(self, rows, scores, top_k):
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
+
+    def search_rows(self, query, top_k, probes=None, mask=None):
+        """(rows, scores) of the top_k vectors closest to `query` in the nearest `probes` lists.
+
+        `mask` (a boolean per row, from DocStore.mask) limits the search to the rows it allows.
+        """
+        query = normalize(query)
+        probes = min(probes or self.probes, len(self.centroids))
+        if mask is not None:
+            allowed = np.flatnonzero(mask)
+            # A narrow filter leaves fewer rows than the probed lists would hold: score them all, exactly
+            if len(allowed) <= len(self) * probes / len(self.centroids):
+                return self._top(allowed, self.vectors[allowed] @ query, top_k)
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+
+        # Lists are contiguous in vectors.npy, so each probe reads one block of pages
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in nearest])
+        scores = np.concatenate([self.vectors[self.offsets[i]:self.offsets[i + 1]] @ query for i in nearest])
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+            # The nearest lists hold too few allowed rows; fall back to all of them
+            if len(rows) < top_k < len(allowed):
+                return self._top(allowed, self.vectors[allowed] @ query, top_k)
+        return self._top(rows, scores, top_k)
+
+    def brute_force_rows(self, query, top_k):
+        # Exact search over every vector; the reference for recall
+        return self._top(np.arange(len(self)), self.vectors @ normalize(query), top_k)
+
+    def search(self, query, top_k, probes=None, filters=None):
+        rows, scores = self.search_rows(query, top_k, probes, self.docs.mask(filters))
+        return [dict(self.docs[row], score=float(score)) for row, score in zip(rows, scores)]
+
+    def close(self):
+        self.docs.close()
+
+
+def query_embedder(model):
+    """Async function embedding a query with the model the index was built with.
+
+    Indexes built with the fake embedder can be queried fully offline.
+    """
+    if model and model.startswith("fake-"):
+        embedder = FakeEmbedder(dimensions=int(model.split("-", 1)[1]))
+
+        async def embed(text):
+            return embedder.embed(text)
+        return embed
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local vector index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="embed the chunks (using the embedding cache) and build the index")
+    build.add_argument("--chunks", default=CHUNKS_PATH)
+    build.add_argument("--cache", default=EMBEDDING_CACHE_PATH)
+    build.add_argument("--output", default=VECTOR_INDEX_DIR)
+    build.add_argument("--lists", type=int, default=None)
+    build.add_argument("--fake", action="store_true", help="use the deterministic local embedder")
+
+    search = commands.add_parser("search", help="print the nearest chunks for a query (fake-embedder indexes only)")
+    search.add_argument("query")
+    search.add_argument("--index", default=VECTOR_INDEX_DIR)
+    search.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        chunks = load_chunks(args.chunks)
+        cache = EmbeddingCache(args.cache)
+        embedder = create_embedder(args.fake)
+        vectors, stats = asyncio.run(embed_chunks(chunks, embedder, cache))
+        cache.close()
+        meta = build_index(chunks, [vectors[chunk["chunk_id"]] for chunk in chunks], args.output, embedder.model, args.lists)
+        print(json.dumps({"embedding": stats, "index": meta}))
+        return
+
+    index = VectorIndex(args.index)
+    embed = query_embedder(index.model)
+    if embed is None:
+        parser.error(f"index was built with {index.model}; query it through the API instead")
+    for hit in index.search(asyncio.run(embed(args.query)), args.top_k):
+        print(f"{hit['score']:.3f}  {hit['chunk_id']}  {hit['title']}")
+
+
+if __name__ == "__main__":
+    main()
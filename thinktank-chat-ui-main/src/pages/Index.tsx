@@ -35,10 +35,20 @@ const Index = () => {
     setMessages(newMessages);
     setPrompt('');
 
+    // The backend keeps the conversation's earlier turns under this ID, so create it before the first prompt
+    let conversationId = currentConversationId;
+    if (!conversationId) {
+      const title = userMessage.content.slice(0, 50) + (userMessage.content.length > 50 ? '...' : '');
+      conversationId = await createConversation(title);
+      if (conversationId) {
+        setCurrentConversationId(conversationId);
+      }
+    }
+
     try {
       console.log('Attempting to connect to backend...');
       console.log('URL:', 'https://group-7-d7dffvh0fydnbedj.southafricanorth-01.azurewebsites.net/api/prompt');
-      console.log('Payload:', { prompt });
+      console.log('Payload:', { prompt, conversation_id: conversationId });
 
       const response = await fetch('https://group-7-d7dffvh0fydnbedj.southafricanorth-01.azurewebsites.net/api/prompt', {
         method: 'POST',
@@ -46,7 +56,7 @@ const Index = () => {
           'Content-Type': 'application/json',
           'Accept': 'application/json'
         },
-        body: JSON.stringify({ prompt }),
+        body: JSON.stringify({ prompt, conversation_id: conversationId ?? undefined }),
       });
 
       console.log('Response status:', response.status);
@@ -65,15 +75,8 @@ const Index = () => {
       const finalMessages = [...newMessages, assistantMessage];
       setMessages(finalMessages);
 
-      if (currentConversationId) {
-        await saveMessagesToConversation(currentConversationId, finalMessages);
-      } else {
-        const title = userMessage.content.slice(0, 50) + (userMessage.content.length > 50 ? '...' : '');
-        const newConversationId = await createConversation(title);
-        if (newConversationId) {
-          setCurrentConversationId(newConversationId);
-          await saveMessagesToConversation(newConversationId, finalMessages);
-        }
+      if (conversationId) {
+        await saveMessagesToConversation(conversationId, finalMessages);
       }
 
       toast.success('Response received!');